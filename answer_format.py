@@ -0,0 +1,161 @@
+"""
+Structured view of chatbot answers
+
+Answers follow the sections listed in the ``konflux_chat`` description:
+Diagnostic Assessment, Solution/Answer, Notes and Confidence Level (plus
+the Sources list appended when ``include_sources`` is set). ``parse_answer``
+splits an answer into those sections once; the result is cached, since the
+same answer is usually formatted for several callers (cache hits,
+coalesced calls). ``format_answer`` renders the form a caller asked for:
+
+- ``full``: the answer as received
+- ``solution_only``: just the Solution/Answer section
+- ``summary``: the first sentences of the assessment and solution, and the
+  confidence level
+- ``json``: the sections as a compact JSON object
+
+Text before the first section (such as the "Reused answer" or "Offline
+answer" note) is kept in every format. Answers without recognizable
+sections are returned whole.
+"""
+
+import functools
+import json
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+
+RESPONSE_FORMATS = ("full", "solution_only", "summary", "json")
+
+# Section headers as the model writes them: "**Solution/Answer:**",
+# "## Diagnostic Assessment", "Confidence Level: High", ... A plain header
+# needs its colon, so sentences starting with "Answer" or "Notes" are not one
+_NAME = (
+    r"(diagnostic assessment|solution[ \t]*/[ \t]*answer|solution|answer|notes(?:[ \t]+and[ \t]+warnings)?"
+    r"|warnings|confidence(?:[ \t]+level)?|sources)"
+)
+_HEADER = re.compile(
+    rf"^[ \t]*(?:#{{1,6}}[ \t]*(?:\*\*|__)?{_NAME}(?:\*\*|__)?[ \t]*:?"
+    rf"|(?:\*\*|__){_NAME}[ \t]*:?[ \t]*(?:\*\*|__)[ \t]*:?"
+    rf"|{_NAME}[ \t]*:)[ \t]*",
+    re.IGNORECASE | re.MULTILINE,
+)
+_SECTION_NAMES = {
+    "diagnostic assessment": "assessment",
+    "solution": "solution", "answer": "solution",
+    "notes": "notes", "warnings": "notes",
+    "confidence": "confidence",
+    "sources": "sources",
+}
+_CONFIDENCE = re.compile(r"\b(high|medium|low)\b", re.IGNORECASE)
+_SOURCE_LINK = re.compile(r"^\s*-\s*\[(.*?)\]\((.*?)\)", re.MULTILINE)
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_LIST_ITEM = re.compile(r"^\s*(?:[-*+]|\d+[.)])\s+")
+
+
+@dataclass(frozen=True)
+class AnswerSections:
+    text: str
+    preamble: str = ""
+    assessment: Optional[str] = None
+    solution: Optional[str] = None
+    notes: Optional[str] = None
+    confidence: Optional[str] = None  # "High", "Medium" or "Low" when stated that way
+    confidence_text: Optional[str] = None
+    sources: tuple = ()  # (title, url) pairs
+
+    @property
+    def structured(self) -> bool:
+        return self.assessment is not None or self.solution is not None
+
+
+def _section_name(header: str) -> str:
+    header = " ".join(header.lower().replace("/", " / ").split())
+    for prefix, name in _SECTION_NAMES.items():
+        if header.startswith(prefix):
+            return name
+    return "notes"
+
+
+@functools.lru_cache(maxsize=512)
+def parse_answer(text: str) -> AnswerSections:
+    """Split an answer into its sections (cached per answer text)"""
+    matches = list(_HEADER.finditer(text))
+    if not matches:
+        return AnswerSections(text=text)
+
+    found: dict[str, str] = {}
+    for match, following in zip(matches, matches[1:] + [None]):
+        end = following.start() if following is not None else len(text)
+        name = _section_name(next(group for group in match.groups() if group))
+        body = text[match.end():end].strip()
+        # A repeated header (e.g. "Answer:" inside the solution) extends the first one
+        found[name] = f"{found[name]}\n\n{body}".strip() if name in found else body
+
+    confidence_text = found.get("confidence")
+    level = _CONFIDENCE.search(confidence_text) if confidence_text else None
+    return AnswerSections(
+        text=text,
+        preamble=text[:matches[0].start()].strip(),
+        assessment=found.get("assessment"),
+        solution=found.get("solution"),
+        notes=found.get("notes"),
+        confidence=level.group(1).capitalize() if level else None,
+        confidence_text=confidence_text,
+        sources=tuple(_SOURCE_LINK.findall(found.get("sources", ""))),
+    )
+
+
+def _first_sentences(text: str, count: int = 2, max_chars: int = 400) -> str:
+    # Stop at the first list of steps: it reads badly run together
+    lines = text.strip().split("\n\n", 1)[0].splitlines()
+    lead = []
+    for line in lines:
+        if _LIST_ITEM.match(line):
+            break
+        lead.append(line)
+    if not lead:
+        lead = [_LIST_ITEM.sub("", lines[0], count=1)]
+    sentences = _SENTENCE_END.split(" ".join(" ".join(lead).split()))
+    summary = " ".join(sentences[:count])
+    if len(summary) > max_chars:
+        summary = summary[:max_chars].rsplit(" ", 1)[0] + " ..."
+    return summary
+
+
+def format_answer(text: str, response_format: str = "full") -> str:
+    """Render an answer in one of RESPONSE_FORMATS"""
+    if response_format not in RESPONSE_FORMATS:
+        raise ValueError(
+            f"Unknown response_format: {response_format} (expected one of {', '.join(RESPONSE_FORMATS)})"
+        )
+    if response_format == "full":
+        return text
+    sections = parse_answer(text)
+    if response_format == "json":
+        if not sections.structured:
+            return json.dumps({"answer": text}, ensure_ascii=False, separators=(",", ":"))
+        data = {
+            "note": sections.preamble or None,
+            "diagnostic_assessment": sections.assessment,
+            "solution": sections.solution,
+            "notes": sections.notes,
+            "confidence": sections.confidence or sections.confidence_text,
+            "sources": [{"title": title, "url": url} for title, url in sections.sources] or None,
+        }
+        return json.dumps({k: v for k, v in data.items() if v}, ensure_ascii=False, separators=(",", ":"))
+    if not sections.structured:
+        return text
+
+    parts = [sections.preamble] if sections.preamble else []
+    if response_format == "solution_only":
+        parts.append(sections.solution or sections.assessment)
+    else:
+        if sections.assessment:
+            parts.append(f"**Assessment:** {_first_sentences(sections.assessment)}")
+        if sections.solution:
+            parts.append(f"**Solution:** {_first_sentences(sections.solution)}")
+        if sections.confidence or sections.confidence_text:
+            parts.append(f"**Confidence:** {sections.confidence or sections.confidence_text}")
+    return "\n\n".join(parts)
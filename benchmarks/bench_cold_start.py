@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Benchmark: import time and first-call latency of a freshly started server
+
+Two parts, both reported as JSON:
+
+1. Import breakdown: ``python -X importtime -c "import server"`` in a fresh
+   interpreter, summarised per top-level package.
+2. Cold start: launches ``server.py`` over stdio the way an editor does,
+   against the local stand-in (reached as "localhost", so DNS is involved),
+   and times process start to initialized, list_tools, the first call and a
+   second call. The server's own breakdown (import, pre-warm DNS/connect,
+   first call) is read from the konflux://metrics resource. Runs with and
+   without KONFLUX_PREWARM.
+
+Usage:
+    python benchmarks/bench_cold_start.py
+    python benchmarks/bench_cold_start.py --runs 5 --idle 0.5 --output cold.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mcp import ClientSession, StdioServerParameters  # noqa: E402
+from mcp.client.stdio import stdio_client  # noqa: E402
+
+from bench_load import start_fake  # noqa: E402
+
+
+def import_breakdown(top: int) -> dict:
+    """Cumulative import time of server.py per top-level package (ms)"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    packages: dict[str, float] = defaultdict(float)
+    total = 0.0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            _, cumulative, name = line[len("import time:"):].split("|")
+            cumulative_us = int(cumulative)
+        except ValueError:
+            continue  # header line
+        depth = (len(name) - len(name.lstrip())) // 2
+        name = name.strip()
+        if name == "server":
+            total = cumulative_us / 1000
+        elif depth == 1:
+            # Direct imports of server.py (each includes its own dependencies)
+            packages[name.split(".")[0]] += cumulative_us / 1000
+    ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)
+    return {"total_ms": round(total, 1), "by_package_ms": {name: round(ms, 1) for name, ms in ranked[:top]}}
+
+
+async def cold_start(url: str, prewarm: bool, idle: float) -> dict:
+    env = {
+        **os.environ,
+        "KONFLUX_CHATBOT_URL": url,
+        "KONFLUX_CACHE_ENABLED": "false",
+        "KONFLUX_PREWARM": "true" if prewarm else "false",
+    }
+    params = StdioServerParameters(command=sys.executable, args=[os.path.join(ROOT, "server.py")], env=env, cwd=ROOT)
+    started = time.perf_counter()
+    async with stdio_client(params) as (read_stream, write_stream):
+        async with ClientSession(read_stream, write_stream) as session:
+            await session.initialize()
+            initialized = time.perf_counter()
+            await session.list_tools()
+            listed = time.perf_counter()
+            # The user needs a moment to type the question
+            await asyncio.sleep(idle)
+            call_started = time.perf_counter()
+            await session.call_tool("konflux_chat", {"question": "What is Konflux?"})
+            first = time.perf_counter()
+            await session.call_tool("konflux_chat", {"question": "What is Tekton?"})
+            second = time.perf_counter()
+            metrics = await session.read_resource("konflux://metrics")
+    server_side = json.loads(metrics.contents[0].text)["startup"]
+    return {
+        "initialize_ms": (initialized - started) * 1000,
+        "list_tools_ms": (listed - initialized) * 1000,
+        "first_call_ms": (first - call_started) * 1000,
+        "second_call_ms": (second - first) * 1000,
+        "server": server_side,
+    }
+
+
+def summarize(runs: list[dict]) -> dict:
+    def median(values):
+        values = [v for v in values if isinstance(v, (int, float))]
+        return round(statistics.median(values), 2) if values else None
+
+    summary = {key: median(run[key] for run in runs) for key in runs[0] if key != "server"}
+    server_keys = {key for run in runs for key in run["server"]}
+    summary["server"] = {key: median(run["server"].get(key) for run in runs) for key in sorted(server_keys)}
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--idle", type=float, default=0.5, help="Seconds between list_tools and the first call")
+    parser.add_argument("--top", type=int, default=10, help="Packages listed in the import breakdown")
+    parser.add_argument("--output", help="Write the JSON result to this file as well")
+    args = parser.parse_args()
+
+    report = {"benchmark": "bench_cold_start", "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z")}
+    report["imports"] = import_breakdown(args.top)
+
+    process, url = start_fake(argparse.Namespace(), [])
+    url = url.replace("127.0.0.1", "localhost")
+    try:
+        for label, prewarm in (("prewarm", True), ("no_prewarm", False)):
+            runs = [asyncio.run(cold_start(url, prewarm, args.idle)) for _ in range(args.runs)]
+            report[label] = summarize(runs)
+    finally:
+        process.terminate()
+        process.wait()
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
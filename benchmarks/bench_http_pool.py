@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-call HTTP client vs shared connection pool
+
+Runs konflux_chat calls against the local LangServe stand-in and compares
+the old behaviour (a fresh AsyncClient, and therefore a fresh connection, for
+every call) with the shared pooled client owned by KonfluxChatbotMCP.
+
+Usage:
+    python benchmarks/bench_http_pool.py --calls 50
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server  # noqa: E402
+from fake_langserve import FakeLangServe  # noqa: E402
+
+
+ARGS = {"question": "What is Konflux?", "urgency": "medium"}
+
+
+async def per_call_client(url: str, calls: int) -> list[float]:
+    """Old behaviour: a new client (new connection) per call"""
+    latencies = []
+    for _ in range(calls):
+        bot = server.KonfluxChatbotMCP()
+        bot.chatbot_url = url
+        bot.cache = None
+        bot.limiter = None
+        start = time.perf_counter()
+        await bot._chat(ARGS)
+        latencies.append(time.perf_counter() - start)
+        await bot.shutdown()
+    return latencies
+
+
+async def pooled_client(url: str, calls: int) -> list[float]:
+    """New behaviour: one client shared by all calls"""
+    bot = server.KonfluxChatbotMCP()
+    bot.chatbot_url = url
+    bot.cache = None
+    bot.limiter = None
+    await bot.startup()
+    latencies = []
+    try:
+        for _ in range(calls):
+            start = time.perf_counter()
+            await bot._chat(ARGS)
+            latencies.append(time.perf_counter() - start)
+    finally:
+        await bot.shutdown()
+    return latencies
+
+
+def summarize(name: str, latencies: list[float]) -> None:
+    ms = sorted(x * 1000 for x in latencies)
+    p95 = ms[int(0.95 * (len(ms) - 1))]
+    print(f"{name:<18} mean={statistics.mean(ms):7.2f} ms  p50={statistics.median(ms):7.2f} ms  p95={p95:7.2f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--url", help="Benchmark an existing backend instead of the local stand-in")
+    args = parser.parse_args()
+
+    if args.url:
+        summarize("per-call client", await per_call_client(args.url, args.calls))
+        summarize("pooled client", await pooled_client(args.url, args.calls))
+        return
+
+    async with FakeLangServe() as fake:
+        # Warm up the stand-in so both runs see the same server state
+        await pooled_client(fake.url, 3)
+        summarize("per-call client", await per_call_client(fake.url, args.calls))
+        summarize("pooled client", await pooled_client(fake.url, args.calls))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
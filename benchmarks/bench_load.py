@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+End-to-end load benchmark: MCP call_tool handler against the local stand-in
+
+Starts fake_langserve.py in a child process (so its CPU and memory are not
+counted), then drives KonfluxChatbotMCP through the server's registered
+call_tool handler -- the same path a client request takes after JSON-RPC
+decoding -- at a fixed concurrency. Reports latency percentiles, time to
+first byte, throughput, CPU time and peak RSS of this process as JSON, so
+runs can be stored and compared.
+
+The response cache and similarity index are off unless --cache is given, so
+every call goes upstream.
+
+Usage:
+    python benchmarks/bench_load.py --calls 500 --concurrency 32
+    python benchmarks/bench_load.py --tool konflux_chat_stream --first-event-delay 0.3 --tokens-per-second 50
+    python benchmarks/bench_load.py --output run.json --baseline previous.json
+    python benchmarks/bench_load.py --url http://127.0.0.1:8080   # already running backend
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import time
+from collections import deque
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mcp import types  # noqa: E402
+
+import server  # noqa: E402
+from fake_langserve import add_config_arguments  # noqa: E402
+
+
+# Keys compared against --baseline (lower is better for all but throughput)
+COMPARED = ["latency_ms.p50", "latency_ms.p95", "latency_ms.p99", "ttfb_ms.p50", "ttfb_ms.p95",
+            "throughput_per_s", "cpu_ms_per_call", "peak_rss_mb"]
+
+
+def percentiles(samples: list[float]) -> dict:
+    if not samples:
+        return {"p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    ordered = sorted(samples)
+
+    def pick(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))], 2)
+
+    return {"p50": pick(50), "p95": pick(95), "p99": pick(99),
+            "mean": round(sum(ordered) / len(ordered), 2), "max": round(ordered[-1], 2)}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_fake(args: argparse.Namespace, forwarded: list[str]) -> tuple[subprocess.Popen, str]:
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "fake_langserve.py"), "--port", str(port), *forwarded],
+    )
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return process, f"http://127.0.0.1:{port}"
+        except OSError:
+            if process.poll() is not None:
+                break
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("fake_langserve.py did not start")
+
+
+def forwarded_fake_arguments(args: argparse.Namespace, parser: argparse.ArgumentParser) -> list[str]:
+    """Options of the stand-in that differ from their defaults"""
+    forwarded = []
+    for action in parser._fake_actions:
+        value = getattr(args, action.dest)
+        if value != action.default:
+            forwarded += [action.option_strings[0], str(value)]
+    return forwarded
+
+
+def tool_arguments(args: argparse.Namespace, index: int) -> dict:
+    question = args.question if args.repeat_question else f"{args.question} (#{index})"
+    arguments = {"question": question, "urgency": args.urgency}
+    if args.tool == "konflux_chat_batch":
+        return {"questions": [{**arguments, "question": f"{question} [{i}]"} for i in range(args.batch_size)]}
+    return arguments
+
+
+async def run_load(args: argparse.Namespace, url: str) -> dict:
+    server.MAX_UPSTREAM_STREAMS = args.max_upstream
+    bot = server.KonfluxChatbotMCP()
+    bot.chatbot_url = url
+    if not args.cache:
+        bot.cache = None
+        bot.similar = None
+    # Every call shares one limiter key; the benchmark measures the upstream path, not rejections
+    bot.limiter = None
+    bot.recent_calls = deque()  # keep every call's timing, not just the last 100
+    handler = bot.server.request_handlers[types.CallToolRequest]
+    await bot.startup()
+
+    async def call(index: int) -> tuple[float, bool]:
+        request = types.CallToolRequest(
+            method="tools/call",
+            params=types.CallToolRequestParams(name=args.tool, arguments=tool_arguments(args, index)),
+        )
+        started = time.perf_counter()
+        result = await handler(request)
+        elapsed = (time.perf_counter() - started) * 1000
+        text = " ".join(getattr(block, "text", "") for block in result.root.content)
+        ok = not result.root.isError and "Diagnostic Assessment" in text
+        return elapsed, ok
+
+    # Warm up the pool and the tool definition cache outside the measurement
+    for i in range(min(args.warmup, args.calls)):
+        await call(-1 - i)
+    bot.recent_calls.clear()
+
+    latencies: list[float] = []
+    errors = 0
+    next_index = iter(range(args.calls))
+
+    async def worker():
+        nonlocal errors
+        for index in next_index:
+            elapsed, ok = await call(index)
+            latencies.append(elapsed)
+            errors += not ok
+
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    wall_started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    wall = time.perf_counter() - wall_started
+    usage_after = resource.getrusage(resource.RUSAGE_SELF)
+
+    metrics = bot.metrics()
+    await bot.shutdown()
+
+    cpu_user = usage_after.ru_utime - usage_before.ru_utime
+    cpu_system = usage_after.ru_stime - usage_before.ru_stime
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss_scale = 1 if platform.system() == "Darwin" else 1024
+    ttfb = [timing["ttfb_ms"] for timing in bot.recent_calls if timing.get("ttfb_ms") is not None]
+    return {
+        "calls": args.calls,
+        "errors": errors,
+        "wall_s": round(wall, 3),
+        "throughput_per_s": round(args.calls / wall, 2),
+        "latency_ms": percentiles(latencies),
+        "ttfb_ms": percentiles(ttfb),
+        "cpu_user_s": round(cpu_user, 3),
+        "cpu_system_s": round(cpu_system, 3),
+        "cpu_ms_per_call": round((cpu_user + cpu_system) / args.calls * 1000, 3),
+        "peak_rss_mb": round(usage_after.ru_maxrss * rss_scale / 1e6, 1),
+        "upstream": {
+            "requests": metrics["upstream_requests"],
+            "coalesced": metrics["coalesced_calls"],
+            **metrics["upstream_totals"],
+            "retries": metrics["resilience"]["retries"],
+        },
+    }
+
+
+def lookup(result: dict, dotted: str):
+    for part in dotted.split("."):
+        result = result.get(part) if isinstance(result, dict) else None
+    return result
+
+
+def compare(result: dict, baseline: dict) -> dict:
+    """Relative change of the headline numbers against an earlier run"""
+    changes = {}
+    for key in COMPARED:
+        new, old = lookup(result["results"], key), lookup(baseline.get("results", {}), key)
+        if isinstance(new, (int, float)) and isinstance(old, (int, float)) and old:
+            changes[key] = {"baseline": old, "current": new, "change_pct": round((new - old) / old * 100, 1)}
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--tool", default="konflux_chat",
+                        choices=["konflux_chat", "konflux_chat_stream", "konflux_chat_batch"])
+    parser.add_argument("--batch-size", type=int, default=5, help="Questions per konflux_chat_batch call")
+    parser.add_argument("--question", default="What is Konflux?")
+    parser.add_argument("--urgency", default="medium", choices=["low", "medium", "high"])
+    parser.add_argument("--repeat-question", action="store_true", help="Send the same question every time")
+    parser.add_argument("--cache", action="store_true", help="Keep the response cache and similarity index on")
+    parser.add_argument("--max-upstream", type=int, default=server.MAX_UPSTREAM_STREAMS,
+                        help="Concurrent upstream streams (KONFLUX_MAX_UPSTREAM_STREAMS)")
+    parser.add_argument("--url", help="Use a running backend instead of starting the stand-in")
+    parser.add_argument("--output", help="Write the JSON result to this file as well")
+    parser.add_argument("--baseline", help="Earlier JSON result to compare against")
+    fake_group = parser.add_argument_group("stand-in options (ignored with --url)")
+    before = len(parser._actions)
+    add_config_arguments(fake_group)
+    parser._fake_actions = parser._actions[before:]
+    args = parser.parse_args()
+
+    process = None
+    url = args.url
+    if not url:
+        process, url = start_fake(args, forwarded_fake_arguments(args, parser))
+    try:
+        results = asyncio.run(run_load(args, url))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    report = {
+        "benchmark": "bench_load",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "results": results,
+    }
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            report["comparison"] = compare(report, json.load(f))
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
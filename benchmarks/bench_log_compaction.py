@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Benchmark: log compaction throughput and size reduction
+
+Generates synthetic Tekton-style PipelineRun logs (ANSI colours, timestamps,
+progress lines, a Java stack trace and a failing step) of increasing size and
+runs log_compaction.compact_log over them. Throughput should stay flat as the
+input grows (the compaction is linear).
+
+Usage:
+    python benchmarks/bench_log_compaction.py
+    python benchmarks/bench_log_compaction.py --sizes 1 2 4 8 --max-bytes 16000
+    python benchmarks/bench_log_compaction.py --log pipelinerun.log
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from log_compaction import compact_log  # noqa: E402
+
+
+def synthetic_log(target_bytes: int, seed: int = 1) -> str:
+    rng = random.Random(seed)
+    lines = []
+    size = 0
+    step = 0
+    while size < target_bytes:
+        step += 1
+        block = [f"\x1b[1mstep-build-{step}\x1b[0m Starting container"]
+        block += [f"2025-10-24T10:{i % 60:02d}:{rng.randrange(60):02d}.{rng.randrange(1000):03d}Z "
+                  f"Copying blob sha256:{rng.getrandbits(64):016x} {i}/{200} MB" for i in range(200)]
+        block += [f"[INFO] Compiling module-{rng.randrange(500)} ({rng.randrange(10_000)} classes)"
+                  for _ in range(50)]
+        if step % 10 == 0:
+            block.append("\x1b[31m[ERROR]\x1b[0m Failed to execute goal: compilation failure")
+            block.append("java.lang.IllegalStateException: missing dependency")
+            block += [f"\tat com.example.Build{i}.run(Build{i}.java:{i + 10})" for i in range(60)]
+        chunk = "\n".join(block) + "\n"
+        lines.append(chunk)
+        size += len(chunk)
+    return "".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=float, nargs="+", default=[0.5, 1, 2, 4, 8], help="Synthetic log sizes in MB")
+    parser.add_argument("--log", action="append", default=[], help="Real log file (repeatable)")
+    parser.add_argument("--max-bytes", type=int, default=16000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    logs = {}
+    for path in args.log:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            logs[os.path.basename(path)] = f.read()
+    if not logs:
+        for mb in args.sizes:
+            logs[f"synthetic {mb:g} MB"] = synthetic_log(int(mb * 1_000_000))
+
+    for name, text in logs.items():
+        compact_log(text, max_bytes=args.max_bytes)  # warm up
+        start = time.process_time()
+        for _ in range(args.repeat):
+            result = compact_log(text, max_bytes=args.max_bytes)
+        cpu = (time.process_time() - start) / args.repeat
+        print(
+            f"{name:<20} {result.original_bytes / 1e6:6.2f} MB -> {result.compacted_bytes / 1e3:6.1f} KB "
+            f"({result.original_lines} -> {result.compacted_lines} lines)  "
+            f"cpu={cpu * 1000:8.1f} ms  {result.original_bytes / 1e6 / cpu:6.1f} MB/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Benchmark: peak memory while reading many streams with oversized events
+
+Runs --concurrency konflux_chat calls at once against the local stand-in,
+each of whose responses carries a retrieved-documents event of about
+--documents x --document-size bytes, and samples the server process's RSS
+while they run. With the stream limits on (KONFLUX_MAX_EVENT_BYTES,
+KONFLUX_MAX_RESPONSE_BYTES) the oversized events are skipped as they
+arrive, so peak RSS should stay flat however large they are; with the
+limits off every stream buffers its whole event first.
+
+The bounded run goes first: memory the unbounded run takes is not always
+returned to the OS.
+
+Usage:
+    python benchmarks/bench_memory.py
+    python benchmarks/bench_memory.py --concurrency 50 --documents 2 --document-size 4000000 --rounds 3
+    python benchmarks/bench_memory.py --mode bounded --output memory.json --baseline previous.json
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import resource
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import server  # noqa: E402
+from bench_load import forwarded_fake_arguments, start_fake  # noqa: E402
+from fake_langserve import add_config_arguments  # noqa: E402
+from scheduler import PriorityScheduler  # noqa: E402
+
+
+# Keys compared against --baseline (lower is better)
+COMPARED = ["bounded.peak_growth_mb", "bounded.wall_s", "unbounded.peak_growth_mb"]
+
+
+def rss_bytes() -> int:
+    """Current resident set size (the peak so far where /proc is missing)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+async def run_round(bot: server.KonfluxChatbotMCP, args: argparse.Namespace, round_index: int) -> dict:
+    gc.collect()
+    before = rss_bytes()
+    peak = before
+    done = asyncio.Event()
+
+    async def sample():
+        nonlocal peak
+        while not done.is_set():
+            peak = max(peak, rss_bytes())
+            await asyncio.sleep(0.005)
+
+    sampler = asyncio.create_task(sample())
+    bot.recent_calls.clear()
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        bot._chat({"question": f"Why is my build failing? (#{round_index}-{i})",
+                   "include_sources": args.include_sources})
+        for i in range(args.concurrency)
+    ))
+    wall = time.perf_counter() - started
+    done.set()
+    await sampler
+    peak = max(peak, rss_bytes())
+    outcomes: dict[str, int] = {}
+    for call in bot.recent_calls:
+        outcomes[call["outcome"]] = outcomes.get(call["outcome"], 0) + 1
+    return {
+        "rss_before_mb": round(before / 1e6, 1),
+        "peak_rss_mb": round(peak / 1e6, 1),
+        "peak_growth_mb": round((peak - before) / 1e6, 1),
+        "wall_s": round(wall, 3),
+        "outcomes": outcomes,
+    }
+
+
+async def run_mode(args: argparse.Namespace, url: str, bounded: bool) -> dict:
+    server.MAX_EVENT_BYTES = args.max_event_bytes if bounded else 0
+    server.MAX_RESPONSE_BYTES = args.max_response_bytes if bounded else 0
+    server.HTTP_MAX_CONNECTIONS = args.concurrency
+    # Unfiltered, the stand-in sends the documents event as a backend ignoring the filter would
+    server.STREAM_LOG_FILTER = args.filter
+    bot = server.KonfluxChatbotMCP()
+    bot.chatbot_url = url
+    bot.cache = None
+    bot.similar = None
+    bot.limiter = None
+    # Every call streams at once instead of queueing for an upstream slot
+    bot.scheduler = PriorityScheduler(max_concurrent=args.concurrency, max_queue=args.concurrency)
+    # One call first, so the HTTP client and imports are not counted as stream memory
+    await bot._chat({"question": "Why is my build failing? (warm-up)"})
+    rounds = [await run_round(bot, args, i) for i in range(args.rounds)]
+    await bot.shutdown()
+    return {
+        "max_event_bytes": server.MAX_EVENT_BYTES,
+        "max_response_bytes": server.MAX_RESPONSE_BYTES,
+        "peak_rss_mb": max(r["peak_rss_mb"] for r in rounds),
+        "peak_growth_mb": max(r["peak_growth_mb"] for r in rounds),
+        "wall_s": round(sum(r["wall_s"] for r in rounds), 3),
+        "stream_limits": dict(bot.stream_limit_stats),
+        "rounds": rounds,
+    }
+
+
+def compare(result: dict, baseline: dict) -> dict:
+    changes = {}
+    for key in COMPARED:
+        new, old = result, baseline.get("results", {})
+        for part in key.split("."):
+            new = new.get(part) if isinstance(new, dict) else None
+            old = old.get(part) if isinstance(old, dict) else None
+        if isinstance(new, (int, float)) and isinstance(old, (int, float)) and old:
+            changes[key] = {"baseline": old, "current": new, "change_pct": round((new - old) / old * 100, 1)}
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=50, help="Calls streaming at the same time")
+    parser.add_argument("--rounds", type=int, default=3, help="Batches of concurrent calls per mode")
+    parser.add_argument("--mode", choices=["bounded", "unbounded", "both"], default="both",
+                        help="Stream limits on, off, or one run of each")
+    parser.add_argument("--max-event-bytes", type=int, default=server.MAX_EVENT_BYTES or 1024 * 1024)
+    parser.add_argument("--max-response-bytes", type=int, default=server.MAX_RESPONSE_BYTES or 32 * 1024 * 1024)
+    parser.add_argument("--filter", action="store_true",
+                        help="Send the usual sub-run filter (the stand-in then leaves out the documents event)")
+    parser.add_argument("--include-sources", action="store_true",
+                        help="Ask for sources (their event is still dropped when oversized)")
+    parser.add_argument("--output", help="Write the JSON result to this file as well")
+    parser.add_argument("--baseline", help="Earlier JSON result to compare against")
+    fake_group = parser.add_argument_group("stand-in options")
+    before = len(parser._actions)
+    add_config_arguments(fake_group)
+    parser._fake_actions = parser._actions[before:]
+    # Oversized retrieved-documents events by default (2 x 4 MB in one event)
+    parser.set_defaults(documents=2, document_size=4_000_000)
+    args = parser.parse_args()
+
+    forwarded = forwarded_fake_arguments(args, parser)
+    forwarded += ["--documents", str(args.documents), "--document-size", str(args.document_size)]
+    process, url = start_fake(args, forwarded)
+    try:
+        results = {}
+        if args.mode in ("bounded", "both"):
+            results["bounded"] = asyncio.run(run_mode(args, url, bounded=True))
+        if args.mode in ("unbounded", "both"):
+            results["unbounded"] = asyncio.run(run_mode(args, url, bounded=False))
+    finally:
+        process.terminate()
+        process.wait()
+
+    report = {
+        "benchmark": "bench_memory",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "results": results,
+    }
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            report["comparison"] = compare(results, json.load(f))
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
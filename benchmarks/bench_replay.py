@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Benchmark: parsing/streaming path replayed from recorded /stream_log responses
+
+Feeds every capture in an archive (see KONFLUX_CAPTURE_MODE) through the
+server's stream reading, parsing and partial-answer broadcasting code, with
+no network involved, so runs are deterministic and comparable. Reports
+parse CPU per response, throughput in events and bytes per second and, at
+--speed > 0, how closely the replay kept the recorded pacing.
+
+Without --archive, a temporary archive is recorded first from the local
+stand-in (which accepts the usual fake_langserve.py options).
+
+Usage:
+    python benchmarks/bench_replay.py
+    python benchmarks/bench_replay.py --archive ~/.cache/konflux-chatbot-mcp/captures.sqlite3 --repeat 20
+    python benchmarks/bench_replay.py --record 20 --answer-words 2000 --documents 8 --no-filter --stream
+    python benchmarks/bench_replay.py --speed 1 --output replay.json --baseline previous.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import server  # noqa: E402
+from bench_load import forwarded_fake_arguments, percentiles, start_fake  # noqa: E402
+from fake_langserve import add_config_arguments  # noqa: E402
+from resilience import Race  # noqa: E402
+from stream_capture import CaptureArchive, replay_lines  # noqa: E402
+
+
+# Keys compared against --baseline (lower is better for all but the rates)
+COMPARED = ["parse_ms.p50", "parse_ms.p95", "cpu_ms_per_replay", "events_per_s", "mb_per_s"]
+
+
+async def record(args: argparse.Namespace, url: str, path: str) -> None:
+    """Ask --record distinct questions with capturing on"""
+    server.CAPTURE_MODE = "record"
+    server.STREAM_LOG_FILTER = not args.no_filter
+    bot = server.KonfluxChatbotMCP()
+    bot.chatbot_url = url
+    bot.cache = None
+    bot.similar = None
+    bot.captures = CaptureArchive(path)
+    for i in range(args.record):
+        await bot._chat({"question": f"Why is my build failing? (#{i})"})
+    await bot.shutdown()
+
+
+async def replay(args: argparse.Namespace, path: str) -> dict:
+    archive = CaptureArchive(path)
+    captures = [archive.load(key) for key in archive.keys()]
+    archive.close()
+    if not captures:
+        raise SystemExit(f"No captures in {path}")
+    bot = server.KonfluxChatbotMCP()
+    bot.cache = None
+
+    parse_ms, drift_ms, events, wire_bytes = [], [], 0, 0
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    wall_started = time.perf_counter()
+    for _ in range(args.repeat):
+        for capture in captures:
+            flight = server._Flight()
+            if args.stream:
+                flight.add_listener(lambda text: None)
+            started = time.perf_counter()
+            parser, parse_time = await bot._read_stream(
+                replay_lines(capture, args.speed), 0, Race(), flight, False, {}, started
+            )
+            bot._finish_stream(parser, parse_time, capture.wire_bytes, {}, flight, {})
+            if args.speed > 0:
+                drift_ms.append((time.perf_counter() - started - capture.duration / args.speed) * 1000)
+            parse_ms.append(flight.upstream["parse_ms"])
+            events += flight.upstream["events"]
+            wire_bytes += capture.wire_bytes
+    wall = time.perf_counter() - wall_started
+    usage_after = resource.getrusage(resource.RUSAGE_SELF)
+    await bot.shutdown()
+
+    cpu = (usage_after.ru_utime - usage_before.ru_utime) + (usage_after.ru_stime - usage_before.ru_stime)
+    replays = len(parse_ms)
+    return {
+        "captures": len(captures),
+        "replays": replays,
+        "events": events,
+        "wire_bytes": wire_bytes,
+        "wall_s": round(wall, 3),
+        "parse_ms": percentiles(parse_ms),
+        "cpu_ms_per_replay": round(cpu / replays * 1000, 3),
+        "events_per_s": round(events / wall, 1),
+        "mb_per_s": round(wire_bytes / wall / 1e6, 2),
+        "pacing_drift_ms": percentiles(drift_ms),
+    }
+
+
+def compare(result: dict, baseline: dict) -> dict:
+    changes = {}
+    for key in COMPARED:
+        new, old = result, baseline.get("results", {})
+        for part in key.split("."):
+            new = new.get(part) if isinstance(new, dict) else None
+            old = old.get(part) if isinstance(old, dict) else None
+        if isinstance(new, (int, float)) and isinstance(old, (int, float)) and old:
+            changes[key] = {"baseline": old, "current": new, "change_pct": round((new - old) / old * 100, 1)}
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--archive", help="Capture archive to replay (default: record a temporary one)")
+    parser.add_argument("--record", type=int, default=10, help="Responses to record when no --archive is given")
+    parser.add_argument("--no-filter", action="store_true",
+                        help="Record unfiltered streams (every sub-run log, like KONFLUX_STREAM_LOG_FILTER=false)")
+    parser.add_argument("--repeat", type=int, default=10, help="Times every capture is replayed")
+    parser.add_argument("--speed", type=float, default=0.0, help="Replay speed (1 = recorded pace, 0 = no delays)")
+    parser.add_argument("--stream", action="store_true", help="Attach a listener so partial answers are broadcast")
+    parser.add_argument("--output", help="Write the JSON result to this file as well")
+    parser.add_argument("--baseline", help="Earlier JSON result to compare against")
+    fake_group = parser.add_argument_group("stand-in options (recording only)")
+    before = len(parser._actions)
+    add_config_arguments(fake_group)
+    parser._fake_actions = parser._actions[before:]
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = args.archive
+        if not path:
+            path = os.path.join(directory, "captures.sqlite3")
+            process, url = start_fake(args, forwarded_fake_arguments(args, parser))
+            try:
+                asyncio.run(record(args, url, path))
+            finally:
+                process.terminate()
+                process.wait()
+        results = asyncio.run(replay(args, path))
+
+    report = {
+        "benchmark": "bench_replay",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "results": results,
+    }
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            report["comparison"] = compare(results, json.load(f))
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark: near-duplicate question index lookup latency
+
+Fills a similarity_index.SimilarityIndex with synthetic Konflux questions
+(all in one tenant/component scope, the worst case) and measures insert
+and lookup latency, plus how often paraphrases of indexed questions are
+found.
+
+Usage:
+    python benchmarks/bench_similarity_index.py
+    python benchmarks/bench_similarity_index.py --entries 100000 --lookups 5000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from similarity_index import SimilarityIndex  # noqa: E402
+
+
+VERBS = ["rerun", "configure", "add", "delete", "debug", "update", "rotate", "promote", "release", "inspect",
+         "pin", "scan", "sign", "verify", "mirror", "onboard", "migrate", "label", "cache", "tag"]
+OBJECTS = ["build", "pipeline", "secret", "component", "application", "snapshot", "release plan", "integration test",
+           "enterprise contract", "image", "repository", "webhook", "task bundle", "environment", "quota",
+           "service account", "nudge", "renovate config", "git submodule", "multi-arch build"]
+CONTEXTS = ["tenant", "namespace", "pull request", "push event", "staging", "production", "fork", "monorepo",
+            "dockerfile", "buildah task", "hermetic build", "prefetch", "sbom", "cosign", "clair", "ec policy",
+            "private registry", "proxy", "arm64", "s390x"]
+# Prefix/suffix words that change the wording but not the meaning
+PARAPHRASES = [("how do I {q}", "how to {q}"), ("how can I {q}", "what is the way to {q}"),
+               ("{q}?", "please help me {q}")]
+
+
+def synthetic_question(rng: random.Random, index: int) -> str:
+    verb, obj, ctx = rng.choice(VERBS), rng.choice(OBJECTS), rng.choice(CONTEXTS)
+    # A unique identifier keeps the 100k questions distinct, as real ones are
+    return f"how do I {verb} the {obj} for {ctx} in app{index}"
+
+
+def percentile(samples: list[float], p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    index = SimilarityIndex(threshold=args.threshold, max_entries=args.entries)
+    scope = ("tenant", "component")
+    questions = [synthetic_question(rng, i) for i in range(args.entries)]
+
+    start = time.perf_counter()
+    for i, question in enumerate(questions):
+        index.add(scope, question, f"key{i}")
+    insert_us = (time.perf_counter() - start) / len(questions) * 1e6
+
+    hit_latencies, miss_latencies, found = [], [], 0
+    for i in range(args.lookups):
+        target = rng.randrange(args.entries)
+        plain = questions[target][len("how do I "):]
+        original, paraphrase = rng.choice(PARAPHRASES)
+        start = time.perf_counter()
+        match = index.lookup(scope, paraphrase.format(q=plain.replace("the ", "a ")))
+        hit_latencies.append(time.perf_counter() - start)
+        found += match is not None and match.key == f"key{target}"
+
+        start = time.perf_counter()
+        index.lookup(scope, f"why is my {rng.choice(OBJECTS)} stuck in unknown-{i}")
+        miss_latencies.append(time.perf_counter() - start)
+
+    print(f"entries={len(index)} insert={insert_us:.1f} us/question")
+    for label, samples in (("paraphrase lookup", hit_latencies), ("unrelated lookup", miss_latencies)):
+        print(f"  {label:<18} mean={statistics.mean(samples) * 1e6:7.1f} us  "
+              f"p50={percentile(samples, 50) * 1e6:7.1f} us  p99={percentile(samples, 99) * 1e6:7.1f} us")
+    print(f"  paraphrases found: {found}/{args.lookups}  "
+          f"avg candidates/lookup: {index.stats['candidates'] / index.stats['lookups']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
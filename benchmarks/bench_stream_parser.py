@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: /stream_log parsing CPU time and peak memory per response
+
+Compares the original loop (json.loads on every data: line, walk every op)
+with stream_parser.StreamLogParser over multi-megabyte stream_log captures.
+Captures are raw SSE bodies as received from /stream_log; without --capture
+a synthetic one is generated with the local stand-in's event shapes.
+
+Usage:
+    python benchmarks/bench_stream_parser.py
+    python benchmarks/bench_stream_parser.py --capture recorded.sse [--capture other.sse]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_langserve import FakeConfig, stream_log_events  # noqa: E402
+from stream_parser import StreamLogParser  # noqa: E402
+
+
+def legacy_parse(lines: list[str]):
+    """The pre-parser loop from server.py"""
+    final_output = None
+    for line in lines:
+        if line.startswith("data: "):
+            try:
+                data = json.loads(line[6:])
+                if isinstance(data, dict) and "ops" in data:
+                    for op in data["ops"]:
+                        if op.get("path") == "/final_output" and "value" in op:
+                            final_output = op["value"]
+                        elif op.get("op") == "replace" and op.get("path") == "/final_output":
+                            final_output = op.get("value")
+            except json.JSONDecodeError:
+                continue
+    return final_output
+
+
+def parser_parse(lines: list[str]):
+    parser = StreamLogParser()
+    for line in lines:
+        if parser.feed_line(line):
+            break
+    return parser.result()
+
+
+def parser_parse_streaming(lines: list[str]):
+    """As konflux_chat_stream uses it: partial text tracked as well"""
+    parser = StreamLogParser(on_partial=lambda text: None)
+    for line in lines:
+        if parser.feed_line(line):
+            break
+    return parser.result()
+
+
+def synthetic_capture(documents: int, document_size: int, answer_words: int) -> str:
+    answer = " ".join(f"word{i}" for i in range(answer_words))
+    config = FakeConfig(answer=answer, documents=documents, document_size=document_size)
+    return b"".join(chunk for _, chunk in stream_log_events(config)).decode()
+
+
+def measure(fn, lines: list[str], repeat: int) -> tuple[float, int]:
+    """Return (CPU seconds per response, peak traced bytes)"""
+    fn(lines)  # warm up
+    start = time.process_time()
+    for _ in range(repeat):
+        fn(lines)
+    cpu = (time.process_time() - start) / repeat
+
+    tracemalloc.start()
+    fn(lines)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return cpu, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--capture", action="append", default=[], help="Raw SSE capture file (repeatable)")
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--document-size", type=int, default=100_000)
+    parser.add_argument("--answer-words", type=int, default=400)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    captures = {}
+    for path in args.capture:
+        with open(path, encoding="utf-8") as f:
+            captures[os.path.basename(path)] = f.read()
+    if not captures:
+        captures["synthetic"] = synthetic_capture(args.documents, args.document_size, args.answer_words)
+
+    for name, body in captures.items():
+        lines = body.splitlines()
+        assert legacy_parse(lines) == parser_parse(lines), "parsers disagree"
+        print(f"{name}: {len(body) / 1e6:.2f} MB, {len(lines)} lines")
+        for label, fn in (
+            ("legacy json loop", legacy_parse),
+            ("parser", parser_parse),
+            ("parser + partials", parser_parse_streaming),
+        ):
+            cpu, peak = measure(fn, lines, args.repeat)
+            print(f"  {label:<18} cpu={cpu * 1000:8.2f} ms/response  peak={peak / 1e6:7.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
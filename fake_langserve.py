@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Local LangServe stand-in for offline testing and benchmarks
+
+Serves a minimal ``/stream_log`` endpoint that emits Server-Sent Events with
+the same JSON-patch shape as the real Konflux chatbot backend, so the MCP
+server can be exercised without VPN access.
+
+Latency, token rate, payload size and failures are configurable (see
+``FakeConfig`` or ``--help``).
+
+Usage:
+    python fake_langserve.py --port 8080
+    python fake_langserve.py --port 8080 --first-event-delay 0.5 --tokens-per-second 40 --failure-rate 0.05
+    KONFLUX_CHATBOT_URL=http://127.0.0.1:8080 python server.py
+"""
+
+import argparse
+import asyncio
+import json
+import random
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+
+DEFAULT_ANSWER = (
+    "**Diagnostic Assessment:** This is a canned answer from the local LangServe stand-in.\n\n"
+    "**Solution/Answer:** Konflux is a secure software factory built on Tekton.\n\n"
+    "**Notes:** No real backend was contacted.\n\n"
+    "**Confidence Level:** High"
+)
+
+
+@dataclass
+class FakeConfig:
+    """Behaviour knobs for the stand-in server"""
+    answer: str = DEFAULT_ANSWER
+    answer_words: int = 0  # when > 0, pad the answer to about this many words
+    first_event_delay: float = 0.0  # seconds before the first SSE event
+    latency_jitter: float = 0.0  # up to this many extra seconds before the first event
+    token_delay: float = 0.0  # seconds between streamed tokens
+    documents: int = 4  # retrieved documents reported in the run log
+    document_size: int = 2000  # characters of page content per document
+    # Fault injection
+    down: bool = False  # refuse every request, health checks included (a redeploy)
+    fail_first: int = 0  # fail this many requests before behaving normally
+    failure_rate: float = 0.0  # probability that a request fails
+    failure_status: int = 503  # HTTP status returned by failing requests
+    slow_first: int = 0  # stall requests up to this request number
+    slow_rate: float = 0.0  # probability that a request stalls before its first event
+    slow_delay: float = 0.0  # seconds a stalled request waits
+    error_rate: float = 0.0  # probability that a stream stops half way with an error event
+    linger: float = 0.0  # seconds the connection stays open after the end event
+    seed: Optional[int] = None  # seed for the random fault decisions
+
+
+def answer_text(config: FakeConfig) -> str:
+    """The answer the stand-in streams, padded to config.answer_words"""
+    missing = config.answer_words - len(config.answer.split())
+    if missing <= 0:
+        return config.answer
+    filler = " ".join(f"detail{i}" for i in range(missing))
+    return config.answer.replace("**Notes:**", f"**Notes:** {filler}", 1)
+
+
+def _sse(data: dict, event: str = "data") -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+
+def _tokens(text: str) -> list[str]:
+    """Split text into word-sized chunks, keeping the separators"""
+    words = text.split(" ")
+    return [w + " " for w in words[:-1]] + [words[-1]]
+
+
+def _log_entry(run_id: str, name: str, run_type: str, tags: list[str]) -> dict:
+    return {
+        "id": run_id, "name": name, "type": run_type, "tags": tags,
+        "metadata": {}, "start_time": "2025-01-01T00:00:00.000+00:00",
+        "streamed_output": [], "streamed_output_str": [],
+        "final_output": None, "end_time": None,
+    }
+
+
+def _included(entry: dict, request: dict) -> bool:
+    """LangServe/LangChain include_*/exclude_* semantics for a sub-run log"""
+    include_names = request.get("include_names")
+    include_types = request.get("include_types")
+    include_tags = request.get("include_tags")
+    if include_names is None and include_types is None and include_tags is None:
+        include = True
+    else:
+        include = (
+            entry["name"] in (include_names or [])
+            or entry["type"] in (include_types or [])
+            or any(tag in (include_tags or []) for tag in entry["tags"])
+        )
+    if entry["name"] in (request.get("exclude_names") or []):
+        include = False
+    if entry["type"] in (request.get("exclude_types") or []):
+        include = False
+    if any(tag in (request.get("exclude_tags") or []) for tag in entry["tags"]):
+        include = False
+    return include
+
+
+def stream_log_events(
+    config: FakeConfig, request: Optional[dict] = None, fail_midway: bool = False
+) -> Iterator[tuple[float, bytes]]:
+    """Yield (delay_before, sse_bytes) pairs for one /stream_log response
+
+    The shape follows LangServe's RunLogPatch stream for a retrieval chain:
+    root run, retriever log entry with its documents, LLM log entry with
+    streamed tokens, root streamed_output/final_output patches, end event.
+    Sub-run logs honour the request's include_*/exclude_* filters. With
+    fail_midway the stream ends with an error event half way through the
+    answer, as LangServe does when the chain raises.
+    """
+    request = request or {}
+    yield config.first_event_delay, _sse({"ops": [{"op": "replace", "path": "", "value": {
+        "id": "fake-run", "streamed_output": [], "final_output": None,
+        "logs": {}, "name": "RunnableSequence", "type": "chain",
+    }}]})
+
+    retriever = _log_entry("fake-retriever", "Retriever", "retriever", ["seq:step:1"])
+    if config.documents and _included(retriever, request):
+        yield 0.0, _sse({"ops": [{"op": "add", "path": "/logs/Retriever", "value": retriever}]})
+        filler = ("Konflux documentation excerpt. " * (config.document_size // 31 + 1))[:config.document_size]
+        documents = [
+            {"page_content": filler, "type": "Document",
+             "metadata": {"source": f"https://konflux-ci.dev/docs/page-{i}", "title": f"Page {i}"}}
+            for i in range(config.documents)
+        ]
+        yield 0.0, _sse({"ops": [
+            {"op": "add", "path": "/logs/Retriever/final_output", "value": {"documents": documents}},
+            {"op": "add", "path": "/logs/Retriever/end_time", "value": "2025-01-01T00:00:01.000+00:00"},
+        ]})
+
+    llm = _log_entry("fake-llm", "ChatModel", "llm", ["seq:step:3"])
+    llm_included = _included(llm, request)
+    if llm_included:
+        yield 0.0, _sse({"ops": [{"op": "add", "path": "/logs/ChatModel", "value": llm}]})
+    accumulated = ""
+    tokens = _tokens(answer_text(config))
+    for index, token in enumerate(tokens):
+        if fail_midway and index == len(tokens) // 2:
+            yield 0.0, _sse({"status_code": 500, "message": "Internal Server Error"}, event="error")
+            return
+        accumulated += token
+        if llm_included:
+            yield config.token_delay, _sse({"ops": [
+                {"op": "add", "path": "/logs/ChatModel/streamed_output_str/-", "value": token},
+            ]})
+        elif config.token_delay:
+            yield config.token_delay, b""
+        yield 0.0, _sse({"ops": [
+            {"op": "add", "path": "/streamed_output/-", "value": token},
+            {"op": "replace", "path": "/final_output", "value": accumulated},
+        ]})
+    yield 0.0, b"event: end\n\n"
+
+
+def create_app(config: Optional[FakeConfig] = None, stats: Optional[dict] = None) -> Starlette:
+    """Build the Starlette app serving /stream_log
+
+    stats, when given, is updated with request/failure/stall/disconnect counters.
+    """
+    config = config or FakeConfig()
+    stats = stats if stats is not None else {}
+    stats.update(requests=0, failures=0, stalls=0, stream_errors=0, probes=0, disconnects=0)
+    rng = random.Random(config.seed)
+
+    async def stream_log(request: Request) -> Response:
+        body = await request.json()
+        stats["requests"] += 1
+
+        if config.down or stats["requests"] <= config.fail_first or rng.random() < config.failure_rate:
+            stats["failures"] += 1
+            return JSONResponse({"detail": "injected failure"}, status_code=config.failure_status)
+        slow = stats["requests"] <= config.slow_first or rng.random() < config.slow_rate
+        stall = config.slow_delay if slow else 0.0
+        if stall:
+            stats["stalls"] += 1
+        stall += rng.random() * config.latency_jitter
+        fail_midway = rng.random() < config.error_rate
+        if fail_midway:
+            stats["stream_errors"] += 1
+
+        async def events():
+            try:
+                if stall:
+                    await asyncio.sleep(stall)
+                for delay, chunk in stream_log_events(config, body, fail_midway):
+                    if delay:
+                        await asyncio.sleep(delay)
+                    if chunk:
+                        yield chunk
+                if config.linger:
+                    await asyncio.sleep(config.linger)
+            except (asyncio.CancelledError, GeneratorExit):
+                # The client went away before the stream finished
+                stats["disconnects"] += 1
+                raise
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    async def health(request: Request) -> Response:
+        stats["probes"] += 1
+        if config.down:
+            return JSONResponse({"detail": "down"}, status_code=503)
+        return JSONResponse({"title": "RunnableSequenceInput", "type": "string"})
+
+    return Starlette(routes=[
+        Route("/stream_log", stream_log, methods=["POST"]),
+        Route("/input_schema", health, methods=["GET"]),
+    ])
+
+
+class FakeLangServe:
+    """Run the stand-in in the current event loop on an ephemeral port
+
+    Example:
+        async with FakeLangServe(FakeConfig(token_delay=0.01)) as fake:
+            os.environ["KONFLUX_CHATBOT_URL"] = fake.url
+    """
+
+    def __init__(self, config: Optional[FakeConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or FakeConfig()
+        self.stats: dict = {}
+        self._server = uvicorn.Server(uvicorn.Config(
+            create_app(self.config, self.stats), host=host, port=port,
+            log_level="warning", lifespan="off",
+        ))
+        self._task: Optional[asyncio.Task] = None
+        self.url = ""
+
+    async def __aenter__(self) -> "FakeLangServe":
+        self._task = asyncio.create_task(self._server.serve())
+        while not self._server.started:
+            if self._task.done():
+                self._task.result()
+            await asyncio.sleep(0.01)
+        host, port = self._server.servers[0].sockets[0].getsockname()[:2]
+        self.url = f"http://{host}:{port}"
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self._server.should_exit = True
+        await self._task
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local LangServe stand-in for the Konflux chatbot")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(create_app(config_from_args(args)), host=args.host, port=args.port, log_level="warning")
+
+
+def add_config_arguments(parser: argparse.ArgumentParser) -> None:
+    """FakeConfig knobs as command line options (shared with the load benchmark)"""
+    parser.add_argument("--first-event-delay", type=float, default=0.0, help="Seconds before the first event")
+    parser.add_argument("--latency-jitter", type=float, default=0.0, help="Up to this many extra seconds of latency")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Seconds between streamed tokens")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Alternative to --token-delay")
+    parser.add_argument("--answer-words", type=int, default=0, help="Pad the answer to this many words")
+    parser.add_argument("--documents", type=int, default=4, help="Retrieved documents per response")
+    parser.add_argument("--document-size", type=int, default=2000, help="Characters per document")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--failure-status", type=int, default=503)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-delay", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Streams that end with an error event")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def config_from_args(args: argparse.Namespace) -> FakeConfig:
+    token_delay = 1.0 / args.tokens_per_second if args.tokens_per_second > 0 else args.token_delay
+    return FakeConfig(
+        answer_words=args.answer_words,
+        first_event_delay=args.first_event_delay, latency_jitter=args.latency_jitter,
+        token_delay=token_delay, documents=args.documents, document_size=args.document_size,
+        failure_rate=args.failure_rate, failure_status=args.failure_status,
+        slow_rate=args.slow_rate, slow_delay=args.slow_delay, error_rate=args.error_rate,
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    main()
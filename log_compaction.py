@@ -0,0 +1,184 @@
+"""
+Compaction of pasted logs before they are sent to the chatbot
+
+People paste whole Tekton PipelineRun logs into ``details``. Most of that is
+noise for the LLM: colour codes, timestamps, progress lines, long stack
+traces and thousands of lines far away from the failure. ``compact_log``
+makes a single pass over the lines and:
+
+- strips ANSI escape codes and leading timestamps
+- collapses consecutive repeated lines (digits included: "step 1" and
+  "step 2" are different lines)
+- shortens long runs of stack frames to their first and last frames
+- keeps windows of context around failure markers (error, failed, panic...)
+  and drops the lines in between
+- enforces a byte budget, keeping the head and (mostly) the tail
+
+Everything is linear in the input size.
+"""
+
+import re
+from collections import deque
+from dataclasses import dataclass
+from typing import Iterable
+
+
+_ANSI = re.compile(r"\x1b\[[0-9;?]*[ -/]*[@-~]|\x1b[@-Z\\-_]")
+_TIMESTAMP = re.compile(
+    r"^\s*(?:\[?\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?\]?"
+    r"|\[?\d{2}:\d{2}:\d{2}(?:[.,]\d+)?\]?)\s*"
+)
+_FRAME = re.compile(r"^\s+(?:at\s|File \"|\S+\.go:\d+|\.\.\. \d+ more|\S+\(\S*:\d+\))")
+_FAILURE = re.compile(
+    r"error|fail|fatal|exception|panic|traceback|denied|refused|timed? ?out|"
+    r"not found|no such|killed|exit code|exit status|cannot|unable to|invalid"
+)  # matched against the lower-cased line (much faster than re.IGNORECASE)
+
+
+@dataclass
+class CompactionResult:
+    text: str
+    original_bytes: int
+    compacted_bytes: int
+    original_lines: int
+    compacted_lines: int
+
+
+def _utf8_len(text: str) -> int:
+    return len(text.encode("utf-8", errors="replace"))
+
+
+def _clean_lines(lines: Iterable[str], max_frames: int) -> Iterable[str]:
+    """Strip noise, collapse repeats and shorten stack traces"""
+    previous = None
+    repeats = 0
+    frames: list[str] = []
+    frame_count = 0
+
+    def flush_repeats():
+        if repeats:
+            yield f"[... previous line repeated {repeats} more times]"
+
+    def flush_frames():
+        if frame_count == len(frames):
+            yield from frames
+            return
+        head = frames[:max_frames // 2]
+        tail = frames[max_frames // 2:][-(max_frames - len(head) - 1):] if max_frames > len(head) + 1 else []
+        yield from head
+        yield f"[... {frame_count - len(head) - len(tail)} stack frames omitted]"
+        yield from tail
+
+    for raw in lines:
+        line = _TIMESTAMP.sub("", _ANSI.sub("", raw), count=1).rstrip()
+        if not line:
+            continue
+
+        if line == previous:
+            if frame_count:
+                # Recursive frames: count them as part of the run
+                frame_count += 1
+            else:
+                repeats += 1
+            continue
+        yield from flush_repeats()
+        previous, repeats = line, 0
+
+        # Indented lines inside a run (e.g. Python's source line under each
+        # File "..." frame) belong to the run
+        if _FRAME.match(line) or (frame_count and line.startswith("    ")):
+            if frame_count < max_frames:
+                frames.append(line)
+            else:
+                # Keep a rolling tail of the run so its last frames survive
+                frames.append(line)
+                del frames[max_frames // 2]
+            frame_count += 1
+            continue
+        if frame_count:
+            yield from flush_frames()
+            frames, frame_count = [], 0
+        yield line
+
+    yield from flush_repeats()
+    if frame_count:
+        yield from flush_frames()
+
+
+def _failure_windows(lines: Iterable[str], before: int, after: int) -> tuple[list[str], bool]:
+    """Keep only the lines around failure markers
+
+    Returns the kept lines and whether any marker was found.
+    """
+    kept: list[str] = []
+    pending: deque[str] = deque(maxlen=before)
+    remaining_after = 0
+    omitted = 0
+    found = False
+
+    for line in lines:
+        if _FAILURE.search(line.lower()):
+            found = True
+            dropped = omitted - len(pending)
+            if dropped > 0:
+                kept.append(f"[... {dropped} lines omitted]")
+            kept.extend(pending)
+            pending.clear()
+            omitted = 0
+            kept.append(line)
+            remaining_after = after
+        elif remaining_after:
+            kept.append(line)
+            remaining_after -= 1
+        else:
+            pending.append(line)
+            omitted += 1
+
+    if omitted:
+        kept.append(f"[... {omitted} lines omitted]")
+    return kept, found
+
+
+def _apply_budget(text: str, max_bytes: int) -> str:
+    """Keep the head and tail within max_bytes (the tail usually has the failure)"""
+    encoded = text.encode("utf-8", errors="replace")
+    if len(encoded) <= max_bytes:
+        return text
+    marker = "\n[... {} bytes truncated]\n"
+    room = max(max_bytes - len(marker) - 12, 0)
+    head = room // 5
+    tail = room - head
+    omitted = len(encoded) - head - tail
+    return (
+        encoded[:head].decode("utf-8", errors="ignore")
+        + marker.format(omitted)
+        + encoded[len(encoded) - tail:].decode("utf-8", errors="ignore")
+    )
+
+
+def compact_log(
+    text: str,
+    max_bytes: int = 16000,
+    context_before: int = 5,
+    context_after: int = 15,
+    max_frames: int = 6,
+) -> CompactionResult:
+    """Compact a pasted log so it fits max_bytes while keeping the failures"""
+    original_bytes = _utf8_len(text)
+    original_lines = text.count("\n") + 1
+
+    cleaned = list(_clean_lines(text.splitlines(), max_frames))
+    compacted = "\n".join(cleaned)
+    if _utf8_len(compacted) > max_bytes:
+        windows, found = _failure_windows(cleaned, context_before, context_after)
+        if found:
+            compacted = "\n".join(windows)
+    compacted = _apply_budget(compacted, max_bytes)
+
+    return CompactionResult(
+        text=compacted,
+        original_bytes=original_bytes,
+        compacted_bytes=_utf8_len(compacted),
+        original_lines=original_lines,
+        compacted_lines=compacted.count("\n") + 1,
+    )
@@ -0,0 +1,205 @@
+"""
+Resilience helpers for calls to the chatbot backend
+
+- ``backoff_delay``: full-jitter exponential backoff between retries
+- ``is_retryable``: failures that are safe to retry when no output arrived
+- ``LatencyTracker``: rolling time-to-first-byte samples for hedging
+- ``hedged_race``: start a second attempt when the first is slow to answer
+- ``CircuitBreaker``: fail fast while the backend is unhealthy
+- ``DeadlineExceeded``: a call's deadline passed before any answer arrived
+"""
+
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional, TypeVar
+
+import httpx
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS = {429, 502, 503, 504}
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Full-jitter exponential backoff for the given (0-based) retry"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Transient failures: connection problems, timeouts and 429/502/503/504"""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRYABLE_STATUS
+    return isinstance(error, (httpx.TransportError, httpx.TimeoutException))
+
+
+def is_backend_failure(error: BaseException) -> bool:
+    """Failures that say something about backend health (not caller mistakes)"""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    return isinstance(error, (httpx.TransportError, httpx.TimeoutException))
+
+
+class LatencyTracker:
+    """Rolling window of latency samples with percentile lookup"""
+
+    def __init__(self, window: int = 200):
+        self._samples: deque[float] = deque(maxlen=window)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, int(round(p / 100 * (len(ordered) - 1)))))
+        return ordered[index]
+
+
+class Race:
+    """Shared between hedged attempts; the first to receive output wins"""
+
+    def __init__(self):
+        self.winner: Optional[int] = None
+        self.claimed = asyncio.Event()
+        self.hedged = 0
+
+    def claim(self, attempt: int) -> bool:
+        """Called by an attempt on its first byte; False means it lost"""
+        if self.winner is None:
+            self.winner = attempt
+            self.claimed.set()
+        return self.winner == attempt
+
+
+async def hedged_race(
+    start: Callable[[int, Race], Awaitable[T]],
+    hedge_delay: Optional[float],
+    race: Optional[Race] = None,
+) -> T:
+    """Run start(0, race); if it has produced no output after hedge_delay
+    seconds, also run start(1, race) and keep whichever claims the race first.
+
+    Attempts must call race.claim(n) when their first byte arrives and stop
+    if it returns False. The losing attempt is cancelled. If every attempt
+    fails, the first attempt's error is raised.
+    """
+    race = race or Race()
+    tasks = [asyncio.ensure_future(start(0, race))]
+    claimed = asyncio.ensure_future(race.claimed.wait())
+    errors: list[BaseException] = []
+    try:
+        if hedge_delay is not None:
+            done, _ = await asyncio.wait({tasks[0], claimed}, timeout=hedge_delay,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                race.hedged += 1
+                tasks.append(asyncio.ensure_future(start(1, race)))
+
+        pending = set(tasks)
+        while True:
+            if race.winner is not None:
+                winner = tasks[race.winner]
+                for task in tasks:
+                    if task is not winner:
+                        task.cancel()
+                return await winner
+
+            done, pending = await asyncio.wait(pending | {claimed}, return_when=asyncio.FIRST_COMPLETED)
+            pending.discard(claimed)
+            for task in done:
+                if task is claimed:
+                    continue
+                if task.exception() is None and race.winner is None:
+                    # Finished without any output (empty response)
+                    return task.result()
+                if task.exception() is not None:
+                    errors.append(task.exception())
+            if not pending and race.winner is None:
+                raise errors[0]
+    finally:
+        claimed.cancel()
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+class CircuitOpen(Exception):
+    """The backend is considered down; the call was not attempted"""
+
+    def __init__(self, retry_in: float):
+        super().__init__(f"backend marked unhealthy, next probe in {retry_in:.0f} s")
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Closed -> open after consecutive failures -> half-open probe -> closed
+
+    While open every call fails immediately. After reset_timeout one call is
+    let through as a probe; its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.stats = {"opened": 0, "rejected": 0, "probes": 0}
+
+    def before_call(self) -> None:
+        """Raise CircuitOpen if the call must not be attempted"""
+        if self.state == "closed":
+            return
+        elapsed = time.monotonic() - self._opened_at
+        if self.state == "open" and elapsed >= self.reset_timeout:
+            self.state = "half_open"
+        if self.state == "half_open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            self.stats["probes"] += 1
+            return
+        self.stats["rejected"] += 1
+        raise CircuitOpen(max(self.reset_timeout - elapsed, 0.0))
+
+    def allows_call(self) -> bool:
+        """Whether before_call() would let a call through (without starting a probe)"""
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            return time.monotonic() - self._opened_at >= self.reset_timeout
+        return not self._probe_in_flight
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.stats["opened"] += 1
+            self.state = "open"
+            self._opened_at = time.monotonic()
+
+    def record_ignored(self) -> None:
+        """The call ended without telling us anything about backend health"""
+        self._probe_in_flight = False
+
+    def snapshot(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.failures, **self.stats}
+
+
+class DeadlineExceeded(Exception):
+    """The call's deadline passed before any part of the answer arrived"""
+
+    def __init__(self, deadline: float):
+        super().__init__(f"no answer within the {deadline:g} s deadline")
+        self.deadline = deadline
@@ -0,0 +1,179 @@
+"""
+Two-tier response cache for Konflux chatbot answers
+
+Answers are keyed on the normalized input string sent to ``/stream_log``.
+A small in-memory LRU serves hot questions; an SQLite file keeps answers
+across restarts. Both tiers expire entries after a TTL and evict the least
+recently used entries once they exceed their size limit.
+
+``aget``/``aset`` are for the event loop: memory hits are answered inline
+and SQLite reads and writes run in a worker thread.
+"""
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+def normalize_prompt(text: str) -> str:
+    """Normalize a prompt so trivial whitespace/case differences share a key"""
+    return " ".join(text.split()).casefold()
+
+
+def cache_key(text: str) -> str:
+    """Stable cache key for a prompt"""
+    return hashlib.sha256(normalize_prompt(text).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """In-memory LRU in front of an optional on-disk SQLite store"""
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl: float = 86400.0,
+        max_memory_entries: int = 256,
+        max_disk_entries: int = 10000,
+    ):
+        self.ttl = ttl
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self._memory: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        # One connection shared by the worker threads of aget/aset
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+        if path:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses(last_access)")
+            self._db.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+
+    def _lookup_memory(self, key: str, now: float) -> Optional[str]:
+        entry = self._memory.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > now:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return value
+            del self._memory[key]
+        return None
+
+    def _load(self, key: str, now: float) -> Optional[tuple[str, float]]:
+        """(value, expires_at) from disk, or None; expired rows are deleted"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at > now:
+                self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+                return value, expires_at
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            return None
+
+    def _store(self, key: str, value: str, expires_at: float, now: float) -> int:
+        """Write one answer to disk; returns the number of rows evicted"""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, expires_at, now),
+            )
+            cursor = self._db.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_disk_entries,),
+            )
+            return max(cursor.rowcount, 0)
+
+    def _loaded(self, key: str, row: Optional[tuple[str, float]]) -> Optional[str]:
+        if row is None:
+            self.stats["misses"] += 1
+            return None
+        value, expires_at = row
+        self._remember(key, expires_at, value)
+        self.stats["disk_hits"] += 1
+        return value
+
+    def get(self, prompt: str) -> Optional[str]:
+        """Return the cached answer for a prompt, or None"""
+        key = cache_key(prompt)
+        now = time.time()
+        value = self._lookup_memory(key, now)
+        if value is not None:
+            return value
+        return self._loaded(key, self._load(key, now) if self._db is not None else None)
+
+    async def aget(self, prompt: str) -> Optional[str]:
+        """get() with the SQLite lookup in a worker thread"""
+        key = cache_key(prompt)
+        now = time.time()
+        value = self._lookup_memory(key, now)
+        if value is not None:
+            return value
+        row = await asyncio.to_thread(self._load, key, now) if self._db is not None else None
+        return self._loaded(key, row)
+
+    def set(self, prompt: str, value: str) -> None:
+        """Store an answer in both tiers"""
+        key, expires_at, now = self._set_memory(prompt, value)
+        if self._db is not None:
+            self.stats["evictions"] += self._store(key, value, expires_at, now)
+
+    async def aset(self, prompt: str, value: str) -> None:
+        """set() with the SQLite write in a worker thread"""
+        key, expires_at, now = self._set_memory(prompt, value)
+        if self._db is not None:
+            self.stats["evictions"] += await asyncio.to_thread(self._store, key, value, expires_at, now)
+
+    def _set_memory(self, prompt: str, value: str) -> tuple[str, float, float]:
+        key = cache_key(prompt)
+        now = time.time()
+        expires_at = now + self.ttl
+        self._remember(key, expires_at, value)
+        self.stats["stores"] += 1
+        return key, expires_at, now
+
+    def _remember(self, key: str, expires_at: float, value: str) -> None:
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def snapshot(self) -> dict:
+        """Counters plus current tier sizes"""
+        disk_entries = 0
+        if self._db is not None:
+            with self._lock:
+                disk_entries = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        lookups = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "disk_entries": disk_entries,
+        }
+
+    def close(self) -> None:
+        if self._db is not None:
+            with self._lock:
+                self._db.close()
+                self._db = None
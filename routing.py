@@ -0,0 +1,212 @@
+"""
+Latency-aware routing across several chatbot backends
+
+``KONFLUX_CHATBOT_URL`` may list several deployments of the chatbot (for
+example int and stage replicas). Each upstream attempt is sent to the
+backend with the lowest expected cost:
+
+- an exponentially weighted moving average (EWMA) of time to first byte,
+  scaled by the requests already in flight to it and by its EWMA error
+  rate; backends without samples yet go first so every one gets measured
+- a small share of attempts goes to a random backend, so a slow backend
+  that has recovered is noticed
+- retries and hedged attempts of the same call prefer backends the call
+  has not tried yet
+
+A backend is ejected after consecutive failures or a high error rate.
+Health probes (``GET <url>/input_schema``, a route every LangServe chain
+serves; only a 2xx or 3xx response counts as healthy)
+run periodically, eject backends that stop answering and readmit ejected
+ones after enough successful probes. Without probes, an ejected backend is
+readmitted after a fixed time and the next call tests it. When every
+backend is ejected, calls still go to the one ejected longest ago rather
+than failing outright.
+"""
+
+import asyncio
+import random
+import time
+from typing import Iterable, Optional
+
+import httpx
+
+
+def parse_backend_urls(value: str) -> list[str]:
+    """Backend URLs from a comma- or whitespace-separated list"""
+    urls = [url.strip().rstrip("/") for url in value.replace(",", " ").split()]
+    return list(dict.fromkeys(url for url in urls if url))
+
+
+class Backend:
+    __slots__ = (
+        "url", "latency", "error_rate", "in_flight", "consecutive_failures", "ejected_at",
+        "probe_successes", "requests", "failures", "ejections", "last_probe_ms", "last_probe_ok",
+    )
+
+    def __init__(self, url: str):
+        self.url = url
+        self.latency: Optional[float] = None  # EWMA of time to first byte (seconds)
+        self.error_rate = 0.0  # EWMA of failed attempts (0-1)
+        self.in_flight = 0
+        self.consecutive_failures = 0
+        self.ejected_at: Optional[float] = None
+        self.probe_successes = 0
+        self.requests = 0
+        self.failures = 0
+        self.ejections = 0
+        self.last_probe_ms: Optional[float] = None
+        self.last_probe_ok: Optional[bool] = None
+
+    @property
+    def ejected(self) -> bool:
+        return self.ejected_at is not None
+
+    def snapshot(self) -> dict:
+        return {
+            "url": self.url,
+            "state": "ejected" if self.ejected else "healthy",
+            "latency_ewma_ms": self.latency * 1000 if self.latency is not None else None,
+            "error_rate_ewma": round(self.error_rate, 4),
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "failures": self.failures,
+            "ejections": self.ejections,
+            "last_probe_ms": self.last_probe_ms,
+            "last_probe_ok": self.last_probe_ok,
+        }
+
+
+class BackendPool:
+    """Pick a backend per attempt and keep per-backend health"""
+
+    def __init__(
+        self,
+        urls: Iterable[str],
+        alpha: float = 0.3,
+        eject_failures: int = 3,
+        eject_error_rate: float = 0.5,
+        min_samples: int = 5,
+        readmit_probes: int = 2,
+        eject_time: float = 30.0,
+        explore: float = 0.05,
+    ):
+        self.backends = [Backend(url) for url in urls]
+        if not self.backends:
+            raise ValueError("at least one backend URL is required")
+        self.alpha = alpha
+        self.eject_failures = eject_failures
+        self.eject_error_rate = eject_error_rate
+        self.min_samples = min_samples
+        self.readmit_probes = readmit_probes
+        self.eject_time = eject_time
+        self.explore = explore
+        # Set while a probe loop runs; otherwise ejections end after eject_time
+        self.probing = False
+
+    def __len__(self) -> int:
+        return len(self.backends)
+
+    @property
+    def primary(self) -> Backend:
+        return self.backends[0]
+
+    def _score(self, backend: Backend) -> float:
+        if backend.latency is None:
+            return -1.0  # not measured yet
+        return backend.latency * (backend.in_flight + 1) * (1 + 4 * backend.error_rate)
+
+    def _readmit_expired(self) -> None:
+        if self.probing:
+            return
+        now = time.monotonic()
+        for backend in self.backends:
+            if backend.ejected and now - backend.ejected_at >= self.eject_time:
+                self._readmit(backend)
+
+    def pick(self, exclude: Iterable[Backend] = ()) -> Backend:
+        """The backend for the next attempt, preferring ones not in exclude"""
+        if len(self.backends) == 1:
+            return self.backends[0]
+        self._readmit_expired()
+        healthy = [b for b in self.backends if not b.ejected]
+        if not healthy:
+            # Fail open: the backend ejected longest ago is the likeliest to be back
+            return min(self.backends, key=lambda b: b.ejected_at)
+        excluded = set(exclude)
+        candidates = [b for b in healthy if b not in excluded] or healthy
+        if len(candidates) > 1 and random.random() < self.explore:
+            return random.choice(candidates)
+        return min(candidates, key=self._score)
+
+    def started(self, backend: Backend) -> None:
+        backend.in_flight += 1
+        backend.requests += 1
+
+    def finished(self, backend: Backend, latency: Optional[float], ok: bool) -> None:
+        """Record an attempt's outcome; latency is None when it was cancelled"""
+        backend.in_flight -= 1
+        if latency is None:
+            return
+        if ok:
+            backend.latency = latency if backend.latency is None else (
+                self.alpha * latency + (1 - self.alpha) * backend.latency
+            )
+            backend.error_rate *= 1 - self.alpha
+            backend.consecutive_failures = 0
+            return
+        backend.failures += 1
+        backend.consecutive_failures += 1
+        backend.error_rate = self.alpha + (1 - self.alpha) * backend.error_rate
+        if not backend.ejected and (
+            backend.consecutive_failures >= self.eject_failures
+            or (backend.requests >= self.min_samples and backend.error_rate >= self.eject_error_rate)
+        ):
+            self._eject(backend)
+
+    def _eject(self, backend: Backend) -> None:
+        backend.ejected_at = time.monotonic()
+        backend.probe_successes = 0
+        backend.ejections += 1
+
+    def _readmit(self, backend: Backend) -> None:
+        backend.ejected_at = None
+        backend.consecutive_failures = 0
+        backend.error_rate = 0.0
+
+    async def probe(self, client: httpx.AsyncClient, backend: Backend, timeout: float) -> bool:
+        """One health probe; updates ejection state"""
+        started = time.perf_counter()
+        try:
+            response = await client.get(f"{backend.url}/input_schema", timeout=timeout)
+            # A 404 or 401 means the URL is wrong, not that the chatbot is serving
+            ok = response.status_code < 400
+        except (httpx.HTTPError, OSError):
+            ok = False
+        backend.last_probe_ms = (time.perf_counter() - started) * 1000
+        backend.last_probe_ok = ok
+        if ok:
+            backend.probe_successes += 1
+            if backend.ejected and backend.probe_successes >= self.readmit_probes:
+                self._readmit(backend)
+        else:
+            backend.probe_successes = 0
+            backend.consecutive_failures += 1
+            if not backend.ejected and backend.consecutive_failures >= self.eject_failures:
+                self._eject(backend)
+        return ok
+
+    async def probe_all(self, client: httpx.AsyncClient, timeout: float) -> list[bool]:
+        return await asyncio.gather(*(self.probe(client, backend, timeout) for backend in self.backends))
+
+    async def probe_periodically(self, client_factory, interval: float, timeout: float) -> None:
+        """Probe every backend every interval seconds until cancelled"""
+        self.probing = True
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                await self.probe_all(client_factory(), timeout)
+        finally:
+            self.probing = False
+
+    def snapshot(self) -> list[dict]:
+        return [backend.snapshot() for backend in self.backends]
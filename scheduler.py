@@ -0,0 +1,146 @@
+"""
+Admission control for upstream chatbot streams
+
+Caps the number of concurrent ``/stream_log`` requests and queues the rest
+by priority. Waiting calls age: every ``aging_interval`` seconds in the queue
+is worth one priority level, so low-priority calls cannot starve. Ordering by
+``enqueue_time + priority * aging_interval`` gives exactly that without ever
+re-sorting the queue. Calls that wait longer than ``queue_timeout`` (or find
+the queue full) fail fast instead of piling up.
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+
+URGENCY_PRIORITY = {"high": 0, "medium": 1, "low": 2}
+
+
+class SchedulerBusy(Exception):
+    """The call could not be admitted (queue full or queue deadline expired)"""
+
+    def __init__(self, message: str, queue_depth: int, waited: float):
+        super().__init__(message)
+        self.queue_depth = queue_depth
+        self.waited = waited
+
+
+class _WaitStats:
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "avg_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "max_ms": self.max * 1000,
+        }
+
+
+class PriorityScheduler:
+    """Bound concurrent upstream calls; queue the excess by aged priority"""
+
+    def __init__(
+        self,
+        max_concurrent: int = 8,
+        aging_interval: float = 10.0,
+        queue_timeout: float = 30.0,
+        max_queue: int = 100,
+    ):
+        self.max_concurrent = max_concurrent
+        self.aging_interval = aging_interval
+        self.queue_timeout = queue_timeout
+        self.max_queue = max_queue
+        self.active = 0
+        self.queued = 0
+        self._heap: list = []
+        self._seq = itertools.count()
+        self.stats = {"admitted": 0, "queued": 0, "rejected": 0, "timed_out": 0}
+        self._waits = {priority: _WaitStats() for priority in URGENCY_PRIORITY.values()}
+
+    @asynccontextmanager
+    async def slot(self, priority: int) -> AsyncIterator[float]:
+        """Hold an upstream slot for the duration of the block; yields the queue wait"""
+        waited = await self.acquire(priority)
+        try:
+            yield waited
+        finally:
+            self.release()
+
+    async def acquire(self, priority: int) -> float:
+        """Wait for a slot; returns seconds spent queued"""
+        if self.active < self.max_concurrent and not self.queued:
+            self.active += 1
+            self._admitted(priority, 0.0)
+            return 0.0
+
+        if self.queued >= self.max_queue:
+            self.stats["rejected"] += 1
+            raise SchedulerBusy(
+                f"upstream queue is full ({self.queued} calls waiting)", self.queued, 0.0
+            )
+
+        enqueued = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (enqueued + priority * self.aging_interval, next(self._seq), future))
+        self.queued += 1
+        self.stats["queued"] += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as we gave up; pass it on
+                self.release()
+            else:
+                future.cancel()
+                self.queued -= 1
+            if isinstance(e, asyncio.TimeoutError):
+                self.stats["timed_out"] += 1
+                waited = time.monotonic() - enqueued
+                raise SchedulerBusy(
+                    f"waited {waited:.1f} s in the upstream queue ({self.queued} calls still waiting)",
+                    self.queued, waited,
+                ) from None
+            raise
+
+        waited = time.monotonic() - enqueued
+        self._admitted(priority, waited)
+        return waited
+
+    def release(self) -> None:
+        """Give a slot back and admit the next queued call"""
+        self.active -= 1
+        while self._heap and self.active < self.max_concurrent:
+            _, _, future = heapq.heappop(self._heap)
+            if future.cancelled():
+                continue
+            self.queued -= 1
+            self.active += 1
+            future.set_result(None)
+
+    def _admitted(self, priority: int, waited: float) -> None:
+        self.stats["admitted"] += 1
+        self._waits.setdefault(priority, _WaitStats()).add(waited)
+
+    def snapshot(self) -> dict:
+        names = {value: name for name, value in URGENCY_PRIORITY.items()}
+        return {
+            "active": self.active,
+            "queue_depth": self.queued,
+            "max_concurrent": self.max_concurrent,
+            **self.stats,
+            "wait": {names.get(p, str(p)): w.snapshot() for p, w in self._waits.items()},
+        }
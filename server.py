@@ -7,15 +7,40 @@ It connects to the existing LangServe backend and exposes chat functionality
 as MCP tools.
 """
 
+import time
+
+# Measured from here so the start-up breakdown in metrics() includes imports
+_IMPORT_STARTED = time.perf_counter()
+
+import argparse
 import asyncio
+import contextlib
 import json
 import os
 import warnings
-from typing import Optional, Any
+from collections import deque
+from typing import Optional, Any, AsyncIterator, Callable
 import httpx
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
-from mcp.types import Tool, TextContent
+from mcp.server.lowlevel.helper_types import ReadResourceContents
+from mcp.types import Resource, Tool, TextContent
+
+from answer_format import RESPONSE_FORMATS, format_answer
+from log_compaction import compact_log
+from resilience import (
+    CircuitBreaker, CircuitOpen, DeadlineExceeded, LatencyTracker, Race,
+    backoff_delay, hedged_race, is_backend_failure, is_retryable,
+)
+from response_cache import ResponseCache, cache_key
+from routing import Backend, BackendPool, parse_backend_urls
+from scheduler import URGENCY_PRIORITY, PriorityScheduler, SchedulerBusy
+from sessions import SessionStore
+from singleflight import SingleFlight
+from stream_capture import CaptureArchive, CaptureMissing, Recorder, capture_key, replay_lines
+from stream_parser import ResponseTooLarge, StreamError, StreamLogParser, bounded_lines
+from telemetry import Telemetry, dump_openmetrics, dump_periodically, serve_openmetrics
+from tenant_limits import RateLimited, TenantLimiter, parse_overrides
 
 # Suppress SSL warnings for internal Red Hat certificates
 warnings.filterwarnings('ignore', message='Unverified HTTPS request')
@@ -28,114 +53,526 @@ CHATBOT_URL = os.getenv(
 )
 
 
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_list(name: str, default: list[str]) -> list[str]:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+# HTTP connection pool shared by all tool calls
+HTTP_MAX_CONNECTIONS = _env_int("KONFLUX_HTTP_MAX_CONNECTIONS", 20)
+HTTP_MAX_KEEPALIVE_CONNECTIONS = _env_int("KONFLUX_HTTP_MAX_KEEPALIVE", 10)
+HTTP_KEEPALIVE_EXPIRY = _env_float("KONFLUX_HTTP_KEEPALIVE_EXPIRY", 60.0)
+HTTP2_ENABLED = _env_bool("KONFLUX_HTTP2", False)
+CONNECT_TIMEOUT = _env_float("KONFLUX_CONNECT_TIMEOUT", 10.0)
+READ_TIMEOUT = _env_float("KONFLUX_READ_TIMEOUT", 120.0)
+
+# Response cache (set KONFLUX_CACHE_ENABLED=false to disable)
+CACHE_ENABLED = _env_bool("KONFLUX_CACHE_ENABLED", True)
+CACHE_PATH = os.getenv(
+    "KONFLUX_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "konflux-chatbot-mcp", "responses.sqlite3")
+)
+CACHE_TTL = _env_float("KONFLUX_CACHE_TTL", 86400.0)
+CACHE_MEMORY_ENTRIES = _env_int("KONFLUX_CACHE_MEMORY_ENTRIES", 256)
+CACHE_DISK_ENTRIES = _env_int("KONFLUX_CACHE_DISK_ENTRIES", 10000)
+
+# Reuse of answers to near-duplicate questions (same tenant, application and component)
+SIMILAR_ENABLED = _env_bool("KONFLUX_SIMILAR_ENABLED", True)
+SIMILAR_THRESHOLD = _env_float("KONFLUX_SIMILAR_THRESHOLD", 0.8)
+SIMILAR_MAX_ENTRIES = _env_int("KONFLUX_SIMILAR_MAX_ENTRIES", 10000)
+
+# Conversation history for calls that pass a session_id: what is sent
+# upstream is capped at a token budget, and idle sessions are dropped
+SESSIONS_ENABLED = _env_bool("KONFLUX_SESSIONS_ENABLED", True)
+SESSION_HISTORY_TOKENS = _env_int("KONFLUX_SESSION_HISTORY_TOKENS", 1500)
+SESSION_MAX_TURNS = _env_int("KONFLUX_SESSION_MAX_TURNS", 3)  # older turns are summarized
+SESSION_IDLE_TIMEOUT = _env_float("KONFLUX_SESSION_IDLE_TIMEOUT", 3600.0)
+SESSION_MAX_SESSIONS = _env_int("KONFLUX_SESSION_MAX_SESSIONS", 1000)
+SESSION_MAX_BYTES = _env_int("KONFLUX_SESSION_MAX_BYTES", 32 * 1024 * 1024)
+
+# Several backends may be listed in KONFLUX_CHATBOT_URL (comma-separated);
+# each attempt goes to the one with the lowest latency/error EWMA
+HEALTH_INTERVAL = _env_float("KONFLUX_HEALTH_INTERVAL", 10.0)  # 0 = no health probes
+HEALTH_TIMEOUT = _env_float("KONFLUX_HEALTH_TIMEOUT", 2.0)
+ROUTING_EWMA_ALPHA = _env_float("KONFLUX_ROUTING_EWMA_ALPHA", 0.3)
+EJECT_FAILURES = _env_int("KONFLUX_EJECT_FAILURES", 3)
+EJECT_ERROR_RATE = _env_float("KONFLUX_EJECT_ERROR_RATE", 0.5)
+READMIT_PROBES = _env_int("KONFLUX_READMIT_PROBES", 2)
+EJECT_TIME = _env_float("KONFLUX_EJECT_TIME", 30.0)  # readmission without health probes
+
+# Record/replay of raw /stream_log responses: "off", "record" (store every
+# response), "replay" (answer only from recordings, never go upstream) or
+# "fallback" (record, and replay when the backend cannot be reached)
+CAPTURE_MODE = os.getenv("KONFLUX_CAPTURE_MODE", "off").strip().lower()
+CAPTURE_PATH = os.getenv(
+    "KONFLUX_CAPTURE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "konflux-chatbot-mcp", "captures.sqlite3")
+)
+CAPTURE_MAX_ENTRIES = _env_int("KONFLUX_CAPTURE_MAX_ENTRIES", 5000)
+REPLAY_SPEED = _env_float("KONFLUX_REPLAY_SPEED", 1.0)  # 1 = recorded pace, 0 = no delays
+
+# Default for the response_format tool argument (full, solution_only, summary, json)
+RESPONSE_FORMAT = os.getenv("KONFLUX_RESPONSE_FORMAT", "full")
+
+# Transport: "stdio" (one client per process) or "http" (streamable HTTP at
+# /mcp and legacy SSE at /sse, shared by every connected client)
+TRANSPORT = os.getenv("KONFLUX_TRANSPORT", "stdio")
+HTTP_HOST = os.getenv("KONFLUX_HOST", "127.0.0.1")
+HTTP_PORT = _env_int("KONFLUX_PORT", 8000)
+# Stateless streamable HTTP needs no session affinity, so several server
+# processes can sit behind one load balancer
+HTTP_STATELESS = _env_bool("KONFLUX_HTTP_STATELESS", False)
+
+# Resolve the backend host and open a pooled connection in the background at
+# start-up, so the first question does not pay for DNS and the TLS handshake
+PREWARM = _env_bool("KONFLUX_PREWARM", True)
+
+# Telemetry: always collected and served as the konflux://metrics resource;
+# optionally also as OpenMetrics over HTTP and/or dumped to a file
+METRICS_PORT = _env_int("KONFLUX_METRICS_PORT", 0)  # 0 = no HTTP endpoint
+METRICS_HOST = os.getenv("KONFLUX_METRICS_HOST", "127.0.0.1")
+METRICS_FILE = os.getenv("KONFLUX_METRICS_FILE", "")
+METRICS_DUMP_INTERVAL = _env_float("KONFLUX_METRICS_DUMP_INTERVAL", 15.0)
+
+METRICS_URI = "konflux://metrics"
+OPENMETRICS_URI = "konflux://metrics/openmetrics"
+
+# Compaction of pasted logs in `details` (ANSI codes, timestamps, repeated
+# lines and stack frames removed; only windows around failures kept)
+DETAILS_COMPACTION = _env_bool("KONFLUX_DETAILS_COMPACTION", True)
+DETAILS_MAX_BYTES = _env_int("KONFLUX_DETAILS_MAX_BYTES", 16000)
+DETAILS_MAX_TOKENS = _env_int("KONFLUX_DETAILS_MAX_TOKENS", 0)  # 0 = no token budget
+
+# LangServe stream_log filters. By default only the root run's output is
+# streamed; set KONFLUX_STREAM_LOG_FILTER=false to receive every sub-run log.
+STREAM_LOG_FILTER = _env_bool("KONFLUX_STREAM_LOG_FILTER", True)
+STREAM_LOG_INCLUDE_NAMES = _env_list("KONFLUX_STREAM_LOG_INCLUDE_NAMES", [])
+STREAM_LOG_INCLUDE_TYPES = _env_list("KONFLUX_STREAM_LOG_INCLUDE_TYPES", [])
+STREAM_LOG_INCLUDE_TAGS = _env_list("KONFLUX_STREAM_LOG_INCLUDE_TAGS", [])
+# Sub-run types whose output carries the retrieved documents
+SOURCES_INCLUDE_TYPES = _env_list("KONFLUX_SOURCES_INCLUDE_TYPES", ["retriever"])
+
+# Memory bounds per upstream response: larger events are skipped unread (or
+# abort the response when they carry the answer); larger responses are
+# aborted, returning the answer so far. 0 = no limit
+MAX_EVENT_BYTES = _env_int("KONFLUX_MAX_EVENT_BYTES", 1024 * 1024)
+MAX_RESPONSE_BYTES = _env_int("KONFLUX_MAX_RESPONSE_BYTES", 32 * 1024 * 1024)
+
+# Admission control for upstream streams: at most MAX_UPSTREAM_STREAMS run at
+# once, the rest queue by urgency (aging one level per QUEUE_AGING_INTERVAL s)
+MAX_UPSTREAM_STREAMS = _env_int("KONFLUX_MAX_UPSTREAM_STREAMS", 8)
+QUEUE_AGING_INTERVAL = _env_float("KONFLUX_QUEUE_AGING_INTERVAL", 10.0)
+QUEUE_TIMEOUT = _env_float("KONFLUX_QUEUE_TIMEOUT", 30.0)
+MAX_QUEUE_DEPTH = _env_int("KONFLUX_MAX_QUEUE_DEPTH", 100)
+
+# Fair share between tenants: every tenant (or, without one, every client
+# session) gets its own token bucket and a cap on calls in progress.
+# Overrides are "tenant:rate:burst:max_concurrent" items; 0 = unlimited
+RATE_LIMIT_ENABLED = _env_bool("KONFLUX_RATE_LIMIT_ENABLED", True)
+TENANT_RATE = _env_float("KONFLUX_TENANT_RATE", 1.0)  # calls per second
+TENANT_BURST = _env_float("KONFLUX_TENANT_BURST", 30.0)
+TENANT_MAX_CONCURRENT = _env_int("KONFLUX_TENANT_MAX_CONCURRENT", 4)
+TENANT_LIMIT_OVERRIDES = _env_list("KONFLUX_TENANT_LIMITS", [])
+
+# Per-call deadlines by urgency (overridable with deadline_seconds; 0 = none).
+# No default is shorter than READ_TIMEOUT, which used to be the only limit.
+DEADLINES = {
+    "high": _env_float("KONFLUX_DEADLINE_HIGH", 120.0),
+    "medium": _env_float("KONFLUX_DEADLINE_MEDIUM", 120.0),
+    "low": _env_float("KONFLUX_DEADLINE_LOW", 300.0),
+}
+
+# Resilience: retries before any output arrives, optional hedged second
+# request when the first byte is slower than the HEDGE_PERCENTILE latency,
+# and a circuit breaker per backend that fails fast while it is down
+RETRY_ATTEMPTS = _env_int("KONFLUX_RETRY_ATTEMPTS", 2)
+RETRY_BASE_DELAY = _env_float("KONFLUX_RETRY_BASE_DELAY", 0.5)
+RETRY_MAX_DELAY = _env_float("KONFLUX_RETRY_MAX_DELAY", 5.0)
+HEDGE_ENABLED = _env_bool("KONFLUX_HEDGE_ENABLED", False)
+HEDGE_PERCENTILE = _env_float("KONFLUX_HEDGE_PERCENTILE", 95.0)
+HEDGE_MIN_SAMPLES = _env_int("KONFLUX_HEDGE_MIN_SAMPLES", 20)
+HEDGE_MIN_DELAY = _env_float("KONFLUX_HEDGE_MIN_DELAY", 1.0)
+BREAKER_FAILURE_THRESHOLD = _env_int("KONFLUX_BREAKER_FAILURES", 5)
+BREAKER_RESET_TIMEOUT = _env_float("KONFLUX_BREAKER_RESET_TIMEOUT", 30.0)
+
+# konflux_chat_batch fan-out
+BATCH_MAX_CONCURRENCY = _env_int("KONFLUX_BATCH_MAX_CONCURRENCY", 8)
+BATCH_MAX_ITEMS = _env_int("KONFLUX_BATCH_MAX_ITEMS", 50)
+
+# Minimum seconds between streamed progress notifications
+STREAM_NOTIFY_INTERVAL = _env_float("KONFLUX_STREAM_NOTIFY_INTERVAL", 0.25)
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Create the long-lived HTTP client used for all upstream calls
+
+    Connections are kept alive between tool calls so only the first question
+    pays for the TCP + TLS handshake to the chatbot route.
+    """
+    http2 = HTTP2_ENABLED
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            warnings.warn("KONFLUX_HTTP2 is set but the 'h2' package is not installed; using HTTP/1.1")
+            http2 = False
+    
+    # Note: verify=False for internal Red Hat certificates
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        http2=http2,
+        verify=False,
+    )
+
+
+NO_RESPONSE_MESSAGE = "No response received from chatbot"
+
+# Input fields shared by every chat tool (and by each konflux_chat_batch item)
+QUESTION_PROPERTIES = {
+    "question": {
+        "type": "string",
+        "description": "Your question or issue description"
+    },
+    "urgency": {
+        "type": "string",
+        "enum": ["low", "medium", "high"],
+        "description": "Urgency level (default: medium)",
+        "default": "medium"
+    },
+    "tenant": {
+        "type": "string",
+        "description": "Optional: Your tenant/project name"
+    },
+    "application": {
+        "type": "string",
+        "description": "Optional: Your application name"
+    },
+    "component": {
+        "type": "string",
+        "description": "Optional: Your component name"
+    },
+    "details": {
+        "type": "string",
+        "description": "Optional: Additional context, error logs, or details"
+    },
+    "bypass_cache": {
+        "type": "boolean",
+        "description": "Optional: Skip the response cache and ask the chatbot again",
+        "default": False
+    },
+    "include_sources": {
+        "type": "boolean",
+        "description": "Optional: Append the documentation sources the answer was based on",
+        "default": False
+    },
+    "deadline_seconds": {
+        "type": "number",
+        "minimum": 0,
+        "description": "Optional: Seconds to wait for the answer before returning what has arrived so far (default: 60/120/300 for high/medium/low urgency; 0 = no deadline)"
+    },
+    "response_format": {
+        "type": "string",
+        "enum": list(RESPONSE_FORMATS),
+        "description": "Optional: full answer, solution_only, a short summary (assessment, solution, confidence) or json with one field per section (default: full)",
+        "default": RESPONSE_FORMAT
+    },
+    "session_id": {
+        "type": "string",
+        "description": "Optional: Conversation id; follow-up questions with the same id see the earlier questions, answers and details"
+    }
+}
+
+
+class InvalidArgument(ValueError):
+    """A tool argument is invalid; raised before anything is sent upstream"""
+
+
+class ProgressNotifier:
+    """Forward a partial answer to the MCP client as it streams in
+    
+    Uses progress notifications when the client sent a progress token and
+    log notifications otherwise. The first chunk is sent immediately; later
+    chunks are batched so a fast token stream does not flood the client.
+    """
+    
+    def __init__(self, session, progress_token=None, request_id=None, interval: float = STREAM_NOTIFY_INTERVAL):
+        self.session = session
+        self.progress_token = progress_token
+        self.request_id = request_id
+        self.interval = interval
+        self._text = ""
+        self._sent = 0
+        self._pending = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+    
+    @classmethod
+    def for_current_request(cls, server: Server) -> "ProgressNotifier":
+        """Notifier bound to the MCP request being handled, if any"""
+        try:
+            ctx = server.request_context
+        except LookupError:
+            # Called outside an MCP request (e.g. from a benchmark)
+            return cls(None)
+        progress_token = ctx.meta.progressToken if ctx.meta else None
+        return cls(ctx.session, progress_token, ctx.request_id)
+    
+    def update(self, text: str):
+        """Record the answer accumulated so far (called from the stream reader)"""
+        if self.session is None:
+            return
+        self._text = text
+        self._pending.set()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def _run(self):
+        while True:
+            await self._pending.wait()
+            self._pending.clear()
+            await self._send()
+            await asyncio.sleep(self.interval)
+    
+    async def _send(self):
+        delta = self._text[self._sent:]
+        if not delta:
+            return
+        self._sent = len(self._text)
+        try:
+            if self.progress_token is not None:
+                await self.session.send_progress_notification(
+                    self.progress_token,
+                    progress=self._sent,
+                    message=delta,
+                    related_request_id=self.request_id,
+                )
+            else:
+                await self.session.send_log_message(
+                    level="info",
+                    data=delta,
+                    logger="konflux_chat_stream",
+                    related_request_id=self.request_id,
+                )
+        except Exception:
+            # Notifications are best effort; the final answer is still returned
+            pass
+    
+    async def aclose(self):
+        """Stop forwarding, after sending what is still batched"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            # The last chunks may have arrived during the batching interval
+            await self._send()
+
+
+class _Flight:
+    """State shared by the callers waiting on one upstream request"""
+    
+    def __init__(self):
+        self.listeners: list[Callable[[str], None]] = []
+        self.first_byte_at: Optional[float] = None
+        self.queue_wait: Optional[float] = None
+        self.parser: Optional[StreamLogParser] = None
+        # Connection, byte, event and parse figures of the winning attempt
+        self.upstream: Optional[dict] = None
+    
+    def attach(self, parser: StreamLogParser):
+        self.parser = parser
+        if self.listeners:
+            parser.set_on_partial(self.broadcast)
+    
+    def add_listener(self, listener: Callable[[str], None]):
+        self.listeners.append(listener)
+        # Only track streamed text while someone is listening for it; the
+        # parser can then skip decoding token patches for konflux_chat
+        if self.parser is not None:
+            self.parser.set_on_partial(self.broadcast)
+            if self.parser.partial:
+                listener(self.parser.partial)
+    
+    def remove_listener(self, listener: Callable[[str], None]):
+        self.listeners.remove(listener)
+    
+    def broadcast(self, text: str):
+        for listener in list(self.listeners):
+            listener(text)
+
+
 class KonfluxChatbotMCP:
     """MCP Server for Konflux Chatbot integration"""
     
     def __init__(self):
         self.server = Server("konflux-chatbot")
+        self.backends: BackendPool
         self.chatbot_url = CHATBOT_URL
+        self._probe_task: Optional[asyncio.Task] = None
+        self.client: Optional[httpx.AsyncClient] = None
+        self.inflight = SingleFlight()
+        self.scheduler = PriorityScheduler(
+            max_concurrent=MAX_UPSTREAM_STREAMS,
+            aging_interval=QUEUE_AGING_INTERVAL,
+            queue_timeout=QUEUE_TIMEOUT,
+            max_queue=MAX_QUEUE_DEPTH,
+        )
+        self.limiter: Optional[TenantLimiter] = None
+        # Set by http_app(); sessions then last a single request
+        self.http_stateless = False
+        if RATE_LIMIT_ENABLED:
+            self.limiter = TenantLimiter(
+                rate=TENANT_RATE,
+                burst=TENANT_BURST,
+                max_concurrent=TENANT_MAX_CONCURRENT,
+                overrides=parse_overrides(TENANT_LIMIT_OVERRIDES),
+            )
+        self.first_byte_latency = LatencyTracker()
+        self.resilience_stats = {"retries": 0, "hedged": 0, "hedge_wins": 0}
+        self._flights: dict[str, _Flight] = {}
+        self.recent_calls: deque[dict] = deque(maxlen=100)
+        self.recent_upstream: deque[dict] = deque(maxlen=100)
+        self.upstream_totals = {"responses": 0, "wire_bytes": 0, "events": 0}
+        self.stream_limit_stats = {"dropped_events": 0, "dropped_bytes": 0, "aborted_responses": 0}
+        self.compaction_totals = {"calls": 0, "original_bytes": 0, "compacted_bytes": 0}
+        self.format_totals: dict[str, dict] = {}
+        self.telemetry = Telemetry()
+        self._metrics_server: Optional[asyncio.AbstractServer] = None
+        self._metrics_dump: Optional[asyncio.Task] = None
+        self.cache: Optional[ResponseCache] = None
+        if CACHE_ENABLED:
+            self.cache = ResponseCache(
+                path=CACHE_PATH or None,
+                ttl=CACHE_TTL,
+                max_memory_entries=CACHE_MEMORY_ENTRIES,
+                max_disk_entries=CACHE_DISK_ENTRIES,
+            )
+        self.captures: Optional[CaptureArchive] = None
+        if CAPTURE_MODE in ("record", "replay", "fallback"):
+            self.captures = CaptureArchive(CAPTURE_PATH, max_entries=CAPTURE_MAX_ENTRIES)
+        elif CAPTURE_MODE != "off":
+            raise ValueError(f"Unknown KONFLUX_CAPTURE_MODE: {CAPTURE_MODE} (expected off, record, replay or fallback)")
+        # Loaded by startup() in the background (numpy is the slowest import)
+        self.similar = None
+        self.sessions: Optional[SessionStore] = None
+        if SESSIONS_ENABLED:
+            self.sessions = SessionStore(
+                history_tokens=SESSION_HISTORY_TOKENS,
+                max_turns=SESSION_MAX_TURNS,
+                idle_timeout=SESSION_IDLE_TIMEOUT,
+                max_sessions=SESSION_MAX_SESSIONS,
+                max_bytes=SESSION_MAX_BYTES,
+            )
+        self.startup_timing: dict = {"import_ms": _IMPORT_MS}
+        self._prewarm_task: Optional[asyncio.Task] = None
+        
+        # Tool definitions are built once; clients list them on every (re)connect
+        self.tools = [
+            Tool(
+                name="konflux_chat",
+                description="""
+                Chat with the Konflux AI assistant for troubleshooting, questions, and guidance.
+                
+                The assistant is a Principal Konflux Platform Engineer with expertise in:
+                - Software Engineering
+                - Quality/Testing Engineering  
+                - Site Reliability Engineering (SRE)
+                - DevOps practices
+                
+                Use this for:
+                - Troubleshooting Konflux platform issues
+                - Getting documentation and guidance
+                - Understanding error messages
+                - Learning best practices
+                
+                The response will include:
+                - Diagnostic Assessment
+                - Solution/Answer
+                - Notes and warnings
+                - Confidence Level
+                
+                Set response_format to solution_only, summary or json to get back only
+                what you need and save context.
+                """,
+                inputSchema={
+                    "type": "object",
+                    "properties": QUESTION_PROPERTIES,
+                    "required": ["question"]
+                }
+            ),
+            Tool(
+                name="konflux_chat_stream",
+                description="""
+                Chat with Konflux AI assistant with streaming responses.
+                Same as konflux_chat but sends the answer in real-time as it's generated
+                (as MCP progress notifications, or log notifications when no progress token
+                is given). The complete answer is still returned when generation finishes.
+                Use this for longer responses where you want immediate feedback.
+                """,
+                inputSchema={
+                    "type": "object",
+                    "properties": QUESTION_PROPERTIES,
+                    "required": ["question"]
+                }
+            ),
+            Tool(
+                name="konflux_chat_batch",
+                description="""
+                Ask the Konflux AI assistant several independent questions at once,
+                for example one question per failing component of a release.
+                
+                Questions are answered concurrently and returned in input order, each
+                with its own status and timing. A failing question does not fail the others.
+                """,
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "questions": {
+                            "type": "array",
+                            "description": "Questions to ask; each takes the same fields as konflux_chat",
+                            "items": {
+                                "type": "object",
+                                "properties": QUESTION_PROPERTIES,
+                                "required": ["question"]
+                            },
+                            "minItems": 1,
+                            "maxItems": BATCH_MAX_ITEMS
+                        },
+                        "max_concurrency": {
+                            "type": "integer",
+                            "description": f"Optional: Questions answered at the same time (default and maximum: {BATCH_MAX_CONCURRENCY})",
+                            "minimum": 1,
+                            "maximum": BATCH_MAX_CONCURRENCY
+                        }
+                    },
+                    "required": ["questions"]
+                }
+            )
+        ]
         
         # Register tools
         @self.server.list_tools()
         async def list_tools() -> list[Tool]:
-            return [
-                Tool(
-                    name="konflux_chat",
-                    description="""
-                    Chat with the Konflux AI assistant for troubleshooting, questions, and guidance.
-                    
-                    The assistant is a Principal Konflux Platform Engineer with expertise in:
-                    - Software Engineering
-                    - Quality/Testing Engineering  
-                    - Site Reliability Engineering (SRE)
-                    - DevOps practices
-                    
-                    Use this for:
-                    - Troubleshooting Konflux platform issues
-                    - Getting documentation and guidance
-                    - Understanding error messages
-                    - Learning best practices
-                    
-                    The response will include:
-                    - Diagnostic Assessment
-                    - Solution/Answer
-                    - Notes and warnings
-                    - Confidence Level
-                    """,
-                    inputSchema={
-                        "type": "object",
-                        "properties": {
-                            "question": {
-                                "type": "string",
-                                "description": "Your question or issue description"
-                            },
-                            "urgency": {
-                                "type": "string",
-                                "enum": ["low", "medium", "high"],
-                                "description": "Urgency level (default: medium)",
-                                "default": "medium"
-                            },
-                            "tenant": {
-                                "type": "string",
-                                "description": "Optional: Your tenant/project name"
-                            },
-                            "application": {
-                                "type": "string",
-                                "description": "Optional: Your application name"
-                            },
-                            "component": {
-                                "type": "string",
-                                "description": "Optional: Your component name"
-                            },
-                            "details": {
-                                "type": "string",
-                                "description": "Optional: Additional context, error logs, or details"
-                            }
-                        },
-                        "required": ["question"]
-                    }
-                ),
-                Tool(
-                    name="konflux_chat_stream",
-                    description="""
-                    Chat with Konflux AI assistant with streaming responses.
-                    Same as konflux_chat but returns response in real-time as it's generated.
-                    Use this for longer responses where you want immediate feedback.
-                    """,
-                    inputSchema={
-                        "type": "object",
-                        "properties": {
-                            "question": {
-                                "type": "string",
-                                "description": "Your question or issue description"
-                            },
-                            "urgency": {
-                                "type": "string",
-                                "enum": ["low", "medium", "high"],
-                                "description": "Urgency level (default: medium)",
-                                "default": "medium"
-                            },
-                            "tenant": {
-                                "type": "string",
-                                "description": "Optional: Your tenant/project name"
-                            },
-                            "application": {
-                                "type": "string",
-                                "description": "Optional: Your application name"
-                            },
-                            "component": {
-                                "type": "string",
-                                "description": "Optional: Your component name"
-                            },
-                            "details": {
-                                "type": "string",
-                                "description": "Optional: Additional context, error logs, or details"
-                            }
-                        },
-                        "required": ["question"]
-                    }
-                )
-            ]
+            return self.tools
         
         @self.server.call_tool()
         async def call_tool(name: str, arguments: Any) -> list[TextContent]:
@@ -143,170 +580,1131 @@ class KonfluxChatbotMCP:
                 result = await self._chat(arguments)
                 return [TextContent(type="text", text=result)]
             elif name == "konflux_chat_stream":
-                result = await self._chat_stream(arguments)
+                notifier = ProgressNotifier.for_current_request(self.server)
+                try:
+                    result = await self._chat_stream(arguments, on_partial=notifier.update)
+                finally:
+                    await notifier.aclose()
                 return [TextContent(type="text", text=result)]
+            elif name == "konflux_chat_batch":
+                results = await self._chat_batch(arguments)
+                return [TextContent(type="text", text=result) for result in results]
             else:
                 raise ValueError(f"Unknown tool: {name}")
+        
+        @self.server.list_resources()
+        async def list_resources() -> list[Resource]:
+            return [
+                Resource(
+                    uri=METRICS_URI,
+                    name="Konflux chatbot server metrics",
+                    description="Call, upstream, queue, cache and resilience statistics with latency and size histograms (JSON)",
+                    mimeType="application/json",
+                ),
+                Resource(
+                    uri=OPENMETRICS_URI,
+                    name="Konflux chatbot server metrics (OpenMetrics)",
+                    description="The telemetry histograms and counters in OpenMetrics text format",
+                    mimeType="application/openmetrics-text",
+                ),
+            ]
+        
+        @self.server.read_resource()
+        async def read_resource(uri) -> list[ReadResourceContents]:
+            if str(uri) == METRICS_URI:
+                return [ReadResourceContents(json.dumps(self.metrics(), indent=2, default=str), "application/json")]
+            if str(uri) == OPENMETRICS_URI:
+                return [ReadResourceContents(self.telemetry.render_openmetrics(), "application/openmetrics-text")]
+            raise ValueError(f"Unknown resource: {uri}")
     
-    async def _chat(self, args: dict) -> str:
-        """Non-streaming chat with Konflux chatbot"""
+    @property
+    def chatbot_url(self) -> str:
+        """The first configured backend"""
+        return self.backends.primary.url
+    
+    @chatbot_url.setter
+    def chatbot_url(self, value: str):
+        # Comma-separated for several backends; resets their statistics
+        self.backends = BackendPool(
+            parse_backend_urls(value),
+            alpha=ROUTING_EWMA_ALPHA,
+            eject_failures=EJECT_FAILURES,
+            eject_error_rate=EJECT_ERROR_RATE,
+            readmit_probes=READMIT_PROBES,
+            eject_time=EJECT_TIME,
+        )
+        # One circuit per backend, so one deployment failing does not stop
+        # calls to the others
+        self.breakers = {
+            backend.url: CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT)
+            for backend in self.backends.backends
+        }
+    
+    def _build_input(
+        self,
+        args: dict,
+        report: Optional[dict] = None,
+        history: Optional[str] = None,
+        details: Optional[str] = None
+    ) -> str:
+        """Build the input string in the same format as the playground
+        
+        Size information about compacted details is added to report, if given.
+        history is the earlier conversation of the session; details, if given,
+        is args["details"] already compacted.
+        """
+        # Format: "Urgency: ...\n\nTenant: ...\n\nApplication: ...\n\nComponent: ...\n\n[Previous conversation: ...\n\n]Question: ...\n\nDetails: ..."
+        input_parts = []
+        
+        # Add urgency
+        urgency = args.get("urgency", "medium")
+        input_parts.append(f"Urgency: {urgency.capitalize()}")
+        
+        # Add tenant if provided
+        if args.get("tenant"):
+            input_parts.append(f"Tenant: {args['tenant']}")
+        
+        # Add application if provided
+        if args.get("application"):
+            input_parts.append(f"Application: {args['application']}")
+        
+        # Add component if provided
+        if args.get("component"):
+            input_parts.append(f"Component: {args['component']}")
+        
+        # Add the earlier turns of the session, if any
+        if history:
+            input_parts.append(f"Previous conversation:\n{history}")
+        
+        # Add question
+        input_parts.append(f"Question: {args['question']}")
+        
+        # Add details if provided
+        if details is None and args.get("details"):
+            details = self._compact_details(args["details"], report)
+        if details:
+            input_parts.append(f"Details: {details}")
+        
+        # Join with double newlines
+        return "\n\n".join(input_parts)
+    
+    def _stream_log_request(self, input_string: str, include_sources: bool = False) -> dict:
+        """Build the /stream_log request body
+        
+        LangServe streams every sub-run's log (including full retrieved
+        documents) unless told otherwise. Empty include lists ask it to send
+        only the root run's streamed_output/final_output patches; retriever
+        logs are added back when the caller wants sources.
+        """
+        payload = {"input": input_string, "config": {}}
+        if not STREAM_LOG_FILTER:
+            return payload
+        
+        include_types = list(STREAM_LOG_INCLUDE_TYPES)
+        if include_sources:
+            include_types += [t for t in SOURCES_INCLUDE_TYPES if t not in include_types]
+        payload.update({
+            "diff": True,
+            "include_names": list(STREAM_LOG_INCLUDE_NAMES),
+            "include_types": include_types,
+            "include_tags": list(STREAM_LOG_INCLUDE_TAGS),
+        })
+        return payload
+    
+    def _compact_details(self, details: str, report: Optional[dict] = None) -> str:
+        """Shrink pasted logs to the configured budget, keeping the failures"""
+        budget = DETAILS_MAX_BYTES
+        if DETAILS_MAX_TOKENS > 0:
+            # Roughly 4 bytes per token for English text and logs
+            budget = min(budget, DETAILS_MAX_TOKENS * 4)
+        if not DETAILS_COMPACTION or "\n" not in details:
+            # Free-text descriptions are passed through as written
+            return details
+        
+        result = compact_log(details, max_bytes=budget)
+        compacted = (
+            f"[Log compacted from {result.original_bytes} to {result.compacted_bytes} bytes; "
+            f"repeated lines, timestamps and lines far from errors were removed]\n{result.text}"
+        )
+        sent = len(compacted.encode("utf-8", errors="replace"))
+        if result.original_bytes <= budget and sent >= result.original_bytes:
+            # Within budget and the banner would eat the saving: send it as written
+            compacted, sent = details, result.original_bytes
+        self.compaction_totals["calls"] += 1
+        self.compaction_totals["original_bytes"] += result.original_bytes
+        self.compaction_totals["compacted_bytes"] += sent
+        if report is not None:
+            report["details_bytes"] = result.original_bytes
+            report["details_compacted_bytes"] = sent
+        return compacted
+    
+    async def _fetch_final_output(
+        self,
+        input_string: str,
+        flight: Optional["_Flight"] = None,
+        include_sources: bool = False
+    ) -> Optional[str]:
+        """Call /stream_log and return the run's final output, if any
+        
+        Transient failures that happen before any output arrives are retried
+        with jittered exponential backoff. A slow first attempt may be hedged
+        with a second one, and the circuit breaker fails calls fast while the
+        backend is unhealthy. With several backends, retries and hedges go to
+        a backend the call has not tried yet.
+        
+        When a flight is given, its first-byte time is recorded and the partial
+        answer is broadcast to its listeners as streamed chunks arrive.
+        
+        KONFLUX_CAPTURE_MODE=replay answers from the capture archive only;
+        =fallback answers from it when the backend cannot be reached.
+        """
+        payload = self._stream_log_request(input_string, include_sources)
+        if self.captures is None:
+            return await self._fetch_live(payload, flight, include_sources)
+        if CAPTURE_MODE == "replay":
+            return await self._replay(payload, flight, include_sources)
         try:
-            # Build the input string in the same format as the playground
-            # Format: "Urgency: ...\n\nTenant: ...\n\nApplication: ...\n\nComponent: ...\n\nQuestion: ...\n\nDetails: ..."
-            input_parts = []
-            
-            # Add urgency
-            urgency = args.get("urgency", "medium")
-            input_parts.append(f"Urgency: {urgency.capitalize()}")
-            
-            # Add tenant if provided
-            if args.get("tenant"):
-                input_parts.append(f"Tenant: {args['tenant']}")
-            
-            # Add application if provided
-            if args.get("application"):
-                input_parts.append(f"Application: {args['application']}")
-            
-            # Add component if provided
-            if args.get("component"):
-                input_parts.append(f"Component: {args['component']}")
-            
-            # Add question
-            input_parts.append(f"Question: {args['question']}")
-            
-            # Add details if provided
-            if args.get("details"):
-                input_parts.append(f"Details: {args['details']}")
-            
-            # Join with double newlines
-            input_string = "\n\n".join(input_parts)
-            
-            # Call /stream_log endpoint (returns Server-Sent Events format)
-            # Note: verify=False for internal Red Hat certificates
-            async with httpx.AsyncClient(timeout=120.0, verify=False) as client:
-                async with client.stream(
-                    "POST",
-                    f"{self.chatbot_url}/stream_log",
-                    json={"input": input_string, "config": {}}
-                ) as response:
-                    response.raise_for_status()
-                    
-                    final_output = None
-                    
-                    # Parse Server-Sent Events (SSE) format
-                    async for line in response.aiter_lines():
-                        if line.startswith("data: "):
-                            try:
-                                # Remove "data: " prefix and parse JSON
-                                data = json.loads(line[6:])
-                                
-                                # Look for final_output in the ops
-                                if isinstance(data, dict) and "ops" in data:
-                                    for op in data["ops"]:
-                                        if op.get("path") == "/final_output" and "value" in op:
-                                            final_output = op["value"]
-                                        # Also check for replace operations on final_output
-                                        elif op.get("op") == "replace" and op.get("path") == "/final_output":
-                                            final_output = op.get("value")
-                            except json.JSONDecodeError:
-                                continue
-                    
-                    if final_output:
-                        return str(final_output)
-                    else:
-                        return "No response received from chatbot"
-                    
-        except httpx.HTTPError as e:
-            return f"Error communicating with Konflux chatbot: {str(e)}\n\nPlease check:\n1. The chatbot URL is correct\n2. You have network access (VPN required for Red Hat internal services)\n3. The chatbot service is running"
+            return await self._fetch_live(payload, flight, include_sources)
         except Exception as e:
-            return f"Unexpected error: {str(e)}"
+            offline = is_backend_failure(e) or isinstance(e, CircuitOpen)
+            # Only when nothing has been streamed to the caller yet
+            if CAPTURE_MODE != "fallback" or not offline or (flight is not None and flight.first_byte_at):
+                raise
+            try:
+                answer = await self._replay(payload, flight, include_sources)
+            except CaptureMissing:
+                raise e from None
+            self.captures.stats["fallbacks"] += 1
+            recorded = flight.upstream["recorded_at"] if flight is not None else "earlier"
+            return (
+                f"> **Offline answer** replayed from a response recorded {recorded}; "
+                f"the chatbot could not be reached ({self._outcome(e)}).\n\n{answer}"
+            ) if answer else answer
     
-    async def _chat_stream(self, args: dict) -> str:
-        """Streaming chat with Konflux chatbot"""
+    async def _fetch_live(
+        self,
+        payload: dict,
+        flight: Optional["_Flight"],
+        include_sources: bool
+    ) -> Optional[str]:
+        """The upstream request with retries, hedging and the circuit breaker"""
+        tried: set[Backend] = set()
+        
+        for retry in range(RETRY_ATTEMPTS + 1):
+            race = Race()
+            try:
+                final_output = await hedged_race(
+                    lambda attempt, race: self._stream_attempt(attempt, race, payload, flight, include_sources, tried),
+                    self._hedge_delay(),
+                    race
+                )
+            except Exception as e:
+                # Never retry once output has arrived: the answer is not idempotent
+                if race.winner is not None or not is_retryable(e) or retry >= RETRY_ATTEMPTS:
+                    raise
+                self.resilience_stats["retries"] += 1
+                await asyncio.sleep(backoff_delay(retry, RETRY_BASE_DELAY, RETRY_MAX_DELAY))
+            else:
+                self.resilience_stats["hedged"] += race.hedged
+                if race.winner == 1:
+                    self.resilience_stats["hedge_wins"] += 1
+                return final_output
+    
+    def _hedge_delay(self) -> Optional[float]:
+        """Seconds to wait for a first byte before hedging, or None"""
+        if not HEDGE_ENABLED or len(self.first_byte_latency) < HEDGE_MIN_SAMPLES:
+            return None
+        return max(HEDGE_MIN_DELAY, self.first_byte_latency.percentile(HEDGE_PERCENTILE))
+    
+    async def _stream_attempt(
+        self,
+        attempt: int,
+        race: Race,
+        payload: dict,
+        flight: Optional["_Flight"],
+        include_sources: bool,
+        tried: Optional[set] = None
+    ) -> Optional[str]:
+        """One POST to /stream_log; the first attempt to receive output wins
+        
+        The backend is picked by the routing pool, avoiding those in tried
+        (which the chosen one is added to) and those whose circuit is open,
+        and the outcome is reported back to both. When every circuit is open
+        the attempt fails fast with CircuitOpen.
+        """
+        tried = tried if tried is not None else set()
+        open_circuits = {b for b in self.backends.backends if not self.breakers[b.url].allows_call()}
+        backend = self.backends.pick(exclude=tried | open_circuits)
+        breaker = self.breakers[backend.url]
+        breaker.before_call()
+        tried.add(backend)
+        self.backends.started(backend)
+        started = time.perf_counter()
+        seen: dict = {}
         try:
-            # Build the input string in the same format as the playground
-            input_parts = []
-            
-            # Add urgency
-            urgency = args.get("urgency", "medium")
-            input_parts.append(f"Urgency: {urgency.capitalize()}")
-            
-            # Add tenant if provided
-            if args.get("tenant"):
-                input_parts.append(f"Tenant: {args['tenant']}")
-            
-            # Add application if provided
-            if args.get("application"):
-                input_parts.append(f"Application: {args['application']}")
+            final_output = await self._stream_from(backend, attempt, race, payload, flight, include_sources, seen)
+        except asyncio.CancelledError:
+            self.backends.finished(backend, None, ok=True)
+            breaker.record_ignored()
+            raise
+        except Exception as e:
+            ok = not is_backend_failure(e)
+            self.backends.finished(backend, time.perf_counter() - started, ok)
+            if ok:
+                breaker.record_ignored()
+            else:
+                breaker.record_failure()
+            self._observe_backend(backend, self._outcome(e))
+            raise
+        # Routing compares backends by time to first byte, not answer length
+        first_byte = seen.get("first_byte", time.perf_counter()) - started
+        self.backends.finished(backend, first_byte, ok=True)
+        breaker.record_success()
+        self._observe_backend(backend, "ok")
+        return final_output
+    
+    def _observe_backend(self, backend: Backend, outcome: str):
+        if len(self.backends) > 1:
+            self.telemetry.increment("konflux_backend_requests", backend=backend.url, outcome=outcome)
+    
+    async def _stream_from(
+        self,
+        backend: Backend,
+        attempt: int,
+        race: Race,
+        payload: dict,
+        flight: Optional["_Flight"],
+        include_sources: bool,
+        seen: dict
+    ) -> Optional[str]:
+        """Stream one answer from backend; seen["first_byte"] is set on the first line"""
+        started = time.perf_counter()
+        connect = {}
+        
+        async def trace(event: str, info: dict):
+            # Only new connections report these; reused ones skip straight to the request
+            if event in ("connection.connect_tcp.started", "connection.start_tls.started"):
+                connect[event] = time.perf_counter()
+            elif event == "connection.connect_tcp.complete":
+                connect["tcp"] = time.perf_counter() - connect["connection.connect_tcp.started"]
+            elif event == "connection.start_tls.complete":
+                connect["tls"] = time.perf_counter() - connect["connection.start_tls.started"]
+        
+        # Call /stream_log endpoint (returns Server-Sent Events format)
+        client = self._get_client()
+        async with client.stream(
+            "POST",
+            f"{backend.url}/stream_log",
+            json=payload,
+            extensions={"trace": trace}
+        ) as response:
+            for phase in ("tcp", "tls"):
+                if phase in connect:
+                    self.telemetry.observe("konflux_connect_seconds", connect[phase], phase=phase)
+            response.raise_for_status()
             
-            # Add component if provided
-            if args.get("component"):
-                input_parts.append(f"Component: {args['component']}")
+            chunks = response.aiter_bytes()
+            recorder = None
+            if self.captures is not None and CAPTURE_MODE in ("record", "fallback"):
+                # Archive the stream as the backend sent it, before any limits apply
+                recorder = Recorder(started)
+                chunks = recorder.wrap(chunks)
+            lines = bounded_lines(chunks, MAX_EVENT_BYTES, MAX_RESPONSE_BYTES, self.stream_limit_stats)
+            try:
+                parser, parse_time = await self._read_stream(
+                    lines, attempt, race, flight, include_sources, seen, started
+                )
+            except ResponseTooLarge:
+                # Leaving the block closes the connection without reading the rest
+                self.stream_limit_stats["aborted_responses"] += 1
+                raise
+            if parser is None:
+                return None
+            final_output = self._finish_stream(
+                parser, parse_time, response.num_bytes_downloaded, payload, flight, {
+                    "backend": backend.url,
+                    "connect_ms": sum(connect.get(phase, 0.0) for phase in ("tcp", "tls")) * 1000,
+                }
+            )
+        
+        if recorder is not None and final_output:
+            await self.captures.astore(capture_key(payload), recorder, response.num_bytes_downloaded)
+        return final_output
+    
+    async def _read_stream(
+        self,
+        lines: AsyncIterator[str],
+        attempt: int,
+        race: Race,
+        flight: Optional["_Flight"],
+        include_sources: bool,
+        seen: dict,
+        started: float
+    ) -> tuple[Optional[StreamLogParser], float]:
+        """Feed SSE lines to a parser until the end event
+        
+        Returns the parser (None when another attempt answered first) and the
+        time spent parsing.
+        """
+        parser = StreamLogParser(collect_sources=include_sources)
+        parse_time = 0.0
+        async for line in lines:
+            if "first_byte" not in seen:
+                seen["first_byte"] = time.perf_counter()
+            if race.winner != attempt:
+                if not race.claim(attempt):
+                    # Another attempt answered first
+                    return None, parse_time
+                self.first_byte_latency.add(time.perf_counter() - started)
+                if flight is not None:
+                    flight.first_byte_at = time.perf_counter()
+                    flight.attach(parser)
+            # Parsing never awaits, so this is CPU time spent on the line
+            parse_started = time.perf_counter()
+            ended = parser.feed_line(line)
+            parse_time += time.perf_counter() - parse_started
+            # Stop reading (and release the connection) at the end event
+            if ended:
+                break
+        return parser, parse_time
+    
+    def _finish_stream(
+        self,
+        parser: StreamLogParser,
+        parse_time: float,
+        wire_bytes: int,
+        payload: dict,
+        flight: Optional["_Flight"],
+        upstream: dict
+    ) -> Optional[str]:
+        """The parsed answer (with sources); records the response's statistics"""
+        parse_started = time.perf_counter()
+        try:
+            final_output = parser.result()
+        finally:
+            parse_time += time.perf_counter() - parse_started
+            entry = self._record_upstream(wire_bytes, parser, payload, parse_time)
+            if flight is not None:
+                flight.upstream = {**upstream, **entry}
+        
+        if final_output and parser.sources:
+            final_output += "\n\n**Sources:**\n" + "\n".join(
+                f"- [{s['title'] or s['source']}]({s['source']})" for s in parser.sources
+            )
+        return final_output
+    
+    async def _replay(
+        self,
+        payload: dict,
+        flight: Optional["_Flight"],
+        include_sources: bool
+    ) -> Optional[str]:
+        """Serve a /stream_log request from the capture archive
+        
+        The recorded lines go through the same stream limits, parsing and
+        streaming path as a live response, paced by KONFLUX_REPLAY_SPEED.
+        """
+        capture = await self.captures.aload(capture_key(payload))
+        if capture is None:
+            raise CaptureMissing("no recorded answer for this question")
+        self.captures.stats["replayed"] += 1
+        started = time.perf_counter()
+        race = Race()
+        chunks = (line.encode("utf-8") + b"\n" async for line in replay_lines(capture, REPLAY_SPEED))
+        lines = bounded_lines(chunks, MAX_EVENT_BYTES, MAX_RESPONSE_BYTES, self.stream_limit_stats)
+        parser, parse_time = await self._read_stream(lines, 0, race, flight, include_sources, {}, started)
+        recorded = time.strftime("%Y-%m-%d %H:%M UTC", time.gmtime(capture.recorded_at))
+        return self._finish_stream(
+            parser, parse_time, capture.wire_bytes, payload, flight,
+            {"backend": "capture", "replayed": True, "recorded_at": recorded},
+        )
+    
+    def _record_upstream(
+        self, wire_bytes: int, parser: StreamLogParser, payload: dict, parse_time: float = 0.0
+    ) -> dict:
+        """Keep byte/event counts and parse time for one upstream response"""
+        entry = {
+            "wire_bytes": wire_bytes,
+            "text_bytes": parser.stats["bytes"],
+            "events": parser.stats["events"],
+            "decoded_events": parser.stats["decoded"],
+            "skipped_events": parser.stats["skipped"],
+            "parse_ms": parse_time * 1000,
+            "filtered": "include_types" in payload,
+        }
+        self.recent_upstream.append(entry)
+        self.upstream_totals["responses"] += 1
+        self.upstream_totals["wire_bytes"] += wire_bytes
+        self.upstream_totals["events"] += entry["events"]
+        self.telemetry.observe("konflux_response_bytes", wire_bytes)
+        self.telemetry.observe("konflux_response_events", entry["events"])
+        self.telemetry.observe("konflux_parse_cpu_seconds", parse_time)
+        return entry
+    
+    async def _answer(self, args: dict, tool: str, on_partial: Optional[Callable[[str], None]] = None) -> str:
+        """Answer a question, serving repeated questions from the cache
+        
+        Records time to first byte and time to final answer for the call.
+        """
+        started = time.perf_counter()
+        timing = {"tool": tool, "source": "upstream", "ttfb_ms": None, "ttf_ms": None}
+        flight = None
+        
+        def partial_received(text: str):
+            if timing.get("first_token_ms") is None:
+                timing["first_token_ms"] = (time.perf_counter() - started) * 1000
+            on_partial(text)
+        
+        session_id = str(args.get("session_id") or "").strip() or None
+        if self.sessions is None:
+            session_id = None
+        elif session_id is not None:
+            # Client-chosen ids only name a conversation within one caller, so
+            # another client sending the same id sees none of its history
+            session_id = f"{self._caller_key()}/{session_id}"
+        details = None
+        limit_key, admitted_at = None, None
+        
+        def finish(answer: str) -> str:
+            if session_id is not None:
+                self.sessions.record(session_id, str(args.get("question", "")), answer, args, details)
+            return answer
+        
+        try:
+            history = None
+            if session_id is not None:
+                # Follow-ups may leave out the tenant/application/component
+                args = self.sessions.with_context(session_id, args)
+                history = self.sessions.history(session_id)
+                timing["history_chars"] = len(history) if history else 0
+            if args.get("details"):
+                details = self._compact_details(args["details"], timing)
+            input_string = self._build_input(args, timing, history, details)
+            include_sources = bool(args.get("include_sources", False))
+            # Answers with sources are cached separately from plain answers
+            cache_text = f"{input_string}\n\n[sources]" if include_sources else input_string
+            use_cache = self.cache is not None and not args.get("bypass_cache", False)
             
-            # Add question
-            input_parts.append(f"Question: {args['question']}")
+            if use_cache:
+                cached = await self.cache.aget(cache_text)
+                if cached is not None:
+                    timing["source"] = "cache"
+                    timing["ttfb_ms"] = (time.perf_counter() - started) * 1000
+                    return finish(cached)
             
-            # Add details if provided
-            if args.get("details"):
-                input_parts.append(f"Details: {args['details']}")
+            # Questions that come with their own logs or details are too
+            # specific to answer from a similar question, and so are follow-ups
+            similar_scope = None
+            if self.similar is not None and not args.get("details") and not history:
+                similar_scope = self._similar_scope(args, include_sources)
+            if use_cache and similar_scope is not None:
+                reused = await self._reuse_similar(similar_scope, args.get("question", ""), timing)
+                if reused is not None:
+                    timing["ttfb_ms"] = (time.perf_counter() - started) * 1000
+                    return finish(reused)
             
-            # Join with double newlines
-            input_string = "\n\n".join(input_parts)
+            # Identical questions already in flight share one upstream request;
+            # every streaming caller still receives the partial answer
+            key = cache_key(cache_text)
+            deadline = self._deadline(args)
+            timeout = asyncio.timeout(deadline - (time.perf_counter() - started) if deadline else None)
+            # Only a call that starts an upstream request counts against its
+            # limits: cache hits and callers joining a request in flight add no load
+            if self.limiter is not None and key not in self._flights:
+                limit_key = self._limit_key(args)
+                admitted_at = self.limiter.acquire(limit_key)
+            try:
+                flight = self._flights.get(key)
+                if flight is None:
+                    flight = self._flights[key] = _Flight()
+                if on_partial is not None:
+                    flight.add_listener(partial_received)
+                # The urgency is part of the input (and so of the key), so every
+                # caller sharing this flight has the same priority: nothing to promote
+                priority = URGENCY_PRIORITY.get(str(args.get("urgency", "medium")).lower(), 1)
+                # Leaving on the deadline (or on client cancellation) abandons
+                # the upstream stream unless another caller still waits for it
+                async with timeout:
+                    final_output = await self.inflight.do(
+                        key,
+                        lambda: self._fetch_and_store(input_string, cache_text, key, flight, include_sources, priority)
+                    )
+            except TimeoutError:
+                if not timeout.expired():
+                    raise
+                partial = flight.parser.best_partial() if flight.parser is not None else None
+                if not partial:
+                    raise DeadlineExceeded(deadline) from None
+                timing["outcome"] = "deadline_partial"
+                return (
+                    f"> **Partial answer**: the chatbot had not finished after the {deadline:g} s deadline; "
+                    f"this is what it had written so far. Pass a larger `deadline_seconds` for the full answer.\n\n"
+                    f"{partial}"
+                )
+            except ResponseTooLarge as e:
+                partial = flight.parser.best_partial() if flight.parser is not None else None
+                if not partial:
+                    raise
+                timing["outcome"] = "too_large_partial"
+                return (
+                    f"> **Partial answer**: the chatbot's response was cut off because {e}; "
+                    f"this is what it had written up to that point.\n\n{partial}"
+                )
+            except StreamError as e:
+                partial = flight.parser.best_partial() if flight.parser is not None else None
+                if not partial:
+                    raise
+                timing["outcome"] = "stream_error_partial"
+                return (
+                    f"> **Partial answer**: the chatbot stopped part way through ({e}); "
+                    f"this is what it had written up to that point. Retry for the full answer.\n\n{partial}"
+                )
+            finally:
+                if on_partial is not None:
+                    flight.remove_listener(partial_received)
+                # _fetch_and_store removes the flight, but only once its task
+                # has started; a task cancelled before that leaves it here
+                if key not in self.inflight and self._flights.get(key) is flight:
+                    del self._flights[key]
             
-            # Call /stream_log endpoint (returns Server-Sent Events format)
-            # Note: verify=False for internal Red Hat certificates
-            async with httpx.AsyncClient(timeout=120.0, verify=False) as client:
-                async with client.stream(
-                    "POST",
-                    f"{self.chatbot_url}/stream_log",
-                    json={"input": input_string, "config": {}}
-                ) as response:
-                    response.raise_for_status()
-                    
-                    final_output = None
-                    
-                    # Parse Server-Sent Events (SSE) format
-                    async for line in response.aiter_lines():
-                        if line.startswith("data: "):
-                            try:
-                                # Remove "data: " prefix and parse JSON
-                                data = json.loads(line[6:])
-                                
-                                # Look for final_output in the ops
-                                if isinstance(data, dict) and "ops" in data:
-                                    for op in data["ops"]:
-                                        if op.get("path") == "/final_output" and "value" in op:
-                                            final_output = op["value"]
-                                        # Also check for replace operations on final_output
-                                        elif op.get("op") == "replace" and op.get("path") == "/final_output":
-                                            final_output = op.get("value")
-                            except json.JSONDecodeError:
-                                continue
-                    
-                    if final_output:
-                        return str(final_output)
-                    else:
-                        return "No response received from chatbot"
-                    
-        except httpx.HTTPError as e:
+            if not final_output:
+                timing["outcome"] = "empty"
+                return NO_RESPONSE_MESSAGE
+            if similar_scope is not None:
+                self.similar.add(similar_scope, args.get("question", ""), cache_text)
+            return finish(final_output)
+        except BaseException as e:
+            timing["outcome"] = self._outcome(e)
+            raise
+        finally:
+            if admitted_at is not None:
+                self.limiter.release(limit_key, admitted_at)
+            if flight is not None and flight.queue_wait is not None:
+                timing["queue_ms"] = flight.queue_wait * 1000
+            if flight is not None and flight.first_byte_at is not None:
+                timing["ttfb_ms"] = max(flight.first_byte_at - started, 0.0) * 1000
+            if flight is not None and flight.upstream is not None:
+                timing.update(flight.upstream)
+                if flight.upstream.get("replayed"):
+                    timing["source"] = "capture"
+            timing["ttf_ms"] = (time.perf_counter() - started) * 1000
+            timing.setdefault("outcome", "ok" if timing["source"] == "upstream" else f"{timing['source']}_hit")
+            self.recent_calls.append(timing)
+            self._observe_call(timing)
+            if "first_call_ms" not in self.startup_timing:
+                self.startup_timing["first_call_ms"] = timing["ttf_ms"]
+                self.startup_timing["first_call_connect_ms"] = timing.get("connect_ms")
+    
+    def _limit_key(self, args: dict) -> str:
+        """Whose limits a call counts against: its tenant, else the client session
+        
+        Stateless HTTP creates a new session for every request, so there the
+        client's address stands in for the session (one shared bucket when
+        the address is unknown).
+        """
+        tenant = str(args.get("tenant") or "").strip().lower()
+        if tenant:
+            return f"tenant:{tenant}"
+        return self._caller_key()
+    
+    def _caller_key(self) -> str:
+        """The MCP client session a call came from (its address in stateless HTTP mode)"""
+        try:
+            context = self.server.request_context
+        except LookupError:
+            return "local"  # called outside an MCP request (tests, benchmarks)
+        if self.http_stateless:
+            client = getattr(context.request, "client", None)
+            return f"client:{client.host}" if client is not None and client.host else "anonymous"
+        return f"session:{id(context.session):x}"
+    
+    @staticmethod
+    def _deadline(args: dict) -> Optional[float]:
+        """Seconds the call may take: deadline_seconds, or the urgency's default"""
+        value = args.get("deadline_seconds")
+        if value is None:
+            value = DEADLINES.get(str(args.get("urgency", "medium")).lower(), DEADLINES["medium"])
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            raise InvalidArgument(f"deadline_seconds must be a number of seconds, got {value!r}") from None
+        return value if value > 0 else None
+    
+    @staticmethod
+    def _similar_scope(args: dict, include_sources: bool) -> tuple:
+        """Answers are only reused within the same tenant, application and component"""
+        return (
+            str(args.get("tenant", "")).strip().lower(),
+            str(args.get("application", "")).strip().lower(),
+            str(args.get("component", "")).strip().lower(),
+            include_sources,
+        )
+    
+    async def _reuse_similar(self, scope: tuple, question: str, timing: dict) -> Optional[str]:
+        """The cached answer to a near-duplicate earlier question, labelled as reused"""
+        match = self.similar.lookup(scope, question)
+        if match is None:
+            return None
+        answer = await self.cache.aget(match.key)
+        if answer is None:
+            # The answer has expired or been evicted from the cache
+            self.similar.discard(match.key)
+            return None
+        timing["source"] = "similar"
+        timing["similarity"] = round(match.similarity, 3)
+        return (
+            f"> **Reused answer** from an earlier, similar question: \"{match.question}\" "
+            f"(similarity {match.similarity:.2f}). Pass `bypass_cache: true` to get a fresh answer.\n\n"
+            f"{answer}"
+        )
+    
+    def _observe_call(self, timing: dict):
+        """Add one call's timing to the telemetry histograms"""
+        tool = timing["tool"]
+        self.telemetry.increment("konflux_tool_calls", tool=tool, outcome=timing["outcome"])
+        self.telemetry.observe("konflux_call_duration_seconds", timing["ttf_ms"] / 1000, tool=tool)
+        if timing["source"] == "upstream" and timing["ttfb_ms"] is not None:
+            self.telemetry.observe("konflux_first_event_seconds", timing["ttfb_ms"] / 1000, tool=tool)
+    
+    async def _fetch_and_store(
+        self,
+        input_string: str,
+        cache_text: str,
+        key: str,
+        flight: "_Flight",
+        include_sources: bool,
+        priority: int
+    ) -> Optional[str]:
+        """Fetch an answer upstream and store it in the cache
+        
+        Waits for an upstream slot first; urgent questions are admitted ahead
+        of less urgent ones.
+        """
+        try:
+            async with self.scheduler.slot(priority) as waited:
+                flight.queue_wait = waited
+                self.telemetry.observe("konflux_queue_wait_seconds", waited)
+                final_output = await self._fetch_final_output(input_string, flight, include_sources)
+        finally:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        # bypass_cache skips the lookup but still refreshes the stored answer;
+        # replayed captures are already stored in the archive. Only streams
+        # that reached their end event cleanly are complete enough to keep
+        replayed = flight.upstream is not None and flight.upstream.get("replayed")
+        complete = flight.parser is not None and flight.parser.done and not flight.parser.error
+        if final_output and complete and self.cache is not None and not replayed:
+            await self.cache.aset(cache_text, final_output)
+        return final_output
+    
+    def metrics(self) -> dict:
+        """Snapshot of the server's counters"""
+        return {
+            "upstream_requests": self.inflight.started,
+            "coalesced_calls": self.inflight.coalesced,
+            "abandoned_requests": self.inflight.abandoned,
+            "in_flight": len(self.inflight),
+            "scheduler": self.scheduler.snapshot(),
+            "tenants": self.limiter.snapshot() if self.limiter is not None else None,
+            "resilience": {
+                **self.resilience_stats,
+                "first_byte_p50_ms": (self.first_byte_latency.percentile(50) or 0.0) * 1000,
+                "first_byte_p95_ms": (self.first_byte_latency.percentile(95) or 0.0) * 1000,
+                "circuits": {url: breaker.snapshot() for url, breaker in self.breakers.items()},
+            },
+            "upstream_totals": dict(self.upstream_totals),
+            "stream_limits": {
+                "max_event_bytes": MAX_EVENT_BYTES,
+                "max_response_bytes": MAX_RESPONSE_BYTES,
+                **self.stream_limit_stats,
+            },
+            "backends": self.backends.snapshot(),
+            "details_compaction": dict(self.compaction_totals),
+            "response_formats": {name: dict(totals) for name, totals in self.format_totals.items()},
+            "recent_upstream": list(self.recent_upstream),
+            "recent_calls": list(self.recent_calls),
+            "cache": self.cache.snapshot() if self.cache is not None else None,
+            "similar": self.similar.snapshot() if self.similar is not None else None,
+            "captures": self.captures.snapshot() if self.captures is not None else None,
+            "sessions": self.sessions.snapshot() if self.sessions is not None else None,
+            "telemetry": self.telemetry.snapshot(),
+            "startup": dict(self.startup_timing),
+        }
+    
+    @staticmethod
+    def _error_message(e: Exception) -> str:
+        """User-facing text for a failed chat call"""
+        if isinstance(e, httpx.HTTPError):
             return f"Error communicating with Konflux chatbot: {str(e)}\n\nPlease check:\n1. The chatbot URL is correct\n2. You have network access (VPN required for Red Hat internal services)\n3. The chatbot service is running"
+        if isinstance(e, CircuitOpen):
+            return f"The Konflux chatbot backend is currently unavailable ({str(e)}).\n\nRecent requests to it failed, so this call was not attempted. Please retry later."
+        if isinstance(e, SchedulerBusy):
+            return f"The Konflux chatbot is busy right now: {str(e)}.\n\nPlease retry in a moment. Questions with higher urgency are answered first."
+        if isinstance(e, RateLimited):
+            return f"Rate limited: {str(e)}.\n\nRetry after {e.retry_after:.1f} s (retry_after_seconds: {e.retry_after:.1f}). Limits are per tenant, or per client session (client address in stateless HTTP mode) when no tenant is given."
+        if isinstance(e, ResponseTooLarge):
+            return f"The Konflux chatbot's response was aborted: {str(e)}.\n\nNothing of the answer had arrived yet. Ask a narrower question, or raise KONFLUX_MAX_EVENT_BYTES / KONFLUX_MAX_RESPONSE_BYTES if such large answers are expected."
+        if isinstance(e, StreamError):
+            return f"Konflux chatbot reported an error: {str(e)}"
+        if isinstance(e, DeadlineExceeded):
+            return f"The Konflux chatbot did not start answering in time: {str(e)}.\n\nRetry with a larger `deadline_seconds` (or lower urgency) if the backend is slow right now."
+        if isinstance(e, CaptureMissing):
+            return f"No recorded answer to replay: {str(e)}.\n\nKONFLUX_CAPTURE_MODE=replay only answers questions asked while recording."
+        if isinstance(e, InvalidArgument):
+            return f"Invalid argument: {str(e)}"
+        return f"Unexpected error: {str(e)}"
+    
+    @staticmethod
+    def _outcome(e: BaseException) -> str:
+        """Outcome class of a failed call, for telemetry"""
+        if isinstance(e, asyncio.CancelledError):
+            return "cancelled"
+        if isinstance(e, httpx.HTTPStatusError):
+            return "upstream_4xx" if e.response.status_code < 500 else "upstream_5xx"
+        if isinstance(e, httpx.TimeoutException):
+            return "timeout"
+        if isinstance(e, httpx.TransportError):
+            return "connection_error"
+        if isinstance(e, CircuitOpen):
+            return "circuit_open"
+        if isinstance(e, SchedulerBusy):
+            return "busy"
+        if isinstance(e, RateLimited):
+            return "rate_limited"
+        if isinstance(e, ResponseTooLarge):
+            return "too_large"
+        if isinstance(e, StreamError):
+            return "stream_error"
+        if isinstance(e, CaptureMissing):
+            return "capture_missing"
+        if isinstance(e, DeadlineExceeded):
+            return "deadline"
+        return "error"
+    
+    @staticmethod
+    def _response_format(args: dict) -> str:
+        """The caller's response_format, checked before the question is sent upstream"""
+        response_format = args.get("response_format") or RESPONSE_FORMAT
+        if response_format not in RESPONSE_FORMATS:
+            raise InvalidArgument(
+                f"unknown response_format {response_format!r} (expected one of {', '.join(RESPONSE_FORMATS)})"
+            )
+        return response_format
+    
+    def _format_answer(self, answer: str, response_format: str) -> str:
+        """The answer in the caller's response_format"""
+        formatted = format_answer(answer, response_format)
+        totals = self.format_totals.setdefault(
+            response_format, {"calls": 0, "answer_bytes": 0, "returned_bytes": 0}
+        )
+        totals["calls"] += 1
+        totals["answer_bytes"] += len(answer.encode("utf-8"))
+        totals["returned_bytes"] += len(formatted.encode("utf-8"))
+        return formatted
+    
+    async def _chat(self, args: dict) -> str:
+        """Non-streaming chat with Konflux chatbot"""
+        try:
+            response_format = self._response_format(args)
+            return self._format_answer(await self._answer(args, "konflux_chat"), response_format)
         except Exception as e:
-            return f"Unexpected error: {str(e)}"
-    
-    async def run(self):
-        """Run the MCP server"""
-        async with stdio_server() as (read_stream, write_stream):
-            await self.server.run(
-                read_stream,
-                write_stream,
-                self.server.create_initialization_options()
+            return self._error_message(e)
+    
+    async def _chat_stream(self, args: dict, on_partial: Optional[Callable[[str], None]] = None) -> str:
+        """Streaming chat with Konflux chatbot
+        
+        The partial answer is passed to on_partial as it streams in; the full
+        answer (in the requested response_format) is still returned at the end.
+        """
+        try:
+            response_format = self._response_format(args)
+            return self._format_answer(await self._answer(args, "konflux_chat_stream", on_partial), response_format)
+        except Exception as e:
+            return self._error_message(e)
+    
+    @staticmethod
+    def _max_concurrency(args: dict) -> int:
+        """The batch's max_concurrency, between 1 and BATCH_MAX_CONCURRENCY"""
+        value = args.get("max_concurrency")
+        if value is None:
+            return BATCH_MAX_CONCURRENCY
+        try:
+            if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+                raise ValueError(value)
+            limit = int(value)
+        except (TypeError, ValueError):
+            raise InvalidArgument(f"max_concurrency must be a whole number, got {value!r}") from None
+        if not 1 <= limit <= BATCH_MAX_CONCURRENCY:
+            raise InvalidArgument(f"max_concurrency must be between 1 and {BATCH_MAX_CONCURRENCY}, got {limit}")
+        return limit
+    
+    async def _chat_batch(self, args: dict) -> list[str]:
+        """Answer several questions concurrently, returning results in input order
+        
+        All questions share the pooled HTTP client, the cache and in-flight
+        coalescing; a semaphore bounds how many run at the same time.
+        """
+        questions = list(args.get("questions") or [])[:BATCH_MAX_ITEMS]
+        if not questions:
+            return ["No questions given"]
+        try:
+            limit = self._max_concurrency(args)
+        except InvalidArgument as e:
+            return [self._error_message(e)]
+        if self.limiter is not None:
+            # Stay within the callers' concurrency quotas instead of tripping them
+            quotas = [
+                self.limiter.limits(self._limit_key(item if isinstance(item, dict) else {}))[2]
+                for item in questions
+            ]
+            limit = min([limit] + [quota for quota in quotas if quota > 0])
+        semaphore = asyncio.Semaphore(limit)
+        
+        async def answer_one(index: int, item: Any) -> str:
+            async with semaphore:
+                started = time.perf_counter()
+                status = "ok"
+                question = item.get("question") if isinstance(item, dict) else None
+                try:
+                    if not question:
+                        raise InvalidArgument("'question' is required")
+                    response_format = self._response_format(item)
+                    answer = await self._answer(item, "konflux_chat_batch")
+                    if answer == NO_RESPONSE_MESSAGE:
+                        status = "error"
+                    answer = self._format_answer(answer, response_format)
+                except Exception as e:
+                    answer = self._error_message(e)
+                    status = "error"
+                elapsed = time.perf_counter() - started
+            return f"### [{index + 1}/{len(questions)}] {question}\nStatus: {status} ({elapsed:.1f} s)\n\n{answer}"
+        
+        return list(await asyncio.gather(*(answer_one(i, item) for i, item in enumerate(questions))))
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """Return the shared HTTP client, creating it on first use"""
+        if self.client is None:
+            self.client = create_http_client()
+        return self.client
+    
+    def _load_similarity_index(self):
+        """Create the near-duplicate question index (imports numpy)"""
+        # It points at answers in the response cache, so it needs the cache
+        if not SIMILAR_ENABLED or self.cache is None or self.similar is not None:
+            return
+        try:
+            from similarity_index import SimilarityIndex
+        except ImportError:
+            warnings.warn("KONFLUX_SIMILAR_ENABLED is set but 'numpy' is not installed; "
+                          "only identical questions reuse answers")
+            return
+        self.similar = SimilarityIndex(
+            threshold=SIMILAR_THRESHOLD, max_entries=SIMILAR_MAX_ENTRIES, ttl=CACHE_TTL
+        )
+    
+    async def _prewarm(self):
+        """Background start-up work that the first call would otherwise wait for"""
+        timing = self.startup_timing
+        # Building the client's SSL context takes ~100 ms; keep it off the loop
+        started = time.perf_counter()
+        client = await asyncio.to_thread(create_http_client)
+        if self.client is None:
+            self.client = client
+        else:
+            # A call needed the client first and created its own
+            await client.aclose()
+        timing["http_client_ms"] = (time.perf_counter() - started) * 1000
+        
+        if PREWARM:
+            try:
+                urls = [httpx.URL(backend.url) for backend in self.backends.backends]
+                started = time.perf_counter()
+                await asyncio.gather(*(
+                    asyncio.get_running_loop().getaddrinfo(
+                        url.host, url.port or (443 if url.scheme == "https" else 80)
+                    )
+                    for url in urls
+                ))
+                timing["prewarm_dns_ms"] = (time.perf_counter() - started) * 1000
+                # The point is the pooled (TLS) connection; with several
+                # backends this doubles as their first health probe.
+                started = time.perf_counter()
+                healthy = await self.backends.probe_all(self._get_client(), CONNECT_TIMEOUT)
+                timing["prewarm_connect_ms"] = (time.perf_counter() - started) * 1000
+                unreachable = [b.url for b, ok in zip(self.backends.backends, healthy) if not ok]
+                if unreachable:
+                    timing["prewarm_error"] = "no healthy response from " + ", ".join(unreachable)
+            except Exception as e:
+                # Best effort; the first call connects as usual
+                timing["prewarm_error"] = str(e) or type(e).__name__
+        
+        started = time.perf_counter()
+        await asyncio.to_thread(self._load_similarity_index)
+        timing["similarity_index_ms"] = (time.perf_counter() - started) * 1000
+    
+    async def startup(self):
+        """Open long-lived resources (HTTP connection pool, metrics exporters)
+        
+        The HTTP client, DNS lookup, first connection and similarity index
+        are set up in the background so the MCP handshake is not held up;
+        calls arriving before that is done create what they need themselves.
+        """
+        started = time.perf_counter()
+        if self._prewarm_task is None:
+            self._prewarm_task = asyncio.create_task(self._prewarm())
+        if len(self.backends) > 1 and HEALTH_INTERVAL > 0 and self._probe_task is None:
+            self._probe_task = asyncio.create_task(
+                self.backends.probe_periodically(self._get_client, HEALTH_INTERVAL, HEALTH_TIMEOUT)
+            )
+        render = self.telemetry.render_openmetrics
+        if METRICS_PORT and self._metrics_server is None:
+            self._metrics_server = await serve_openmetrics(render, METRICS_HOST, METRICS_PORT)
+        if METRICS_FILE and self._metrics_dump is None:
+            self._metrics_dump = asyncio.create_task(
+                dump_periodically(render, METRICS_FILE, METRICS_DUMP_INTERVAL)
+            )
+        self.startup_timing["startup_ms"] = (time.perf_counter() - started) * 1000
+    
+    async def shutdown(self):
+        """Close long-lived resources"""
+        if self._prewarm_task is not None:
+            self._prewarm_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._prewarm_task
+            self._prewarm_task = None
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._probe_task
+            self._probe_task = None
+        if self._metrics_server is not None:
+            self._metrics_server.close()
+            await self._metrics_server.wait_closed()
+            self._metrics_server = None
+        if self._metrics_dump is not None:
+            self._metrics_dump.cancel()
+            self._metrics_dump = None
+            # Final dump so the file reflects the whole run
+            dump_openmetrics(self.telemetry.render_openmetrics(), METRICS_FILE)
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+        if self.cache is not None:
+            self.cache.close()
+        if self.captures is not None:
+            self.captures.close()
+    
+    async def run(self, transport: Optional[str] = None):
+        """Run the MCP server over stdio (default) or HTTP"""
+        transport = transport or TRANSPORT
+        if transport == "http":
+            await self.run_http()
+            return
+        if transport != "stdio":
+            raise ValueError(f"Unknown transport: {transport} (expected 'stdio' or 'http')")
+        await self.startup()
+        try:
+            async with stdio_server() as (read_stream, write_stream):
+                await self.server.run(
+                    read_stream,
+                    write_stream,
+                    self.server.create_initialization_options()
+                )
+        finally:
+            await self.shutdown()
+    
+    def http_app(self, stateless: Optional[bool] = None):
+        """ASGI app serving this server to any number of clients
+        
+        - POST/GET/DELETE /mcp: streamable HTTP transport
+        - GET /sse + POST /messages/: SSE transport for older clients
+        - GET /healthz, GET /metrics (OpenMetrics)
+        
+        Every session is handled by this one instance, so the connection
+        pool, caches, scheduler and circuit breakers are shared.
+        """
+        # Only needed in HTTP mode; both come with the mcp package
+        from mcp.server.sse import SseServerTransport
+        from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+        from starlette.applications import Starlette
+        from starlette.responses import PlainTextResponse, Response
+        from starlette.routing import Mount, Route
+        
+        self.http_stateless = HTTP_STATELESS if stateless is None else stateless
+        manager = StreamableHTTPSessionManager(app=self.server, stateless=self.http_stateless)
+        sse = SseServerTransport("/messages/")
+        
+        class StreamableEndpoint:
+            async def __call__(self, scope, receive, send):
+                await manager.handle_request(scope, receive, send)
+        
+        async def handle_sse(request):
+            async with sse.connect_sse(request.scope, request.receive, request._send) as (read_stream, write_stream):
+                await self.server.run(read_stream, write_stream, self.server.create_initialization_options())
+            return Response()
+        
+        async def healthz(request):
+            return PlainTextResponse("ok\n")
+        
+        async def openmetrics(request):
+            return PlainTextResponse(
+                self.telemetry.render_openmetrics(),
+                media_type="application/openmetrics-text; version=1.0.0; charset=utf-8",
             )
+        
+        @contextlib.asynccontextmanager
+        async def lifespan(app):
+            await self.startup()
+            try:
+                async with manager.run():
+                    yield
+            finally:
+                await self.shutdown()
+        
+        return Starlette(
+            routes=[
+                Route("/mcp", endpoint=StreamableEndpoint(), methods=["GET", "POST", "DELETE"]),
+                Route("/sse", endpoint=handle_sse, methods=["GET"]),
+                Mount("/messages/", app=sse.handle_post_message),
+                Route("/healthz", endpoint=healthz, methods=["GET"]),
+                Route("/metrics", endpoint=openmetrics, methods=["GET"]),
+            ],
+            lifespan=lifespan,
+        )
+    
+    async def run_http(self, host: Optional[str] = None, port: Optional[int] = None):
+        """Serve http_app() with uvicorn until interrupted"""
+        import uvicorn
+        
+        config = uvicorn.Config(
+            self.http_app(),
+            host=host or HTTP_HOST,
+            port=port or HTTP_PORT,
+            log_level="warning",
+        )
+        await uvicorn.Server(config).serve()
+
+
+_IMPORT_MS = (time.perf_counter() - _IMPORT_STARTED) * 1000
+
+
+def parse_args(argv: Optional[list] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Konflux chatbot MCP server")
+    parser.add_argument("--transport", choices=["stdio", "http"], default=TRANSPORT,
+                        help="stdio (default, one client) or http (streamable HTTP + SSE, many clients)")
+    parser.add_argument("--host", default=HTTP_HOST, help="HTTP bind address (KONFLUX_HOST)")
+    parser.add_argument("--port", type=int, default=HTTP_PORT, help="HTTP port (KONFLUX_PORT)")
+    return parser.parse_args(argv)
 
 
 async def main():
     """Main entry point"""
+    args = parse_args()
     server = KonfluxChatbotMCP()
-    await server.run()
+    if args.transport == "http":
+        await server.run_http(args.host, args.port)
+    else:
+        await server.run("stdio")
 
 
 if __name__ == "__main__":
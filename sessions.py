@@ -0,0 +1,196 @@
+"""
+Conversation sessions for follow-up questions
+
+Calls that pass the same ``session_id`` share a short history, so a
+follow-up ("and how do I fix that for arm64?") does not need the earlier
+question, answer and logs pasted again. The history is kept compact:
+
+- the last few turns are stored with their answers clipped
+- older turns are reduced to a one-line summary (the question and the
+  first sentence of the answer's solution)
+- only the latest ``details`` are kept, clipped to a head and tail
+
+``history()`` renders what fits in a token budget (about 4 characters per
+token), newest turns first in priority. Sessions expire after an idle
+timeout and the least recently used ones are dropped past a session count
+or total memory cap.
+"""
+
+import re
+import time
+from collections import OrderedDict, deque
+from typing import Optional
+
+
+CHARS_PER_TOKEN = 4
+
+_SOLUTION = re.compile(r"\*\*Solution(?:/Answer)?:?\*\*:?\s*(.+?)(?:\n\s*\n|\*\*Notes|$)", re.DOTALL)
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+CONTEXT_FIELDS = ("tenant", "application", "component")
+
+
+def clip(text: str, max_chars: int) -> str:
+    """Shorten text to max_chars, keeping the head and (mostly) the tail"""
+    if len(text) <= max_chars:
+        return text
+    marker = "\n[...]\n"
+    head = max(max_chars - len(marker), 0) // 3
+    tail = max(max_chars - len(marker) - head, 0)
+    return text[:head] + marker + (text[-tail:] if tail else "")
+
+
+def summarize_turn(question: str, answer: str, max_chars: int = 300) -> str:
+    """One-line summary of a turn: the question and the gist of the answer"""
+    match = _SOLUTION.search(answer)
+    gist = match.group(1) if match else answer
+    gist = " ".join(_SENTENCE_END.split(gist.strip(), maxsplit=1)[0].split())
+    question = " ".join(question.split())
+    half = max_chars // 2
+    return f"Q: {question[:half]} -> A: {gist[:half]}"
+
+
+class _Session:
+    __slots__ = ("turns", "summaries", "details", "context", "last_used", "size")
+
+    def __init__(self):
+        self.turns: deque[tuple[str, str]] = deque()
+        self.summaries: deque[str] = deque()
+        self.details: Optional[str] = None
+        self.context: dict[str, str] = {}
+        self.last_used = time.monotonic()
+        self.size = 0
+
+    def measure(self) -> int:
+        self.size = (
+            sum(len(q) + len(a) for q, a in self.turns)
+            + sum(len(s) for s in self.summaries)
+            + len(self.details or "")
+            + sum(len(v) for v in self.context.values())
+        )
+        return self.size
+
+
+class SessionStore:
+    """Bounded per-session conversation history"""
+
+    def __init__(
+        self,
+        history_tokens: int = 1500,
+        max_turns: int = 3,
+        max_summaries: int = 20,
+        answer_chars: int = 2000,
+        details_chars: int = 4000,
+        idle_timeout: float = 3600.0,
+        max_sessions: int = 1000,
+        max_bytes: int = 32 * 1024 * 1024,
+    ):
+        self.history_chars = history_tokens * CHARS_PER_TOKEN
+        self.max_turns = max_turns
+        self.max_summaries = max_summaries
+        self.answer_chars = answer_chars
+        self.details_chars = details_chars
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._sessions: OrderedDict[str, _Session] = OrderedDict()
+        self._bytes = 0
+        self.stats = {"created": 0, "turns": 0, "expired": 0, "evicted": 0}
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _get(self, session_id: str) -> Optional[_Session]:
+        self._expire()
+        session = self._sessions.get(session_id)
+        if session is not None:
+            session.last_used = time.monotonic()
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def _expire(self) -> None:
+        # Least recently used first, so stop at the first live session
+        deadline = time.monotonic() - self.idle_timeout
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.last_used > deadline:
+                break
+            self._drop(session_id)
+            self.stats["expired"] += 1
+
+    def _drop(self, session_id: str) -> None:
+        session = self._sessions.pop(session_id)
+        self._bytes -= session.size
+
+    def with_context(self, session_id: str, args: dict) -> dict:
+        """args with tenant/application/component filled in from the session"""
+        session = self._get(session_id)
+        if session is None or not session.context:
+            return args
+        missing = {k: v for k, v in session.context.items() if not args.get(k)}
+        return {**args, **missing} if missing else args
+
+    def history(self, session_id: str) -> Optional[str]:
+        """The earlier conversation, within the token budget (None if there is none)"""
+        session = self._get(session_id)
+        if session is None or not (session.turns or session.summaries):
+            return None
+
+        budget = self.history_chars
+        parts: list[str] = []
+        if session.details:
+            details = clip(session.details, min(len(session.details), budget // 3))
+            parts.append(f"Details given earlier:\n{details}")
+            budget -= len(parts[-1])
+        # Newest turns get the budget first
+        recent: list[str] = []
+        for question, answer in reversed(session.turns):
+            room = budget - len(question) - 8
+            if room <= 200:
+                break
+            text = f"Q: {question}\nA: {clip(answer, room)}"
+            recent.append(text)
+            budget -= len(text)
+        summaries: list[str] = []
+        for summary in reversed(session.summaries):
+            if len(summary) > budget:
+                break
+            summaries.append(summary)
+            budget -= len(summary)
+
+        sections = []
+        if summaries:
+            sections.append("Earlier turns (summarized):\n" + "\n".join(reversed(summaries)))
+        if recent:
+            sections.append("\n\n".join(reversed(recent)))
+        return "\n\n".join(sections + parts)
+
+    def record(self, session_id: str, question: str, answer: str, args: dict,
+               details: Optional[str] = None) -> None:
+        """Add a finished turn to the session (creating the session if needed)"""
+        session = self._get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = _Session()
+            self.stats["created"] += 1
+        self._bytes -= session.size
+
+        session.turns.append((clip(question, self.answer_chars // 2), clip(answer, self.answer_chars)))
+        while len(session.turns) > self.max_turns:
+            old_question, old_answer = session.turns.popleft()
+            session.summaries.append(summarize_turn(old_question, old_answer))
+        while len(session.summaries) > self.max_summaries:
+            session.summaries.popleft()
+        if details:
+            session.details = clip(details, self.details_chars)
+        for field in CONTEXT_FIELDS:
+            if args.get(field):
+                session.context[field] = str(args[field])
+
+        self._bytes += session.measure()
+        self.stats["turns"] += 1
+        while self._sessions and (len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes):
+            self._drop(next(iter(self._sessions)))
+            self.stats["evicted"] += 1
+
+    def snapshot(self) -> dict:
+        self._expire()
+        return {"sessions": len(self._sessions), "bytes": self._bytes, **self.stats}
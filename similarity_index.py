@@ -0,0 +1,232 @@
+"""
+Near-duplicate question index
+
+The response cache only matches questions that are identical after
+whitespace/case normalization. This index finds earlier questions that are
+worded differently but ask the same thing ("how do I rerun a failed build"
+vs "how to re-trigger a failed konflux build"):
+
+- questions are reduced to a set of terms: lower-cased words with stop
+  words removed, light suffix stripping and a few domain synonyms
+- every question gets a MinHash signature (NumPy, one vectorized pass over
+  its terms); signatures are split into bands and each band is hashed into
+  a bucket (locality-sensitive hashing), so a lookup only compares against
+  questions sharing at least one bucket instead of scanning the index
+- candidates are scored by the exact Jaccard similarity of their term sets
+
+Entries are scoped (tenant, component, ...) so answers never cross scopes.
+Inserts are incremental; the oldest entries are evicted past max_entries
+and entries expire after a TTL. Nothing leaves the process.
+"""
+
+import re
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Hashable, Optional
+
+import numpy as np
+
+
+_WORD = re.compile(r"[a-z0-9]+")
+_STOP_WORDS = frozenset(
+    "a about an and are as at be by can could do does for from get got how i if in into is it its "
+    "me my of on or our please should so that the their them then there these this to us was we "
+    "what when where which who why will with would you your konflux".split()
+)
+# Verbs people use interchangeably for the same Konflux action
+_SYNONYMS = {
+    "retrigger": "rerun", "restart": "rerun", "retry": "rerun", "rebuild": "rerun",
+    "trigger": "run", "start": "run", "kick": "run",
+    "setup": "configure", "config": "configure", "configuration": "configure",
+    "remove": "delete", "erase": "delete",
+    "create": "add", "creat": "add", "new": "add",
+    "error": "fail", "broken": "fail", "failure": "fail",
+    "pipelinerun": "pipeline", "taskrun": "task",
+    "repo": "repository", "img": "image",
+}
+_SUFFIXES = ("ing", "ed", "es", "s")
+# How far below the threshold a MinHash estimate may be and still get an
+# exact check (the estimate's standard error with 120 permutations is < 0.05)
+_ESTIMATE_MARGIN = 0.15
+
+
+def question_terms(text: str) -> frozenset:
+    """The set of normalized content words of a question"""
+    # "re-trigger" and "retrigger" should be the same word
+    text = text.lower().replace("-", "")
+    terms = set()
+    for word in _WORD.findall(text):
+        if word in _STOP_WORDS:
+            continue
+        if len(word) > 4:
+            for suffix in _SUFFIXES:
+                if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+                    word = word[:-len(suffix)]
+                    break
+        terms.add(_SYNONYMS.get(word, word))
+    return frozenset(terms)
+
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+@dataclass
+class SimilarMatch:
+    question: str
+    key: str
+    similarity: float
+
+
+class SimilarityIndex:
+    """MinHash/LSH index of past questions, each pointing at a stored answer
+
+    key is whatever the caller uses to fetch the stored answer (the server
+    uses the response-cache prompt). num_perm must be divisible by bands.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.8,
+        max_entries: int = 10000,
+        ttl: float = 86400.0,
+        num_perm: int = 120,
+        bands: int = 20,
+        seed: int = 1,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(0, 1 << 64, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 1 << 64, size=num_perm, dtype=np.uint64)
+        # key -> (scope, question, terms, band keys, expires_at, slot), oldest first
+        self._entries: OrderedDict[str, tuple] = OrderedDict()
+        # MinHash signatures by slot, for a vectorized pre-filter of candidates
+        self._signatures = np.zeros((min(max_entries, 1024), num_perm), dtype=np.uint32)
+        self._free_slots: list[int] = []
+        self._next_slot = 0
+        self._buckets: dict[tuple, set[str]] = {}
+        # (scope, terms) -> key; a newer question with the same terms replaces
+        # the older one, so buckets do not fill up with equivalent entries
+        self._by_terms: dict[tuple, str] = {}
+        self.stats = {"lookups": 0, "hits": 0, "inserts": 0, "evictions": 0, "candidates": 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _signature(self, terms: frozenset) -> np.ndarray:
+        hashes = np.fromiter(
+            (zlib.crc32(term.encode()) for term in terms), dtype=np.uint64, count=len(terms)
+        )
+        # Multiply-shift hashing: h_i(x) = (a_i * x + b_i) mod 2**64 >> 32,
+        # one column per permutation (uint64 arithmetic wraps around)
+        values = (hashes[:, None] * self._a + self._b) >> np.uint64(32)
+        return values.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, scope: Hashable, signature: np.ndarray) -> list[tuple]:
+        rows = signature.reshape(self.bands, self.rows)
+        return [(scope, band, rows[band].tobytes()) for band in range(self.bands)]
+
+    def lookup(self, scope: Hashable, question: str) -> Optional[SimilarMatch]:
+        """Best earlier question in scope with similarity >= threshold"""
+        self.stats["lookups"] += 1
+        terms = question_terms(question)
+        if not terms:
+            return None
+        signature = self._signature(terms)
+        candidates: set[str] = set()
+        for band_key in self._band_keys(scope, signature):
+            bucket = self._buckets.get(band_key)
+            if bucket:
+                candidates.update(bucket)
+        self.stats["candidates"] += len(candidates)
+        if not candidates:
+            return None
+
+        # The share of equal MinHash values estimates the Jaccard similarity;
+        # only compute the exact one for candidates whose estimate is close
+        keys = list(candidates)
+        entries = [self._entries[key] for key in keys]
+        slots = np.fromiter((entry[5] for entry in entries), dtype=np.intp, count=len(entries))
+        estimates = (self._signatures[slots] == signature).mean(axis=1)
+        now = time.time()
+        best: Optional[SimilarMatch] = None
+        expired = []
+        for i in np.flatnonzero(estimates >= self.threshold - _ESTIMATE_MARGIN):
+            _, stored_question, stored_terms, _, expires_at, _ = entries[i]
+            if expires_at <= now:
+                expired.append(keys[i])
+                continue
+            score = jaccard(terms, stored_terms)
+            if score >= self.threshold and (best is None or score > best.similarity):
+                best = SimilarMatch(stored_question, keys[i], score)
+        for key in expired:
+            self.discard(key)
+        if best is not None:
+            self.stats["hits"] += 1
+        return best
+
+    def add(self, scope: Hashable, question: str, key: str) -> None:
+        """Index a question whose answer is stored under key"""
+        terms = question_terms(question)
+        if not terms:
+            return
+        self.discard(key)
+        previous = self._by_terms.get((scope, terms))
+        if previous is not None:
+            self.discard(previous)
+        signature = self._signature(terms)
+        band_keys = self._band_keys(scope, signature)
+        slot = self._allocate_slot()
+        self._signatures[slot] = signature
+        self._entries[key] = (scope, question, terms, band_keys, time.time() + self.ttl, slot)
+        self._by_terms[(scope, terms)] = key
+        for band_key in band_keys:
+            self._buckets.setdefault(band_key, set()).add(key)
+        self.stats["inserts"] += 1
+        while len(self._entries) > self.max_entries:
+            self.discard(next(iter(self._entries)))
+            self.stats["evictions"] += 1
+
+    def _allocate_slot(self) -> int:
+        if self._free_slots:
+            return self._free_slots.pop()
+        if self._next_slot == len(self._signatures):
+            grown = np.zeros((len(self._signatures) * 2, self._signatures.shape[1]), dtype=np.uint32)
+            grown[:len(self._signatures)] = self._signatures
+            self._signatures = grown
+        self._next_slot += 1
+        return self._next_slot - 1
+
+    def discard(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        scope, _, terms, band_keys, _, slot = entry
+        self._free_slots.append(slot)
+        if self._by_terms.get((scope, terms)) == key:
+            del self._by_terms[(scope, terms)]
+        for band_key in band_keys:
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def snapshot(self) -> dict:
+        lookups = self.stats["lookups"]
+        return {
+            "entries": len(self._entries),
+            "threshold": self.threshold,
+            **self.stats,
+            "hit_ratio": self.stats["hits"] / lookups if lookups else 0.0,
+        }
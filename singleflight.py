@@ -0,0 +1,64 @@
+"""
+Single-flight de-duplication of concurrent identical requests
+
+When several callers ask for the same key at the same time only the first
+one starts the work; the others await the same task. The shared task keeps
+running as long as at least one caller is still waiting for it, so one caller
+disconnecting does not cancel the answer for everybody else.
+"""
+
+import asyncio
+from typing import Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key"""
+
+    def __init__(self):
+        self._calls: dict[str, _Call] = {}
+        self.started = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._calls
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[T]]) -> T:
+        """Run factory() for key, or join the run already in progress"""
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(factory()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _task: self._forget(key, call))
+            self.started += 1
+        else:
+            self.coalesced += 1
+
+        call.waiters += 1
+        try:
+            # shield() so a cancelled waiter does not cancel the shared task
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Nobody is left to receive the result
+                self._forget(key, call)
+                call.task.cancel()
+                self.abandoned += 1
+
+    def _forget(self, key: str, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
@@ -0,0 +1,188 @@
+"""
+Record and replay raw ``/stream_log`` responses
+
+In record mode every successful upstream response is stored line by line,
+as it came off the wire (before the stream size limits drop anything), with
+the time since the previous line, in a zlib-compressed SQLite archive keyed
+by a hash of the request body. Compression and SQLite run in a worker
+thread. Replay feeds a stored response back
+through the normal parsing and streaming path, at the recorded pace or
+faster, which gives:
+
+- deterministic regression benchmarks of parsing/streaming on real
+  payload shapes (``benchmarks/bench_replay.py``)
+- an offline fallback for previously asked questions when the backend
+  cannot be reached
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+from response_cache import cache_key
+
+
+class CaptureMissing(Exception):
+    """No capture is stored for the request"""
+
+
+def capture_key(payload: dict) -> str:
+    """Archive key for a /stream_log request body (same normalization as the cache)"""
+    return cache_key(json.dumps(payload, sort_keys=True))
+
+
+@dataclass
+class Capture:
+    key: str
+    recorded_at: float
+    wire_bytes: int
+    delays: list[float]  # seconds since the previous line (the first: since the request)
+    lines: list[str]
+
+    @property
+    def duration(self) -> float:
+        return sum(self.delays)
+
+
+def encode_lines(delays: list[float], lines: list[str]) -> bytes:
+    # One "milliseconds<TAB>line" record per line; lines never contain newlines
+    text = "\n".join(f"{delay * 1000:.1f}\t{line}" for delay, line in zip(delays, lines))
+    return zlib.compress(text.encode("utf-8"), 6)
+
+
+def decode_lines(data: bytes) -> tuple[list[float], list[str]]:
+    delays, lines = [], []
+    text = zlib.decompress(data).decode("utf-8")
+    if not text:
+        return delays, lines
+    for record in text.split("\n"):
+        delay, _, line = record.partition("\t")
+        delays.append(float(delay) / 1000)
+        lines.append(line)
+    return delays, lines
+
+
+class Recorder:
+    """Collects the raw lines of one response, with their timing, as its bytes are read"""
+
+    def __init__(self, started: Optional[float] = None):
+        self._last = started if started is not None else time.perf_counter()
+        self.delays: list[float] = []
+        self.lines: list[str] = []
+
+    async def wrap(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        """Pass chunks through unchanged, recording every complete line"""
+        pending: list[bytes] = []
+        async for chunk in chunks:
+            if b"\n" in chunk:
+                *complete, rest = b"".join(pending + [chunk]).split(b"\n")
+                pending = [rest] if rest else []
+                self._add(complete)
+            elif chunk:
+                pending.append(chunk)
+            yield chunk
+        if pending:
+            self._add([b"".join(pending)])
+
+    def _add(self, raw_lines: list[bytes]) -> None:
+        # Lines completed by the same chunk arrived together
+        now = time.perf_counter()
+        delay = now - self._last
+        self._last = now
+        for raw in raw_lines:
+            self.delays.append(delay)
+            self.lines.append(raw.decode("utf-8", errors="replace").rstrip("\r"))
+            delay = 0.0
+
+
+async def replay_lines(capture: Capture, speed: float = 1.0) -> AsyncIterator[str]:
+    """Yield a capture's lines at the recorded pace divided by speed (0 = no delays)"""
+    started = time.perf_counter()
+    due = 0.0
+    for delay, line in zip(capture.delays, capture.lines):
+        if speed > 0:
+            # Sleep against an absolute schedule so many tiny gaps do not drift
+            due += delay / speed
+            ahead = started + due - time.perf_counter()
+            if ahead > 0.001:
+                await asyncio.sleep(ahead)
+        yield line
+
+
+class CaptureArchive:
+    """SQLite archive of compressed captures, oldest evicted past max_entries"""
+
+    def __init__(self, path: str, max_entries: int = 5000):
+        self.max_entries = max_entries
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS captures ("
+            "key TEXT PRIMARY KEY, recorded_at REAL NOT NULL, wire_bytes INTEGER NOT NULL, "
+            "events INTEGER NOT NULL, duration REAL NOT NULL, data BLOB NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS captures_recorded_at ON captures(recorded_at)")
+        # One connection shared by the worker threads of astore/aload
+        self._lock = threading.Lock()
+        self.stats = {"recorded": 0, "replayed": 0, "misses": 0, "fallbacks": 0, "evictions": 0}
+
+    def store(self, key: str, recorder: Recorder, wire_bytes: int) -> None:
+        data = encode_lines(recorder.delays, recorder.lines)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO captures (key, recorded_at, wire_bytes, events, duration, data) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, time.time(), wire_bytes, len(recorder.lines), sum(recorder.delays), data),
+            )
+            self.stats["recorded"] += 1
+            (count,) = self._db.execute("SELECT COUNT(*) FROM captures").fetchone()
+            if count > self.max_entries:
+                self._db.execute(
+                    "DELETE FROM captures WHERE key IN "
+                    "(SELECT key FROM captures ORDER BY recorded_at LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+                self.stats["evictions"] += count - self.max_entries
+
+    async def astore(self, key: str, recorder: Recorder, wire_bytes: int) -> None:
+        """store() with compression and the SQLite write in a worker thread"""
+        await asyncio.to_thread(self.store, key, recorder, wire_bytes)
+
+    def load(self, key: str) -> Optional[Capture]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT recorded_at, wire_bytes, data FROM captures WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+        recorded_at, wire_bytes, data = row
+        delays, lines = decode_lines(data)
+        return Capture(key, recorded_at, wire_bytes, delays, lines)
+
+    async def aload(self, key: str) -> Optional[Capture]:
+        """load() with the SQLite read and decompression in a worker thread"""
+        return await asyncio.to_thread(self.load, key)
+
+    def keys(self) -> list[str]:
+        with self._lock:
+            return [key for (key,) in self._db.execute("SELECT key FROM captures ORDER BY recorded_at")]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            count, raw_bytes, stored_bytes = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(wire_bytes), 0), COALESCE(SUM(LENGTH(data)), 0) FROM captures"
+            ).fetchone()
+        return {"captures": count, "wire_bytes": raw_bytes, "stored_bytes": stored_bytes, **self.stats}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
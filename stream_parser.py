@@ -0,0 +1,365 @@
+"""
+Incremental parser for LangServe ``/stream_log`` Server-Sent Events
+
+``/stream_log`` sends one JSON-patch (RunLogPatch) per ``data:`` line. Most
+of them are intermediate log entries for retrievers and LLM sub-runs, some
+of which carry large document payloads we never use. The parser:
+
+- pre-screens each line with cheap substring checks and only decodes lines
+  that touch ``/final_output`` or the streamed answer text
+- decodes with ``orjson`` when it is installed
+- applies the relevant ops to a minimal state (final output + partial text)
+  instead of rebuilding the whole run log; a patch that only replaces the
+  whole ``/final_output`` is kept undecoded until a later one supersedes it
+- reports when the ``end`` event arrives so the caller can stop reading
+
+``bounded_lines`` splits the raw response into lines with bounded memory:
+an event larger than ``max_event_bytes`` is skipped as it streams past
+(only its first bytes are looked at) unless it carries the answer, and a
+response larger than ``max_response_bytes`` is aborted.
+"""
+
+import json
+from typing import Any, AsyncIterator, Callable, Optional
+
+try:
+    import orjson
+
+    _loads = orjson.loads
+    _DecodeError: tuple = (orjson.JSONDecodeError, ValueError)
+except ImportError:  # pragma: no cover - optional dependency
+    _loads = json.loads
+    _DecodeError = (json.JSONDecodeError,)
+
+
+# Substrings that mark a line as possibly relevant. They include the
+# surrounding quotes, so nested paths such as "/logs/Retriever/final_output"
+# do not match the root '"/final_output' marker.
+_FINAL_OUTPUT_MARKER = '"/final_output'
+_ROOT_STREAM_MARKER = '"/streamed_output/-"'
+_LOG_STREAM_MARKER = '/streamed_output_str/-"'
+# Stricter markers for lines that passed the cheap check: an op whose path
+# is exactly /final_output, or below it. Quotes inside JSON string values are
+# escaped, so answer text mentioning these paths cannot match.
+_ROOT_FINAL_PATHS = ('"path": "/final_output"', '"path":"/final_output"')
+_SUB_FINAL_PATHS = ('"path": "/final_output/', '"path":"/final_output/')
+# A sub-run's final output, e.g. "/logs/Retriever/final_output"
+_LOG_MARKER = '"/logs/'
+_LOG_FINAL_MARKER = '/final_output"'
+
+
+class StreamError(Exception):
+    """The backend reported an error event, or the stream stopped before its end event"""
+
+
+class ResponseTooLarge(Exception):
+    """The response went over a size limit, so reading was stopped"""
+
+    def __init__(self, message: str, limit: int):
+        super().__init__(message)
+        self.limit = limit
+
+
+# Bytes of an oversized event looked at to tell what it is
+_OVERSIZED_PREFIX = 4096
+
+
+def is_answer_event(line: str) -> bool:
+    """Whether an event (or its first bytes) patches the answer itself"""
+    return (
+        (_FINAL_OUTPUT_MARKER in line and any(m in line for m in _ROOT_FINAL_PATHS + _SUB_FINAL_PATHS))
+        or _ROOT_STREAM_MARKER in line
+        or _LOG_STREAM_MARKER in line
+    )
+
+
+async def bounded_lines(
+    chunks: AsyncIterator[bytes],
+    max_event_bytes: int = 0,
+    max_response_bytes: int = 0,
+    stats: Optional[dict] = None,
+) -> AsyncIterator[str]:
+    """Split a byte stream into lines, holding at most max_event_bytes of one
+
+    Lines longer than max_event_bytes are dropped without being assembled,
+    unless their first bytes show they patch the answer: then, like for
+    responses over max_response_bytes, ResponseTooLarge is raised. 0 means
+    no limit. Dropped lines and bytes are counted in stats.
+    """
+    stats = stats if stats is not None else {}
+    stats.setdefault("dropped_events", 0)
+    stats.setdefault("dropped_bytes", 0)
+    buffer = bytearray()
+    dropping = False
+    received = 0
+
+    def overflow(held: bytes, piece: bytes) -> None:
+        # Look at the first bytes only: is this event the answer, or a payload we can skip?
+        prefix = held[:_OVERSIZED_PREFIX] + piece[:max(_OVERSIZED_PREFIX - len(held), 0)]
+        if is_answer_event(prefix.decode("utf-8", "replace")):
+            raise ResponseTooLarge(f"an answer event is larger than {max_event_bytes} bytes", max_event_bytes)
+        stats["dropped_events"] += 1
+        stats["dropped_bytes"] += len(held) + len(piece)
+
+    async for chunk in chunks:
+        received += len(chunk)
+        if max_response_bytes and received > max_response_bytes:
+            raise ResponseTooLarge(f"the response is larger than {max_response_bytes} bytes", max_response_bytes)
+        first = chunk.find(b"\n")
+        if dropping:
+            if first < 0:
+                stats["dropped_bytes"] += len(chunk)
+                continue
+            stats["dropped_bytes"] += first
+            dropping = False
+        elif first < 0:
+            if max_event_bytes and len(buffer) + len(chunk) > max_event_bytes:
+                overflow(bytes(buffer), chunk)
+                buffer.clear()
+                dropping = True
+            else:
+                buffer += chunk
+            continue
+        else:
+            # The line that started in earlier chunks ends here
+            if max_event_bytes and len(buffer) + first > max_event_bytes:
+                overflow(bytes(buffer), chunk[:first])
+            else:
+                buffer += chunk[:first]
+                line = buffer.decode("utf-8", "replace")
+                yield line[:-1] if line.endswith("\r") else line
+            buffer.clear()
+
+        last = chunk.rfind(b"\n")
+        if first < last:
+            # Complete lines in between: decoded in one go unless one may be too large
+            middle = chunk[first + 1:last + 1]
+            if max_event_bytes and len(middle) > max_event_bytes:
+                for piece in middle[:-1].split(b"\n"):
+                    if len(piece) > max_event_bytes:
+                        overflow(b"", piece)
+                    else:
+                        line = piece.decode("utf-8", "replace")
+                        yield line[:-1] if line.endswith("\r") else line
+            else:
+                text = middle.decode("utf-8", "replace")
+                if "\r" in text:
+                    text = text.replace("\r\n", "\n")
+                lines = text.split("\n")
+                lines.pop()  # after the final newline
+                for line in lines:
+                    yield line
+        tail = chunk[last + 1:]
+        if max_event_bytes and len(tail) > max_event_bytes:
+            overflow(b"", tail)
+            dropping = True
+        else:
+            buffer += tail
+    if buffer:
+        line = buffer.decode("utf-8", "replace")
+        yield line[:-1] if line.endswith("\r") else line
+
+
+def _unescape(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def _apply_op(document: Any, tokens: list[str], op: str, value: Any) -> Any:
+    """Apply a single JSON-patch op below the document root, returning the new root"""
+    if not tokens:
+        return None if op == "remove" else value
+
+    parent = document
+    for token in tokens[:-1]:
+        parent = parent[int(token)] if isinstance(parent, list) else parent[token]
+
+    last = tokens[-1]
+    if isinstance(parent, list):
+        if op == "add":
+            if last == "-":
+                parent.append(value)
+            else:
+                parent.insert(int(last), value)
+        elif op == "replace":
+            parent[int(last)] = value
+        elif op == "remove":
+            del parent[int(last)]
+    else:
+        if op in ("add", "replace"):
+            parent[last] = value
+        elif op == "remove":
+            parent.pop(last, None)
+    return document
+
+
+class StreamLogParser:
+    """Feed ``/stream_log`` SSE lines; read ``final_output`` and ``partial``
+
+    on_partial, when given, is called with the answer text accumulated so far
+    every time a new streamed chunk arrives. With collect_sources, the
+    metadata of documents returned by retriever sub-runs is kept in
+    ``sources`` (page content is dropped).
+    """
+
+    def __init__(self, on_partial: Optional[Callable[[str], None]] = None, collect_sources: bool = False):
+        self.on_partial = on_partial
+        self.collect_sources = collect_sources
+        self.final_output: Any = None
+        self.partial = ""
+        self.sources: list[dict] = []
+        self.done = False
+        self.error: Optional[str] = None
+        self._event = "data"
+        # Latest undecoded line whose only relevant op replaces /final_output
+        self._pending: Optional[str] = None
+        # Prefer the root run's /streamed_output chunks; fall back to the
+        # LLM's /logs/<name>/streamed_output_str chunks when the root output
+        # is not a plain string
+        self._partial_source: Optional[str] = None
+        self.stats = {"lines": 0, "bytes": 0, "events": 0, "decoded": 0, "skipped": 0}
+
+    def set_on_partial(self, on_partial: Optional[Callable[[str], None]]) -> None:
+        """Start (or stop) tracking streamed text part way through a stream
+
+        Chunks that arrived before tracking started were not decoded; the
+        latest text-valued final output stands in for them.
+        """
+        if on_partial is not None and self.on_partial is None and not self.partial:
+            self._flush_pending()
+            if isinstance(self.final_output, str):
+                self.partial = self.final_output
+                self._partial_source = "root"
+        self.on_partial = on_partial
+
+    def feed_line(self, line: str) -> bool:
+        """Process one SSE line; returns True once the stream has ended"""
+        stats = self.stats
+        stats["lines"] += 1
+        stats["bytes"] += len(line) + 1
+
+        if line.startswith("data:"):
+            stats["events"] += 1
+            if self._event == "error":
+                self.error = line[5:].strip()
+                return False
+
+            root_final = sub_final = False
+            if _FINAL_OUTPUT_MARKER in line:
+                root_final = any(marker in line for marker in _ROOT_FINAL_PATHS)
+                sub_final = any(marker in line for marker in _SUB_FINAL_PATHS)
+            streamed = self.on_partial is not None and (
+                _ROOT_STREAM_MARKER in line
+                or (self._partial_source != "root" and _LOG_STREAM_MARKER in line)
+            )
+            sources = self.collect_sources and _LOG_FINAL_MARKER in line and _LOG_MARKER in line
+            if not (root_final or sub_final or streamed or sources):
+                stats["skipped"] += 1
+                return False
+            if root_final and not (sub_final or streamed or sources):
+                # A whole-value replacement supersedes any earlier one
+                self._pending = line
+                return False
+            self._flush_pending()
+            self._decode(line)
+        elif line.startswith("event:"):
+            self._event = line[6:].strip()
+            if self._event == "end":
+                self.done = True
+                return True
+        elif not line:
+            self._event = "data"
+        return False
+
+    def _flush_pending(self) -> None:
+        if self._pending is not None:
+            line, self._pending = self._pending, None
+            self._decode(line)
+
+    def _decode(self, line: str) -> None:
+        try:
+            data = _loads(line[5:])
+        except _DecodeError:
+            return
+        self.stats["decoded"] += 1
+        if isinstance(data, dict):
+            ops = data.get("ops")
+            if isinstance(ops, list):
+                self._apply_ops(ops)
+
+    def _apply_ops(self, ops: list) -> None:
+        changed = False
+        for op in ops:
+            if not isinstance(op, dict):
+                continue
+            path = op.get("path", "")
+            kind = op.get("op")
+
+            if path == "/final_output" or path.startswith("/final_output/"):
+                tokens = [_unescape(t) for t in path.split("/")[2:]]
+                try:
+                    self.final_output = _apply_op(self.final_output, tokens, kind, op.get("value"))
+                except (KeyError, IndexError, TypeError, ValueError):
+                    continue
+            elif self.collect_sources and path.startswith("/logs/") and path.endswith("/final_output"):
+                self._collect_sources(op.get("value"))
+            elif self.on_partial is not None and kind == "add" and isinstance(op.get("value"), str):
+                if path == "/streamed_output/-":
+                    if self._partial_source != "root":
+                        self._partial_source, self.partial = "root", ""
+                    self.partial += op["value"]
+                    changed = True
+                elif (self._partial_source != "root" and path.startswith("/logs/")
+                      and path.endswith("/streamed_output_str/-")):
+                    self._partial_source = "logs"
+                    self.partial += op["value"]
+                    changed = True
+
+        if changed and self.on_partial is not None:
+            self.on_partial(self.partial)
+
+    def _collect_sources(self, value: Any) -> None:
+        documents = value.get("documents") if isinstance(value, dict) else None
+        if not isinstance(documents, list):
+            return
+        seen = {source.get("source") for source in self.sources}
+        for document in documents:
+            metadata = document.get("metadata") if isinstance(document, dict) else None
+            if not isinstance(metadata, dict):
+                continue
+            source = metadata.get("source") or metadata.get("url")
+            if source and source not in seen:
+                seen.add(source)
+                self.sources.append({"source": source, "title": metadata.get("title")})
+
+    def best_partial(self) -> Optional[str]:
+        """The answer as far as it has streamed (never raises)
+
+        LangServe replaces /final_output with the accumulated text as tokens
+        arrive, so the latest replacement is the partial answer even when
+        streamed chunks were not tracked.
+        """
+        self._flush_pending()
+        output = self.final_output
+        if isinstance(output, dict):
+            output = output.get("output")
+        if isinstance(output, str) and output:
+            return output
+        return self.partial or None
+
+    def result(self) -> Optional[str]:
+        """The final answer text, or None when the run produced nothing
+
+        Raises StreamError unless the stream reached its end event without
+        an error: whatever arrived before that is only a partial answer (see
+        best_partial()).
+        """
+        self._flush_pending()
+        if self.error:
+            raise StreamError(self.error)
+        if not self.done:
+            raise StreamError("the stream stopped before its end event")
+        if not self.final_output:
+            return None
+        if isinstance(self.final_output, dict) and isinstance(self.final_output.get("output"), str):
+            return self.final_output["output"]
+        return str(self.final_output)
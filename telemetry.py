@@ -0,0 +1,204 @@
+"""
+Aggregated telemetry for tool calls and upstream requests
+
+Counters and fixed-bucket histograms keyed by metric name and labels.
+Recording is a dict lookup plus a bisect, so it stays on in production.
+The same data is available as a JSON-friendly snapshot (served as the
+``konflux://metrics`` MCP resource) and as OpenMetrics text, which can be
+served over HTTP for Prometheus or dumped to a file periodically.
+"""
+
+import asyncio
+import bisect
+import os
+from typing import Callable, Optional
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+CPU_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+BYTE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+EVENT_BUCKETS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# name -> (help text, buckets); everything is in seconds or plain units
+HISTOGRAMS = {
+    "konflux_call_duration_seconds": ("Tool call time to final answer", LATENCY_BUCKETS),
+    "konflux_first_event_seconds": ("Tool call time to the first upstream SSE event", LATENCY_BUCKETS),
+    "konflux_queue_wait_seconds": ("Time upstream requests waited for an admission slot", LATENCY_BUCKETS),
+    "konflux_connect_seconds": ("New upstream connection setup time by phase (tcp, tls)", LATENCY_BUCKETS),
+    "konflux_response_bytes": ("Bytes received per upstream response", BYTE_BUCKETS),
+    "konflux_response_events": ("SSE events received per upstream response", EVENT_BUCKETS),
+    "konflux_parse_cpu_seconds": ("CPU time spent parsing each upstream response", CPU_BUCKETS),
+}
+COUNTERS = {
+    "konflux_tool_calls": "Tool calls by tool and outcome",
+    "konflux_backend_requests": "Upstream attempts by backend and outcome (with several backends)",
+}
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (None when empty)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def snapshot(self) -> dict:
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        buckets["+Inf"] = self.count
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": buckets,
+        }
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def _format_labels(key: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in key]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Telemetry:
+    """Counters and histograms for the server; see HISTOGRAMS and COUNTERS"""
+
+    def __init__(self):
+        self._histograms: dict[str, dict[tuple, Histogram]] = {name: {} for name in HISTOGRAMS}
+        self._counters: dict[str, dict[tuple, int]] = {name: {} for name in COUNTERS}
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        series = self._histograms[name]
+        key = _label_key(labels)
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram(HISTOGRAMS[name][1])
+        histogram.observe(value)
+
+    def increment(self, name: str, amount: int = 1, **labels) -> None:
+        series = self._counters[name]
+        key = _label_key(labels)
+        series[key] = series.get(key, 0) + amount
+
+    def snapshot(self) -> dict:
+        """All series as plain data; label sets are joined as "name=value,..." """
+
+        def label_text(key: tuple) -> str:
+            return ",".join(f"{name}={value}" for name, value in key) or "all"
+
+        return {
+            "counters": {
+                name: {label_text(key): value for key, value in series.items()}
+                for name, series in self._counters.items()
+            },
+            "histograms": {
+                name: {label_text(key): histogram.snapshot() for key, histogram in series.items()}
+                for name, series in self._histograms.items()
+            },
+        }
+
+    def render_openmetrics(self) -> str:
+        """OpenMetrics text exposition of every series"""
+        lines = []
+        for name, series in self._counters.items():
+            lines.append(f"# TYPE {name} counter")
+            lines.append(f"# HELP {name} {COUNTERS[name]}")
+            for key, value in series.items():
+                lines.append(f"{name}_total{_format_labels(key)} {value}")
+        for name, series in self._histograms.items():
+            help_text, buckets = HISTOGRAMS[name]
+            lines.append(f"# TYPE {name} histogram")
+            lines.append(f"# HELP {name} {help_text}")
+            for key, histogram in series.items():
+                cumulative = 0
+                for bound, count in zip(buckets, histogram.counts):
+                    cumulative += count
+                    le = f'le="{bound}"'
+                    lines.append(f"{name}_bucket{_format_labels(key, le)} {cumulative}")
+                le = 'le="+Inf"'
+                lines.append(f"{name}_bucket{_format_labels(key, le)} {histogram.count}")
+                lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+                lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+
+async def serve_openmetrics(render: Callable[[], str], host: str, port: int) -> asyncio.AbstractServer:
+    """Serve GET /metrics with render()'s output on a plain asyncio HTTP listener"""
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), 5)
+            # Skip the headers; the request has no body
+            while (await asyncio.wait_for(reader.readline(), 5)) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.split()
+            if len(parts) >= 2 and parts[0] == b"GET" and parts[1].split(b"?")[0] in (b"/metrics", b"/"):
+                status, content_type, body = "200 OK", OPENMETRICS_CONTENT_TYPE, render().encode()
+            else:
+                status, content_type, body = "404 Not Found", "text/plain", b"not found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+def dump_openmetrics(text: str, path: str) -> None:
+    """Write OpenMetrics text to path atomically (for node-exporter textfile collectors)"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temporary = f"{path}.tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(temporary, path)
+
+
+async def dump_periodically(render: Callable[[], str], path: str, interval: float) -> None:
+    """Dump render()'s output to path every interval seconds until cancelled"""
+    while True:
+        await asyncio.sleep(interval)
+        # Render on the event loop (the series are not thread-safe), write off it
+        await asyncio.to_thread(dump_openmetrics, render(), path)
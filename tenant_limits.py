@@ -0,0 +1,178 @@
+"""
+Per-tenant rate limits and concurrency quotas
+
+Every call that starts an upstream request is charged to a key: its
+``tenant`` or, when no tenant is given, the MCP client session it came from
+(its client address in stateless HTTP mode, where every request is a new
+session). Cache hits and calls sharing a request already in flight are not
+charged. Each key gets the same limits, so one team's automation is
+throttled on its own budget instead of crowding everybody else out of the
+shared upstream slots:
+
+- a token bucket (``rate`` calls per second, up to ``burst`` at once)
+- a cap on calls in progress at the same time (``max_concurrent``)
+
+Per-tenant overrides can raise or lower either. A call over its limit
+fails at once with ``RateLimited``, which says when to retry: when the
+next token is due, or after about one of the key's typical call durations
+for the concurrency quota.
+
+Checks run synchronously on the event loop (no locks, no timers): buckets
+are refilled lazily from the elapsed time when a key is used, and idle keys
+with nothing in progress are dropped oldest first.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class RateLimited(Exception):
+    """The caller is over its rate limit or concurrency quota"""
+
+    def __init__(self, message: str, key: str, reason: str, retry_after: float):
+        super().__init__(message)
+        self.key = key
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Usage:
+    __slots__ = ("tokens", "updated", "in_flight", "allowed", "rate_limited", "quota_limited",
+                 "duration", "last_used")
+
+    def __init__(self, burst: float, now: float):
+        self.tokens = burst
+        self.updated = now
+        self.in_flight = 0
+        self.allowed = 0
+        self.rate_limited = 0
+        self.quota_limited = 0
+        self.duration: Optional[float] = None  # EWMA of call duration (seconds)
+        self.last_used = now
+
+
+def parse_overrides(items: list[str]) -> dict[str, tuple]:
+    """"tenant:rate:burst:max_concurrent" items (empty fields keep the default)"""
+    overrides = {}
+    for item in items:
+        name, *values = item.split(":")
+        values = (values + ["", "", ""])[:3]
+        overrides[name.strip().lower()] = tuple(float(v) if v.strip() else None for v in values)
+    return overrides
+
+
+class TenantLimiter:
+    """Token buckets and concurrency quotas per tenant (or client session)"""
+
+    def __init__(
+        self,
+        rate: float = 1.0,
+        burst: float = 30.0,
+        max_concurrent: int = 4,
+        overrides: Optional[dict[str, tuple]] = None,
+        idle_timeout: float = 600.0,
+        max_keys: int = 10000,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrent = max_concurrent
+        self.overrides = overrides or {}
+        self.idle_timeout = idle_timeout
+        self.max_keys = max_keys
+        self._usage: OrderedDict[str, _Usage] = OrderedDict()
+        self.totals = {"allowed": 0, "rate_limited": 0, "quota_limited": 0, "dropped_keys": 0}
+
+    def limits(self, key: str) -> tuple[float, float, int]:
+        """(rate, burst, max_concurrent) for a key; 0 means unlimited"""
+        override = self.overrides.get(key.split(":", 1)[1] if key.startswith("tenant:") else key)
+        if override is None:
+            return self.rate, self.burst, self.max_concurrent
+        rate, burst, max_concurrent = override
+        return (
+            self.rate if rate is None else rate,
+            self.burst if burst is None else burst,
+            self.max_concurrent if max_concurrent is None else int(max_concurrent),
+        )
+
+    def acquire(self, key: str) -> float:
+        """Admit a call for key or raise RateLimited; returns the start time for release()"""
+        now = time.monotonic()
+        rate, burst, max_concurrent = self.limits(key)
+        usage = self._usage.get(key)
+        if usage is None:
+            usage = self._usage[key] = _Usage(burst, now)
+            self._drop_idle(now)
+        else:
+            self._usage.move_to_end(key)
+            if rate > 0:
+                usage.tokens = min(burst, usage.tokens + (now - usage.updated) * rate)
+            usage.updated = now
+        usage.last_used = now
+
+        if max_concurrent > 0 and usage.in_flight >= max_concurrent:
+            usage.quota_limited += 1
+            self.totals["quota_limited"] += 1
+            retry_after = usage.duration if usage.duration is not None else 1.0
+            raise RateLimited(
+                f"{self._describe(key)} already has {usage.in_flight} calls in progress "
+                f"(limit {max_concurrent})", key, "concurrency", retry_after,
+            )
+        if rate > 0:
+            if usage.tokens < 1:
+                usage.rate_limited += 1
+                self.totals["rate_limited"] += 1
+                raise RateLimited(
+                    f"{self._describe(key)} is over its rate limit of {rate * 60:g} calls per minute "
+                    f"(bursts of up to {burst:g})", key, "rate", (1 - usage.tokens) / rate,
+                )
+            usage.tokens -= 1
+        usage.in_flight += 1
+        usage.allowed += 1
+        self.totals["allowed"] += 1
+        return now
+
+    def release(self, key: str, started: float) -> None:
+        usage = self._usage.get(key)
+        if usage is None:
+            return
+        usage.in_flight -= 1
+        elapsed = time.monotonic() - started
+        usage.duration = elapsed if usage.duration is None else 0.2 * elapsed + 0.8 * usage.duration
+
+    def _drop_idle(self, now: float) -> None:
+        # Least recently used first; keys with calls in progress stay
+        while self._usage:
+            key, usage = next(iter(self._usage.items()))
+            if usage.in_flight or (len(self._usage) <= self.max_keys and now - usage.last_used < self.idle_timeout):
+                break
+            del self._usage[key]
+            self.totals["dropped_keys"] += 1
+
+    @staticmethod
+    def _describe(key: str) -> str:
+        kind, _, name = key.partition(":")
+        if kind == "tenant":
+            return f"Tenant '{name}'"
+        if kind == "client":
+            return f"Client {name}"
+        if kind == "anonymous":
+            return "Anonymous callers"
+        return "This client session"
+
+    def snapshot(self) -> dict:
+        return {
+            "limits": {"rate_per_s": self.rate, "burst": self.burst, "max_concurrent": self.max_concurrent},
+            **self.totals,
+            "keys": {
+                key: {
+                    "allowed": usage.allowed,
+                    "rate_limited": usage.rate_limited,
+                    "quota_limited": usage.quota_limited,
+                    "in_flight": usage.in_flight,
+                    "tokens": round(usage.tokens, 2),
+                    "avg_call_s": round(usage.duration, 3) if usage.duration is not None else None,
+                }
+                for key, usage in self._usage.items()
+            },
+        }
@@ -0,0 +1,1008 @@
+#!/usr/bin/env python3
+"""
+Offline tests for the Konflux MCP server
+
+Runs KonfluxChatbotMCP against the local LangServe stand-in
+(fake_langserve.py), so no VPN or live backend is needed:
+
+    python -m pytest test_offline.py
+"""
+
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+import server
+from fake_langserve import FakeConfig, FakeLangServe, answer_text
+from response_cache import ResponseCache
+from routing import BackendPool
+from scheduler import PriorityScheduler, SchedulerBusy
+from similarity_index import SimilarityIndex
+from stream_capture import CaptureArchive
+from stream_parser import StreamLogParser
+from tenant_limits import TenantLimiter
+
+
+_bots: list[server.KonfluxChatbotMCP] = []
+
+
+@pytest.fixture(autouse=True)
+def isolated_bots(monkeypatch, tmp_path):
+    """Keep bots away from the real cache and capture files and close them after each test"""
+    monkeypatch.setattr(server, "CACHE_ENABLED", False)
+    monkeypatch.setattr(server, "CACHE_PATH", str(tmp_path / "responses.sqlite3"))
+    monkeypatch.setattr(server, "CAPTURE_MODE", "off")
+    monkeypatch.setattr(server, "CAPTURE_PATH", str(tmp_path / "captures.sqlite3"))
+    yield
+    while _bots:
+        asyncio.run(_bots.pop().shutdown())
+
+
+def make_bot(url: str) -> server.KonfluxChatbotMCP:
+    bot = server.KonfluxChatbotMCP()
+    bot.chatbot_url = url
+    _bots.append(bot)
+    return bot
+
+
+def test_response_cache_expires_evicts_and_persists(tmp_path):
+    path = str(tmp_path / "responses.sqlite3")
+    cache = ResponseCache(path=path, max_memory_entries=2, max_disk_entries=3)
+    for question in ("q1", "q2", "q3"):
+        cache.set(question, f"answer to {question}")
+    assert cache.snapshot()["memory_entries"] == 2  # q1 left the memory LRU ...
+    assert cache.get("Q1 ") == "answer to q1"  # ... but is read back from disk (normalized key)
+    assert cache.stats["disk_hits"] == 1
+    cache.set("q4", "answer to q4")  # q2 is now the least recently used on disk
+    cache.close()
+
+    reopened = ResponseCache(path=path)
+    assert reopened.get("q2") is None
+    assert [reopened.get(q) for q in ("q1", "q3", "q4")] == ["answer to q1", "answer to q3", "answer to q4"]
+    assert reopened.stats["disk_hits"] == 3
+    reopened.close()
+
+    async def expiring():
+        short = ResponseCache(path=str(tmp_path / "short.sqlite3"), ttl=0.05)
+        await short.aset("q", "a")
+        fresh = await short.aget("q")
+        await asyncio.sleep(0.1)
+        expired = await short.aget("q")
+        short.close()
+        return fresh, expired
+
+    assert asyncio.run(expiring()) == ("a", None)
+
+
+def test_bypass_cache_skips_the_lookup_but_refreshes_the_answer():
+    async def scenario():
+        async with FakeLangServe(FakeConfig()) as fake:
+            bot = make_bot(fake.url)
+            bot.cache = ResponseCache(path=None)
+            bot.similar = None
+            first = await bot._chat({"question": "What is Konflux?"})
+            cached = await bot._chat({"question": "What is Konflux?"})
+            fake.config.answer = "A refreshed answer."
+            fresh = await bot._chat({"question": "What is Konflux?", "bypass_cache": True})
+            after = await bot._chat({"question": "What is Konflux?"})
+            await bot.shutdown()
+            return first, cached, fresh, after, fake.stats["requests"], [c["source"] for c in bot.recent_calls]
+
+    first, cached, fresh, after, requests, sources = asyncio.run(scenario())
+    assert first == cached and fresh == after == "A refreshed answer."
+    assert requests == 2
+    assert sources == ["upstream", "cache", "upstream", "cache"]
+
+
+def test_broken_streams_are_neither_cached_nor_indexed():
+    async def scenario():
+        async with FakeLangServe(FakeConfig(error_rate=1.0)) as fake:
+            bot = make_bot(fake.url)
+            bot.cache = ResponseCache(path=None)
+            bot.similar = SimilarityIndex(threshold=0.8)
+            answers = [await bot._chat({"question": "How do I rerun a failed build?"}) for _ in range(2)]
+            similar = await bot._chat({"question": "how to re-trigger a failed konflux build"})
+            await bot.shutdown()
+            return answers, similar, fake.stats["requests"], bot.cache.snapshot(), bot.similar.snapshot()
+
+    answers, similar, requests, cache, index = asyncio.run(scenario())
+    assert all(answer.startswith("> **Partial answer**") for answer in answers + [similar])
+    assert requests == 3
+    assert cache["stores"] == 0 and cache["memory_entries"] == 0
+    assert index["entries"] == 0
+
+
+def test_identical_concurrent_calls_share_one_upstream_request():
+    async def scenario():
+        async with FakeLangServe(FakeConfig(token_delay=0.01)) as fake:
+            bot = make_bot(fake.url)
+            bot.limiter = TenantLimiter(rate=0.05, burst=1, max_concurrent=1)
+            answers = await asyncio.gather(*(bot._chat({"question": "What is Konflux?"}) for _ in range(5)))
+            await bot.shutdown()
+            return answers, fake.stats, bot.metrics(), bot._flights
+
+    answers, stats, metrics, flights = asyncio.run(scenario())
+    assert answers == [answer_text(FakeConfig())] * 5
+    assert stats["requests"] == 1
+    assert (metrics["upstream_requests"], metrics["coalesced_calls"], metrics["in_flight"]) == (1, 4, 0)
+    assert flights == {}
+
+
+def test_cancelling_the_first_caller_keeps_the_shared_request_for_the_others():
+    async def scenario():
+        async with FakeLangServe(FakeConfig(token_delay=0.01)) as fake:
+            bot = make_bot(fake.url)
+            callers = [asyncio.create_task(bot._chat({"question": "What is Konflux?"})) for _ in range(3)]
+            await asyncio.sleep(0.2)  # part way through the stream
+            callers[0].cancel()
+            answers = await asyncio.gather(*callers[1:])
+            first_cancelled = callers[0].cancelled()
+
+            # A call failing before its upstream request starts leaves no flight behind
+            invalid = await bot._chat({"question": "What is Tekton?", "deadline_seconds": "soon"})
+            lone = asyncio.create_task(bot._chat({"question": "What is Tekton?"}))
+            await asyncio.sleep(0)
+            lone.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await lone
+            await asyncio.sleep(0.05)
+            await bot.shutdown()
+            return first_cancelled, answers, invalid, fake.stats, bot.inflight, bot._flights
+
+    first_cancelled, answers, invalid, stats, inflight, flights = asyncio.run(scenario())
+    assert first_cancelled and answers == [answer_text(FakeConfig())] * 2
+    assert stats["requests"] == 1 and stats["disconnects"] == 0
+    assert invalid == "Invalid argument: deadline_seconds must be a number of seconds, got 'soon'"
+    assert inflight.abandoned == 1  # only the lone call's task
+    assert len(inflight) == 0 and flights == {}
+
+
+def test_stream_tool_sends_the_whole_answer_as_progress_notifications():
+    from mcp.shared.memory import create_connected_server_and_client_session
+
+    async def scenario():
+        async with FakeLangServe(FakeConfig(token_delay=0.005)) as fake:
+            bot = make_bot(fake.url)
+            messages = []
+
+            async def on_progress(progress, total, message):
+                messages.append((progress, message))
+
+            async with create_connected_server_and_client_session(bot.server) as client:
+                result = await client.call_tool(
+                    "konflux_chat_stream", {"question": "What is Konflux?"}, progress_callback=on_progress
+                )
+            await bot.shutdown()
+            return result.content[0].text, messages
+
+    answer, messages = asyncio.run(scenario())
+    assert answer == answer_text(FakeConfig())
+    # Batched into a few deltas that add up to the whole answer, the last one included
+    assert 1 < len(messages) < len(answer.split())
+    assert "".join(message for _, message in messages) == answer
+    assert [progress for progress, _ in messages] == sorted(progress for progress, _ in messages)
+    assert messages[-1][0] == len(answer)
+
+
+def test_parser_decodes_only_answer_patches_and_stops_at_the_end_event():
+    async def scenario():
+        # The stand-in keeps the connection open for a while after the end event
+        async with FakeLangServe(FakeConfig(linger=5.0)) as fake:
+            bot = make_bot(fake.url)
+            started = time.perf_counter()
+            answer = await bot._chat({"question": "What is Konflux?"})
+            elapsed = time.perf_counter() - started
+            await asyncio.sleep(0.05)
+            await bot.shutdown()
+            return answer, elapsed, fake.stats
+
+    answer, elapsed, stats = asyncio.run(scenario())
+    assert answer == answer_text(FakeConfig())
+    assert elapsed < 1.0 and stats["disconnects"] == 1  # closed at "event: end", not after the linger
+
+    parser = StreamLogParser()
+    lines = [
+        'data: {"ops": [{"op": "add", "path": "/logs/Retriever/final_output", "value": {"documents": []}}]}',
+        'data: {"ops": [{"op": "add", "path": "/streamed_output/-", "value": "Hel"}, '
+        '{"op": "replace", "path": "/final_output", "value": "Hel"}]}',
+        'data: {"ops": [{"op": "add", "path": "/streamed_output/-", "value": "lo"}, '
+        '{"op": "replace", "path": "/final_output", "value": "Hello"}]}',
+        "event: end",
+    ]
+    ended = [parser.feed_line(line) for line in lines]
+    assert ended == [False, False, False, True]
+    assert parser.result() == "Hello"
+    # The retriever patch is skipped unread; of the answer patches only the last is decoded
+    assert (parser.stats["skipped"], parser.stats["decoded"]) == (1, 1)
+
+
+def test_streams_that_stop_part_way_are_not_complete_answers():
+    from fake_langserve import stream_log_events
+    from stream_parser import StreamError
+
+    def parse(fail_midway, drop_end=False):
+        parser = StreamLogParser()
+        body = b"".join(chunk for _, chunk in stream_log_events(FakeConfig(), fail_midway=fail_midway))
+        lines = body.decode().split("\n")
+        if drop_end:
+            lines = lines[:lines.index("event: end")]
+        for line in lines:
+            if parser.feed_line(line):
+                break
+        return parser
+
+    assert parse(False).result() == answer_text(FakeConfig())
+    for parser, message in [(parse(True), "Internal Server Error"), (parse(False, drop_end=True), "before its end event")]:
+        with pytest.raises(StreamError, match=message):
+            parser.result()
+        assert answer_text(FakeConfig()).startswith(parser.best_partial())
+
+    async def scenario():
+        async with FakeLangServe(FakeConfig(error_rate=1.0)) as fake:
+            bot = make_bot(fake.url)
+            answer = await bot._chat({"question": "What is Konflux?"})
+            await bot.shutdown()
+            return answer, bot.recent_calls[-1]["outcome"]
+
+    answer, outcome = asyncio.run(scenario())
+    assert answer.startswith("> **Partial answer**: the chatbot stopped part way through")
+    assert outcome == "stream_error_partial"
+
+
+def test_stream_log_filters_and_sources_mode(monkeypatch):
+    async def scenario():
+        async with FakeLangServe(FakeConfig(documents=4, document_size=5000)) as fake:
+            bot = make_bot(fake.url)
+            plain = await bot._chat({"question": "What is Konflux?"})
+            sourced = await bot._chat({"question": "What is Konflux?", "include_sources": True})
+            monkeypatch.setattr(server, "STREAM_LOG_FILTER", False)
+            unfiltered = await bot._chat({"question": "What is Tekton?"})
+            await bot.shutdown()
+            return plain, sourced, unfiltered, [entry["wire_bytes"] for entry in bot.recent_upstream]
+
+    plain, sourced, unfiltered, wire_bytes = asyncio.run(scenario())
+    assert plain == unfiltered == answer_text(FakeConfig())
+    assert "**Sources:**" not in plain
+    assert sourced.startswith(plain) and "- [Page 0](https://konflux-ci.dev/docs/page-0)" in sourced
+    # Only the sources mode (retriever logs) and the unfiltered request carry the 20 KB of documents
+    assert wire_bytes[0] + 20000 < wire_bytes[1] and wire_bytes[0] + 20000 < wire_bytes[2]
+
+    monkeypatch.setattr(server, "STREAM_LOG_FILTER", True)
+    bot = make_bot("http://unused")
+    assert bot._stream_log_request("Question: Why?") == {
+        "input": "Question: Why?", "config": {}, "diff": True,
+        "include_names": [], "include_types": [], "include_tags": [],
+    }
+    monkeypatch.setattr(server, "STREAM_LOG_INCLUDE_NAMES", ["ChatModel"])
+    monkeypatch.setattr(server, "STREAM_LOG_INCLUDE_TAGS", ["seq:step:3"])
+    payload = bot._stream_log_request("Question: Why?", include_sources=True)
+    assert (payload["include_names"], payload["include_types"], payload["include_tags"]) == (
+        ["ChatModel"], ["retriever"], ["seq:step:3"]
+    )
+
+
+def test_batch_keeps_input_order_caps_concurrency_and_isolates_failures():
+    async def scenario():
+        async with FakeLangServe(FakeConfig(token_delay=0.005)) as fake:
+            bot = make_bot(fake.url)
+            bot.limiter = None
+            answer = bot._answer
+            running = peak = 0
+
+            async def counted(args, tool, on_partial=None):
+                nonlocal running, peak
+                running += 1
+                peak = max(peak, running)
+                try:
+                    return await answer(args, tool, on_partial)
+                finally:
+                    running -= 1
+
+            bot._answer = counted
+            questions = [{"question": f"Why did build {i} fail?"} for i in range(7)]
+            questions.insert(3, {"tenant": "no question here"})
+            results = await bot._chat_batch({"questions": questions, "max_concurrency": 3})
+            await bot.shutdown()
+            return results, peak, fake.stats
+
+    results, peak, stats = asyncio.run(scenario())
+    assert len(results) == 8
+    assert [result.split("\n", 1)[0] for result in results] == (
+        [f"### [{i + 1}/8] Why did build {i} fail?" for i in range(3)]
+        + ["### [4/8] None"]
+        + [f"### [{i + 2}/8] Why did build {i} fail?" for i in range(3, 7)]
+    )
+    assert "Status: error" in results[3] and "Invalid argument: 'question' is required" in results[3]
+    assert all("Status: ok" in result and answer_text(FakeConfig()) in result
+               for result in results[:3] + results[4:])
+    assert peak == 3 and stats["requests"] == 7
+
+
+def test_batch_rejects_invalid_max_concurrency(monkeypatch):
+    monkeypatch.setattr(server, "BATCH_MAX_CONCURRENCY", 8)
+    bot = make_bot("http://unused")
+    results = {
+        value: asyncio.run(bot._chat_batch({"questions": [{"question": "Why?"}], "max_concurrency": value}))
+        for value in ("abc", 1.5, 0, -2, 9)
+    }
+    assert results == {
+        "abc": ["Invalid argument: max_concurrency must be a whole number, got 'abc'"],
+        1.5: ["Invalid argument: max_concurrency must be a whole number, got 1.5"],
+        0: ["Invalid argument: max_concurrency must be between 1 and 8, got 0"],
+        -2: ["Invalid argument: max_concurrency must be between 1 and 8, got -2"],
+        9: ["Invalid argument: max_concurrency must be between 1 and 8, got 9"],
+    }
+    assert not bot.recent_calls
+
+
+def test_scheduler_orders_by_aged_priority_and_fails_fast_when_busy():
+    async def scenario():
+        scheduler = PriorityScheduler(max_concurrent=1, aging_interval=0.05, queue_timeout=1.0, max_queue=4)
+        order = []
+
+        async def call(name, priority):
+            async with scheduler.slot(priority):
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        await scheduler.acquire(0)  # hold the only slot
+        calls = [asyncio.create_task(call("old low", 2))]
+        await asyncio.sleep(0.12)  # waiting 0.1 s is worth two priority levels
+        for name, priority in [("high", 0), ("medium", 1), ("new low", 2)]:
+            calls.append(asyncio.create_task(call(name, priority)))
+            await asyncio.sleep(0)
+        with pytest.raises(SchedulerBusy, match="queue is full") as full:
+            await scheduler.acquire(0)
+        scheduler.release()
+        await asyncio.gather(*calls)
+
+        scheduler.queue_timeout = 0.05
+        await scheduler.acquire(0)
+        started = time.perf_counter()
+        with pytest.raises(SchedulerBusy, match="in the upstream queue") as expired:
+            await scheduler.acquire(0)
+        waited = time.perf_counter() - started
+        scheduler.release()
+        return order, full.value, expired.value, waited, scheduler.snapshot()
+
+    order, full, expired, waited, snapshot = asyncio.run(scenario())
+    assert order == ["old low", "high", "medium", "new low"]
+    assert full.queue_depth == 4 and full.waited == 0.0
+    assert waited >= 0.05 and expired.waited >= 0.05 and expired.queue_depth == 0
+    assert (snapshot["active"], snapshot["queue_depth"]) == (0, 0)
+    assert (snapshot["admitted"], snapshot["queued"], snapshot["rejected"], snapshot["timed_out"]) == (6, 5, 1, 1)
+
+
+def test_urgency_is_part_of_the_shared_request_and_orders_the_queue():
+    async def scenario():
+        async with FakeLangServe(FakeConfig()) as fake:
+            bot = make_bot(fake.url)
+            bot.limiter = None
+            bot.scheduler = PriorityScheduler(max_concurrent=1)
+            finished = []
+
+            async def ask(question, urgency):
+                await bot._chat({"question": question, "urgency": urgency})
+                finished.append(urgency)
+
+            await bot.scheduler.acquire(0)  # keep the upstream busy while the calls queue
+            calls = []
+            for urgency in ["low", "medium", "high", "HIGH"]:
+                calls.append(asyncio.create_task(ask("What is Konflux?", urgency)))
+                await asyncio.sleep(0.05)
+            bot.scheduler.release()
+            await asyncio.gather(*calls)
+            await bot.shutdown()
+            return finished, fake.stats, bot.metrics()
+
+    finished, stats, metrics = asyncio.run(scenario())
+    # Only callers of the same urgency share a request, so none waits at another's priority
+    assert finished == ["high", "HIGH", "medium", "low"]
+    assert stats["requests"] == 3 and metrics["coalesced_calls"] == 1
+
+
+def test_retries_transient_errors_before_output(monkeypatch):
+    monkeypatch.setattr(server, "RETRY_BASE_DELAY", 0.01)
+
+    async def scenario():
+        async with FakeLangServe(FakeConfig(fail_first=2)) as fake:
+            bot = make_bot(fake.url)
+            answer = await bot._chat({"question": "What is Konflux?"})
+            await bot.shutdown()
+            return answer, fake.stats, bot.resilience_stats
+
+    answer, stats, resilience = asyncio.run(scenario())
+    assert "Diagnostic Assessment" in answer
+    assert stats["requests"] == 3
+    assert resilience["retries"] == 2
+
+
+def test_does_not_retry_client_errors(monkeypatch):
+    monkeypatch.setattr(server, "RETRY_BASE_DELAY", 0.01)
+
+    async def scenario():
+        async with FakeLangServe(FakeConfig(fail_first=1, failure_status=400)) as fake:
+            bot = make_bot(fake.url)
+            answer = await bot._chat({"question": "What is Konflux?"})
+            await bot.shutdown()
+            return answer, fake.stats
+
+    answer, stats = asyncio.run(scenario())
+    assert answer.startswith("Error communicating with Konflux chatbot")
+    assert stats["requests"] == 1
+
+
+def test_circuit_breaker_fails_fast_and_recovers(monkeypatch):
+    monkeypatch.setattr(server, "RETRY_ATTEMPTS", 0)
+    monkeypatch.setattr(server, "BREAKER_FAILURE_THRESHOLD", 2)
+    monkeypatch.setattr(server, "BREAKER_RESET_TIMEOUT", 0.2)
+
+    async def scenario():
+        async with FakeLangServe(FakeConfig(failure_rate=1.0)) as fake:
+            bot = make_bot(fake.url)
+            answers = [await bot._chat({"question": f"q{i}"}) for i in range(4)]
+            requests_while_down = fake.stats["requests"]
+
+            fake.config.failure_rate = 0.0
+            await asyncio.sleep(0.25)
+            recovered = await bot._chat({"question": "probe"})
+            await bot.shutdown()
+            return answers, requests_while_down, recovered, bot.metrics()["resilience"]["circuits"][fake.url]
+
+    answers, requests_while_down, recovered, circuit = asyncio.run(scenario())
+    assert requests_while_down == 2
+    assert "currently unavailable" in answers[2]
+    assert "currently unavailable" in answers[3]
+    assert "Diagnostic Assessment" in recovered
+    assert circuit["state"] == "closed"
+    assert circuit["probes"] == 1
+
+
+def test_hedged_request_beats_stalled_first_attempt(monkeypatch):
+    monkeypatch.setattr(server, "HEDGE_ENABLED", True)
+    monkeypatch.setattr(server, "HEDGE_MIN_SAMPLES", 1)
+    monkeypatch.setattr(server, "HEDGE_MIN_DELAY", 0.05)
+
+    async def scenario():
+        async with FakeLangServe(FakeConfig()) as fake:
+            bot = make_bot(fake.url)
+            await bot._chat({"question": "warm up"})
+
+            # Only the next request stalls; the hedge does not
+            fake.config.slow_first = fake.stats["requests"] + 1
+            fake.config.slow_delay = 5.0
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            answer = await bot._chat({"question": "hedge me"})
+            elapsed = loop.time() - started
+            await bot.shutdown()
+            return answer, elapsed, bot.resilience_stats
+
+    answer, elapsed, resilience = asyncio.run(scenario())
+    assert "Diagnostic Assessment" in answer
+    assert elapsed < 2.0
+    assert resilience["hedge_wins"] == 1
+
+
+def test_details_logs_are_compacted_around_the_failure():
+    log = "\n".join(
+        [f"2025-10-24T10:00:{i % 60:02d}Z step-build pulled layer {i}/5000" for i in range(5000)]
+        + [f"2025-10-24T10:01:{i % 60:02d}Z \x1b[32mstep-build\x1b[0m waiting for the registry" for i in range(300)]
+        + ["ERROR: step-build failed: exit code 1"]
+        + [f"    at com.example.Build.run(Build.java:{i})" for i in range(100)]
+    )
+    bot = make_bot("http://unused")
+    report = {}
+    input_string = bot._build_input({"question": "Why did my build fail?", "details": log}, report)
+
+    assert "ERROR: step-build failed: exit code 1" in input_string
+    assert "\x1b[" not in input_string and "2025-10-24T" not in input_string
+    assert "repeated 299 more times" in input_string and "4997 lines omitted" in input_string
+    assert "stack frames omitted" in input_string
+    assert report["details_compacted_bytes"] <= server.DETAILS_MAX_BYTES < report["details_bytes"]
+
+
+def test_small_details_pass_through_and_numbered_lines_stay_distinct():
+    bot = make_bot("http://unused")
+    steps = "\n".join(f"step {i}: building" for i in range(1, 7))
+    report = {}
+    assert bot._compact_details(steps, report) == steps
+    assert report["details_compacted_bytes"] == report["details_bytes"] == len(steps)
+
+    # Over the budget: repeats collapse, but only lines that really are the same
+    log = "\n".join(
+        [f"step {i}: pulling" for i in range(1, 4)] + ["step 4: pulling"] * 2000 + ["error: step 4 failed"]
+    )
+    compacted = bot._compact_details(log)
+    assert compacted.startswith("[Log compacted from")
+    assert all(f"step {i}: pulling" in compacted for i in range(1, 5))
+    assert "repeated 1999 more times" in compacted and "error: step 4 failed" in compacted
+
+
+def test_paraphrased_question_reuses_answer_within_scope():
+    async def scenario():
+        async with FakeLangServe(FakeConfig()) as fake:
+            bot = make_bot(fake.url)
+            bot.cache = ResponseCache(path=None)
+            bot.similar = SimilarityIndex(threshold=0.8)
+            first = await bot._chat({"question": "How do I rerun a failed build?", "tenant": "t1", "component": "api"})
+            reused = await bot._chat({"question": "how to re-trigger a failed konflux build", "tenant": "t1", "component": "api"})
+            other_component = await bot._chat({"question": "how to re-trigger a failed konflux build", "tenant": "t1", "component": "ui"})
+            other_application = await bot._chat({"question": "how to re-trigger a failed konflux build", "tenant": "t1",
+                                                 "application": "billing", "component": "api"})
+            await bot.shutdown()
+            return first, reused, other_component, other_application, fake.stats["requests"]
+
+    first, reused, other_component, other_application, requests = asyncio.run(scenario())
+    assert reused.startswith("> **Reused answer**")
+    assert reused.endswith(first)
+    assert not other_component.startswith("> **Reused answer**")
+    assert not other_application.startswith("> **Reused answer**")
+    assert requests == 3
+
+
+def test_session_follow_ups_carry_bounded_history():
+    async def scenario():
+        async with FakeLangServe(FakeConfig()) as fake:
+            bot = make_bot(fake.url)
+            bot.sessions = server.SessionStore(history_tokens=500, max_turns=2)
+            inputs = []
+            fetch = bot._fetch_final_output
+
+            async def recording_fetch(input_string, *rest):
+                inputs.append(input_string)
+                return await fetch(input_string, *rest)
+
+            bot._fetch_final_output = recording_fetch
+            logs = "\n".join(f"step {i}: ok" for i in range(50)) + "\nERROR: image push denied"
+            await bot._chat({"question": "Why did my build fail?", "tenant": "t1", "details": logs, "session_id": "s1"})
+            for i in range(4):
+                await bot._chat({"question": f"Follow-up number {i}?", "session_id": "s1"})
+            await bot._chat({"question": "Unrelated question?", "session_id": "s2"})
+            await bot.shutdown()
+            return inputs, bot.sessions.snapshot()
+
+    inputs, sessions = asyncio.run(scenario())
+    assert "Previous conversation" not in inputs[0]
+    last = inputs[4]
+    assert "Tenant: t1" in last  # carried over from the first turn
+    assert "Q: Follow-up number 2?" in last and "Earlier turns (summarized):" in last
+    assert "ERROR: image push denied" in last
+    history = last.split("Previous conversation:\n", 1)[1].split("\n\nQuestion: ", 1)[0]
+    assert len(history) <= 500 * 4
+    assert "Previous conversation" not in inputs[5]
+    assert sessions["sessions"] == 2 and sessions["turns"] == 6
+
+
+def test_sessions_are_private_to_the_client_that_created_them():
+    from mcp.shared.memory import create_connected_server_and_client_session
+
+    async def scenario():
+        async with FakeLangServe(FakeConfig()) as fake:
+            bot = make_bot(fake.url)
+            bot.sessions = server.SessionStore()
+            inputs = []
+            fetch = bot._fetch_final_output
+
+            async def recording_fetch(input_string, *rest):
+                inputs.append(input_string)
+                return await fetch(input_string, *rest)
+
+            bot._fetch_final_output = recording_fetch
+            question = {"question": "Why did my build fail?", "tenant": "t1", "session_id": "s1"}
+            follow_up = {"question": "And on arm64?", "session_id": "s1"}
+            async with create_connected_server_and_client_session(bot.server) as first:
+                await first.call_tool("konflux_chat", question)
+                async with create_connected_server_and_client_session(bot.server) as second:
+                    await second.call_tool("konflux_chat", follow_up)
+                await first.call_tool("konflux_chat", follow_up)
+            await bot.shutdown()
+            return inputs, bot.sessions.snapshot()
+
+    inputs, sessions = asyncio.run(scenario())
+    other_client, same_client = inputs[1], inputs[2]
+    assert "Previous conversation" not in other_client and "Tenant: t1" not in other_client
+    assert "Q: Why did my build fail?" in same_client and "Tenant: t1" in same_client
+    assert sessions["sessions"] == 2
+
+
+def test_routes_to_faster_backend_and_ejects_failing_one(monkeypatch):
+    monkeypatch.setattr(server, "RETRY_BASE_DELAY", 0.01)
+
+    async def scenario():
+        async with FakeLangServe(FakeConfig(first_event_delay=0.1)) as slow, FakeLangServe(FakeConfig()) as fast:
+            bot = make_bot(f"{slow.url},{fast.url}")
+            bot.backends.explore = 0.0
+            for i in range(10):
+                await bot._chat({"question": f"Routed question {i}?"})
+            routed = (slow.stats["requests"], fast.stats["requests"])
+
+            # The fast backend goes down: calls fail over, then it is ejected
+            fast.config.down = True
+            answers = [await bot._chat({"question": f"Failover question {i}?"}) for i in range(5)]
+            ejected = bot.metrics()["backends"][1]
+            fast_requests = fast.stats["requests"]
+            await bot._chat({"question": "While ejected?"})
+            skipped = fast.stats["requests"] == fast_requests
+
+            # Back up: two successful health probes readmit it
+            fast.config.down = False
+            client = bot._get_client()
+            await bot.backends.probe_all(client, 1.0)
+            await bot.backends.probe_all(client, 1.0)
+            readmitted = bot.metrics()["backends"][1]
+            await bot._chat({"question": "After readmission?"})
+            back = fast.stats["requests"] > fast_requests
+            await bot.shutdown()
+            return routed, answers, ejected, skipped, readmitted, back
+
+    routed, answers, ejected, skipped, readmitted, back = asyncio.run(scenario())
+    # Each backend is measured once, then the faster one gets the traffic
+    assert routed == (1, 9)
+    assert all("Diagnostic Assessment" in answer for answer in answers)
+    assert ejected["state"] == "ejected" and ejected["ejections"] == 1 and 1 < ejected["failures"] <= 3
+    assert skipped
+    assert readmitted["state"] == "healthy" and readmitted["last_probe_ok"]
+    assert back
+
+
+def test_circuits_are_per_backend_and_probes_need_a_success_status(monkeypatch):
+    monkeypatch.setattr(server, "RETRY_BASE_DELAY", 0.01)
+    monkeypatch.setattr(server, "BREAKER_FAILURE_THRESHOLD", 2)
+    # Never ejected, so only its circuit keeps calls away from the failing backend
+    monkeypatch.setattr(server, "EJECT_FAILURES", 100)
+    monkeypatch.setattr(server, "EJECT_ERROR_RATE", 2.0)
+
+    async def scenario():
+        async with FakeLangServe(FakeConfig(down=True)) as down, FakeLangServe(FakeConfig()) as up:
+            bot = make_bot(f"{down.url},{up.url}")
+            bot.backends.explore = 0.0
+            answers = [await bot._chat({"question": f"Failover question {i}?"}) for i in range(5)]
+            await bot.shutdown()
+
+        pool = BackendPool(["http://backend/chat"])
+        probes, probed = {}, set()
+
+        def respond(request, status):
+            probed.add((request.method, request.url.path))
+            return httpx.Response(status)
+
+        for status in (200, 302, 401, 404, 503):
+            transport = httpx.MockTransport(lambda request, status=status: respond(request, status))
+            async with httpx.AsyncClient(transport=transport) as client:
+                probes[status] = await pool.probe(client, pool.primary, 1.0)
+        return answers, down.stats["requests"], up.stats["requests"], bot.metrics()["resilience"]["circuits"], probes, probed
+
+    answers, down_requests, up_requests, circuits, probes, probed = asyncio.run(scenario())
+    assert all("Diagnostic Assessment" in answer for answer in answers)
+    assert down_requests == 2 and up_requests == 5
+    assert [circuit["state"] for circuit in circuits.values()] == ["open", "closed"]
+    assert probes == {200: True, 302: True, 401: False, 404: False, 503: False}
+    assert probed == {("GET", "/chat/input_schema")}
+
+
+def test_captured_streams_replay_and_serve_offline(monkeypatch, tmp_path):
+    monkeypatch.setattr(server, "RETRY_ATTEMPTS", 0)
+    question = {"question": "What is Konflux?"}
+
+    async def scenario():
+        async with FakeLangServe(FakeConfig(first_event_delay=0.2)) as fake:
+            bot = make_bot(fake.url)
+            bot.captures = CaptureArchive(str(tmp_path / "captures.sqlite3"))
+            monkeypatch.setattr(server, "CAPTURE_MODE", "fallback")
+            live = await bot._chat(question)
+            fake.config.down = True
+            offline = await bot._chat(question)
+            never_asked = await bot._chat({"question": "What is Tekton?"})
+
+            monkeypatch.setattr(server, "CAPTURE_MODE", "replay")
+            requests = fake.stats["requests"]
+            replays = {}
+            for speed in (1.0, 10.0):
+                monkeypatch.setattr(server, "REPLAY_SPEED", speed)
+                started = time.perf_counter()
+                replays[speed] = (await bot._chat(question), time.perf_counter() - started)
+            replay_requests = fake.stats["requests"] - requests
+            captures = bot.captures.snapshot()
+            await bot.shutdown()
+            return live, offline, never_asked, replays, replay_requests, captures
+
+    live, offline, never_asked, replays, replay_requests, captures = asyncio.run(scenario())
+    assert "Diagnostic Assessment" in live
+    assert offline.startswith("> **Offline answer**") and offline.endswith(live)
+    assert never_asked.startswith("Error communicating with Konflux chatbot")
+    assert replays[1.0][0] == replays[10.0][0] == live
+    # The recorded 0.2 s before the first event is kept at 1x and shortened at 10x
+    assert replays[1.0][1] >= 0.18 > replays[10.0][1]
+    assert replay_requests == 0
+    assert captures["captures"] == 1 and captures["fallbacks"] == 1 and captures["replayed"] == 3
+    assert captures["stored_bytes"] < captures["wire_bytes"]
+
+
+def test_captures_keep_the_raw_stream_and_replay_applies_the_limits(monkeypatch, tmp_path):
+    monkeypatch.setattr(server, "CAPTURE_MODE", "record")
+    # Unfiltered, the retrieved documents arrive as one oversized event
+    monkeypatch.setattr(server, "STREAM_LOG_FILTER", False)
+    monkeypatch.setattr(server, "MAX_EVENT_BYTES", 4000)
+
+    async def scenario():
+        async with FakeLangServe(FakeConfig(documents=2, document_size=3000)) as fake:
+            bot = make_bot(fake.url)
+            bot.captures = CaptureArchive(str(tmp_path / "captures.sqlite3"))
+            live = await bot._chat({"question": "What is Konflux?"})
+            dropped_live = bot.stream_limit_stats["dropped_events"]
+            [key] = bot.captures.keys()
+            capture = await bot.captures.aload(key)
+
+            monkeypatch.setattr(server, "CAPTURE_MODE", "replay")
+            monkeypatch.setattr(server, "REPLAY_SPEED", 0.0)
+            replayed = await bot._chat({"question": "What is Konflux?"})
+            dropped_total = bot.stream_limit_stats["dropped_events"]
+            await bot.shutdown()
+            return live, replayed, dropped_live, dropped_total, capture
+
+    live, replayed, dropped_live, dropped_total, capture = asyncio.run(scenario())
+    assert live == replayed == answer_text(FakeConfig())
+    assert dropped_live == 1 and dropped_total == 2
+    # The archive holds the event the live read skipped, byte for byte
+    assert max(len(line) for line in capture.lines) > 6000
+
+
+def test_response_format_returns_only_requested_sections():
+    async def scenario():
+        async with FakeLangServe(FakeConfig(answer_words=400)) as fake:
+            bot = make_bot(fake.url)
+            bot.cache = ResponseCache(path=None)
+            answers = {}
+            for response_format in ("full", "solution_only", "summary", "json"):
+                answers[response_format] = await bot._chat({"question": "What is Konflux?", "response_format": response_format})
+            requests = fake.stats["requests"]
+            # An invalid format is rejected before the question goes upstream
+            invalid = await bot._chat({"question": "What is Tekton?", "response_format": "xml"})
+            invalid_stream = await bot._chat_stream({"question": "What is Tekton?", "response_format": "xml"})
+            [invalid_item] = await bot._chat_batch({"questions": [{"question": "What is Tekton?", "response_format": "xml"}]})
+            invalid_requests = fake.stats["requests"] - requests
+            await bot.shutdown()
+            return answers, (invalid, invalid_stream, invalid_item), requests, invalid_requests, bot.metrics()["response_formats"]
+
+    answers, invalid, requests, invalid_requests, totals = asyncio.run(scenario())
+    full = answers["full"]
+    assert "**Notes:**" in full
+    assert answers["solution_only"].startswith("Konflux is a secure software factory")
+    assert "Notes" not in answers["solution_only"]
+    assert answers["summary"].startswith("**Assessment:**") and answers["summary"].endswith("**Confidence:** High")
+    structured = json.loads(answers["json"])
+    assert structured["confidence"] == "High" and structured["notes"].endswith("No real backend was contacted.")
+    assert len(answers["summary"]) < len(answers["json"]) < len(full)
+    assert invalid[0] == invalid[1] == "Invalid argument: unknown response_format 'xml' (expected one of full, solution_only, summary, json)"
+    assert "Status: error" in invalid[2] and invalid[0] in invalid[2]
+    assert invalid_requests == 0
+    assert requests == 1  # one cached answer, formatted four ways
+    assert totals["summary"]["returned_bytes"] < totals["summary"]["answer_bytes"]
+
+
+def test_client_cancellation_aborts_upstream_stream():
+    from mcp import types
+    from mcp.shared.exceptions import McpError
+    from mcp.shared.memory import create_connected_server_and_client_session
+
+    async def scenario():
+        async with FakeLangServe(FakeConfig(token_delay=0.05)) as fake:
+            bot = make_bot(fake.url)
+            async with create_connected_server_and_client_session(bot.server) as client:
+                call = asyncio.create_task(client.call_tool("konflux_chat", {"question": "What is Konflux?"}))
+                while fake.stats["requests"] == 0:
+                    await asyncio.sleep(0.01)
+                await asyncio.sleep(0.2)  # the answer is streaming now
+                cancelled_at = time.perf_counter()
+                await client.send_notification(types.ClientNotification(types.CancelledNotification(
+                    params=types.CancelledNotificationParams(requestId=client._request_id - 1),
+                )))
+                with pytest.raises(McpError):
+                    await call
+                while fake.stats["disconnects"] == 0 and time.perf_counter() - cancelled_at < 2:
+                    await asyncio.sleep(0.01)
+                aborted_after = time.perf_counter() - cancelled_at
+            await bot.shutdown()
+            return aborted_after, fake.stats, bot.metrics()
+
+    aborted_after, stats, metrics = asyncio.run(scenario())
+    # The stand-in would have streamed for several more seconds
+    assert stats["disconnects"] == 1 and aborted_after < 0.5
+    assert metrics["abandoned_requests"] == 1
+    assert metrics["recent_calls"][-1]["outcome"] == "cancelled"
+
+
+def test_deadline_returns_partial_answer(monkeypatch):
+    monkeypatch.setitem(server.DEADLINES, "high", 0.4)
+
+    async def scenario():
+        async with FakeLangServe(FakeConfig(token_delay=0.05)) as fake:
+            bot = make_bot(fake.url)
+            started = time.perf_counter()
+            # Deadline from urgency; the stand-in needs about 1.5 s for the answer
+            partial = await bot._chat({"question": "What is Konflux?", "urgency": "high"})
+            elapsed = time.perf_counter() - started
+            fake.config.first_event_delay = 2.0
+            nothing = await bot._chat({"question": "What is Tekton?", "deadline_seconds": 0.3})
+            fake.config.first_event_delay = 0.0
+            full = await bot._chat({"question": "What is Konflux?", "urgency": "high", "deadline_seconds": 0})
+            await bot.shutdown()
+            return partial, elapsed, nothing, full, fake.stats, list(bot.recent_calls)
+
+    partial, elapsed, nothing, full, stats, calls = asyncio.run(scenario())
+    assert partial.startswith("> **Partial answer**") and 0.4 <= elapsed < 0.8
+    answer_so_far = partial.split("\n\n", 1)[1]
+    assert full.startswith(answer_so_far) and len(answer_so_far) < len(full)
+    assert nothing.startswith("The Konflux chatbot did not start answering in time")
+    assert [call["outcome"] for call in calls] == ["deadline_partial", "deadline", "ok"]
+    assert stats["disconnects"] == 2  # both abandoned streams were closed
+
+
+def test_tenant_limits_throttle_one_tenant_without_starving_others():
+    async def scenario():
+        async with FakeLangServe(FakeConfig(token_delay=0.02)) as fake:
+            bot = make_bot(fake.url)
+            bot.limiter = TenantLimiter(rate=0.05, burst=2, max_concurrent=1)
+            # One tenant's concurrent calls beyond its quota are refused at once
+            busy = await asyncio.gather(*(
+                bot._chat({"question": f"Why did build {i} fail?", "tenant": "team-a"}) for i in range(2)
+            ))
+            # ... and once its burst is used up, so are further calls
+            await bot._chat({"question": "Why did build 2 fail?", "tenant": "team-a"})
+            limited = await bot._chat({"question": "Why did build 3 fail?", "tenant": "Team-A"})
+            other = await bot._chat({"question": "Why did build 3 fail?", "tenant": "team-b"})
+            await bot.shutdown()
+            return busy, limited, other, bot.metrics()["tenants"], list(bot.recent_calls)
+
+    busy, limited, other, tenants, calls = asyncio.run(scenario())
+    assert sum(answer.startswith("Rate limited:") for answer in busy) == 1
+    assert "already has 1 calls in progress" in "".join(busy)
+    assert limited.startswith("Rate limited: Tenant 'team-a' is over its rate limit")
+    retry_after = float(limited.split("retry_after_seconds: ")[1].split(")")[0])
+    assert 15 < retry_after <= 20  # until the next token at 3 calls per minute
+    assert not other.startswith("Rate limited")
+    team_a = tenants["keys"]["tenant:team-a"]
+    assert (team_a["allowed"], team_a["quota_limited"], team_a["rate_limited"], team_a["in_flight"]) == (2, 1, 1, 0)
+    assert tenants["keys"]["tenant:team-b"]["allowed"] == 1
+    assert [call["outcome"] for call in calls].count("rate_limited") == 2
+
+
+@pytest.mark.filterwarnings("ignore::DeprecationWarning")
+def test_tenant_limits_charge_only_upstream_requests_and_stateless_clients_by_address():
+    import uvicorn
+    from mcp import ClientSession
+    from mcp.client.streamable_http import streamablehttp_client
+
+    async def scenario():
+        async with FakeLangServe(FakeConfig()) as fake:
+            bot = make_bot(fake.url)
+            bot.cache = ResponseCache(path=None)
+            bot.limiter = TenantLimiter(rate=0.05, burst=1, max_concurrent=1)
+            first = await bot._chat({"question": "What is Konflux?", "tenant": "team-a"})
+            cached = await bot._chat({"question": "What is Konflux?", "tenant": "team-a"})
+            limited = await bot._chat({"question": "What is Tekton?", "tenant": "team-a"})
+
+            # Stateless HTTP: every request is a new session, so the client address is the key
+            http = uvicorn.Server(uvicorn.Config(bot.http_app(stateless=True), host="127.0.0.1", port=0,
+                                                 log_level="warning"))
+            task = asyncio.create_task(http.serve())
+            while not http.started:
+                await asyncio.sleep(0.01)
+            port = http.servers[0].sockets[0].getsockname()[1]
+            stateless = []
+            async with streamablehttp_client(f"http://127.0.0.1:{port}/mcp") as (read_stream, write_stream, _):
+                async with ClientSession(read_stream, write_stream) as session:
+                    await session.initialize()
+                    for question in ("Why did build 1 fail?", "Why did build 2 fail?"):
+                        result = await session.call_tool("konflux_chat", {"question": question})
+                        stateless.append(result.content[0].text)
+            http.should_exit = True
+            await task
+            return first, cached, limited, stateless, bot.metrics()["tenants"]
+
+    first, cached, limited, stateless, tenants = asyncio.run(scenario())
+    assert first == cached == answer_text(FakeConfig())
+    assert limited.startswith("Rate limited: Tenant 'team-a' is over its rate limit")
+    assert tenants["keys"]["tenant:team-a"]["allowed"] == 1
+    assert stateless[0] == answer_text(FakeConfig())
+    assert stateless[1].startswith("Rate limited: Client 127.0.0.1 is over its rate limit")
+    assert tenants["keys"]["client:127.0.0.1"]["allowed"] == 1
+
+
+def test_oversized_events_are_skipped_and_oversized_responses_aborted(monkeypatch):
+    monkeypatch.setattr(server, "STREAM_LOG_FILTER", False)  # the stand-in then sends the documents
+    monkeypatch.setattr(server, "MAX_EVENT_BYTES", 100_000)
+
+    async def scenario():
+        async with FakeLangServe(FakeConfig(documents=2, document_size=300_000)) as fake:
+            bot = make_bot(fake.url)
+            answer = await bot._chat({"question": "What is Konflux?"})
+            dropped = dict(bot.stream_limit_stats)
+            # The answer itself outgrows the response limit part way through
+            fake.config.documents, fake.config.answer_words, fake.config.token_delay = 0, 3000, 0.002
+            monkeypatch.setattr(server, "MAX_RESPONSE_BYTES", 200_000)
+            cut = await bot._chat({"question": "Why is my build failing?"})
+            await bot.shutdown()
+            return answer, dropped, cut, bot.stream_limit_stats, fake.stats, list(bot.recent_calls)
+
+    monkeypatch.setattr(server, "MAX_RESPONSE_BYTES", 0)
+    answer, dropped, cut, limits, stats, calls = asyncio.run(scenario())
+    assert answer == answer_text(FakeConfig())
+    assert dropped["dropped_events"] == 1 and dropped["dropped_bytes"] > 600_000
+    assert cut.startswith("> **Partial answer**: the chatbot's response was cut off because the response is larger")
+    partial = cut.split("\n\n", 1)[1]
+    assert answer_text(FakeConfig(answer_words=3000)).startswith(partial) and len(partial) > 100
+    assert limits["aborted_responses"] == 1 and stats["disconnects"] == 1
+    assert [call["outcome"] for call in calls] == ["ok", "too_large_partial"]
+
+
+def test_metrics_resource_reports_call_telemetry():
+    from mcp.shared.memory import create_connected_server_and_client_session
+
+    async def scenario():
+        async with FakeLangServe(FakeConfig()) as fake:
+            bot = make_bot(fake.url)
+            async with create_connected_server_and_client_session(bot.server) as client:
+                await client.call_tool("konflux_chat", {"question": "What is Konflux?"})
+                resources = await client.list_resources()
+                metrics = await client.read_resource(server.METRICS_URI)
+                openmetrics = await client.read_resource(server.OPENMETRICS_URI)
+            await bot.shutdown()
+            return resources, json.loads(metrics.contents[0].text), openmetrics.contents[0].text
+
+    resources, metrics, openmetrics = asyncio.run(scenario())
+    assert {str(resource.uri) for resource in resources.resources} == {server.METRICS_URI, server.OPENMETRICS_URI}
+    call = metrics["recent_calls"][-1]
+    assert call["outcome"] == "ok"
+    assert call["wire_bytes"] > 0 and call["events"] > 0 and "parse_ms" in call and "connect_ms" in call
+    histograms = metrics["telemetry"]["histograms"]
+    assert histograms["konflux_call_duration_seconds"]["tool=konflux_chat"]["count"] == 1
+    assert histograms["konflux_response_bytes"]["all"]["count"] == 1
+    assert 'konflux_tool_calls_total{outcome="ok",tool="konflux_chat"} 1' in openmetrics
+    assert openmetrics.endswith("# EOF\n")
+
+
+# mcp >= 1.2x renamed streamablehttp_client; the old name still works
+@pytest.mark.filterwarnings("ignore::DeprecationWarning")
+def test_http_transport_shares_one_server_between_sessions():
+    import uvicorn
+    from mcp import ClientSession
+    from mcp.client.sse import sse_client
+    from mcp.client.streamable_http import streamablehttp_client
+
+    async def scenario():
+        async with FakeLangServe(FakeConfig()) as fake:
+            bot = make_bot(fake.url)
+            bot.cache = ResponseCache(path=None)
+            http = uvicorn.Server(uvicorn.Config(bot.http_app(), host="127.0.0.1", port=0, log_level="warning"))
+            task = asyncio.create_task(http.serve())
+            while not http.started:
+                await asyncio.sleep(0.01)
+            port = http.servers[0].sockets[0].getsockname()[1]
+            base = f"http://127.0.0.1:{port}"
+
+            answers = []
+            async with streamablehttp_client(f"{base}/mcp") as (read_stream, write_stream, _):
+                async with ClientSession(read_stream, write_stream) as session:
+                    await session.initialize()
+                    result = await session.call_tool("konflux_chat", {"question": "What is Konflux?"})
+                    answers.append(result.content[0].text)
+            async with sse_client(f"{base}/sse") as (read_stream, write_stream):
+                async with ClientSession(read_stream, write_stream) as session:
+                    await session.initialize()
+                    result = await session.call_tool("konflux_chat", {"question": "what is  konflux?"})
+                    answers.append(result.content[0].text)
+
+            http.should_exit = True
+            await task
+            return answers, fake.stats["requests"], [call["source"] for call in bot.recent_calls]
+
+    answers, requests, sources = asyncio.run(scenario())
+    assert all("Diagnostic Assessment" in answer for answer in answers)
+    # The second session was answered from the cache the first one filled
+    assert requests == 1
+    assert sources == ["upstream", "cache"]